@@ -0,0 +1,104 @@
+"""Synthetic contact data for benchmarks."""
+import random
+import pandas as pd
+
+FIRST_NAMES = [
+    'Aarav', 'Priya', 'Rahul', 'Ananya', 'Vikram', 'Sneha', 'Arjun', 'Kavya', 'Rohan', 'Isha',
+    'James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda', 'David', 'Sarah',
+    'Wei', 'Mei', 'Hiroshi', 'Yuki', 'Carlos', 'Lucia', 'Ahmed', 'Fatima', 'Olga', 'Ivan',
+]
+LAST_NAMES = [
+    'Sharma', 'Patel', 'Kumar', 'Singh', 'Gupta', 'Reddy', 'Iyer', 'Nair', 'Joshi', 'Mehta',
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Wilson', 'Moore',
+    'Wang', 'Li', 'Tanaka', 'Sato', 'Lopez', 'Martinez', 'Hassan', 'Khan', 'Ivanova', 'Petrov',
+]
+COMPANY_WORDS = [
+    'Acme', 'Globex', 'Initech', 'Umbrella', 'Hooli', 'Vandelay', 'Stark', 'Wayne', 'Wonka', 'Cyberdyne',
+    'Nimbus', 'Quantum', 'Blue', 'Apex', 'Vertex', 'Nova', 'Pixel', 'Orbit', 'Lumen', 'Zenith',
+]
+COMPANY_SUFFIXES = ['', ' Inc', ' Labs', ' AI', ' Technologies', ' Systems', '.io', ' HR', ' Finance']
+JOB_TITLES = [
+    'Talent Acquisition Specialist', 'HR Manager', 'Technical Recruiter', 'Engineering Manager',
+    'CTO', 'Founder', 'Head of People', 'Software Engineer', 'VP Engineering', 'Recruiting Lead',
+]
+LOCATIONS = ['Bengaluru', 'Mumbai', 'Delhi', 'Pune', 'Hyderabad', 'London', 'Berlin', 'New York', 'Singapore', 'Remote']
+NICHES = ['SaaS', 'Fintech', 'HR Tech', 'E-commerce', 'Healthtech', 'Edtech', 'AI/ML', 'Logistics', 'Gaming', 'Security']
+
+# Default status mix of an active pipeline
+STATUS_MIX = {
+    'Not Applied': 0.55,
+    'Applied': 0.2,
+    'Follow-Up Sent': 0.1,
+    'No Response': 0.08,
+    'Rejected': 0.05,
+    'Accepted': 0.02,
+}
+
+
+def _company_pool(rng, size):
+    return [
+        f"{rng.choice(COMPANY_WORDS)} {rng.choice(COMPANY_WORDS)}{rng.choice(COMPANY_SUFFIXES)}"
+        for _ in range(size)
+    ]
+
+
+def _variant(rng, text):
+    """Same identity, different spelling: case and stray whitespace"""
+    choice = rng.random()
+    if choice < 0.3:
+        return text.upper()
+    if choice < 0.6:
+        return text.lower()
+    if choice < 0.8:
+        return f" {text} "
+    return text
+
+
+def generate_contacts(rows, duplicate_rate=0.05, companies=None, seed=42):
+    """DataFrame of import-shaped contacts (spreadsheet headers).
+
+    duplicate_rate is the fraction of rows repeating an earlier contact's
+    name and company with a different spelling.
+    """
+    rng = random.Random(seed)
+    company_pool = _company_pool(rng, companies or max(rows // 20, 10))
+    records = []
+    for i in range(rows):
+        if records and rng.random() < duplicate_rate:
+            original = records[rng.randrange(len(records))]
+            name = _variant(rng, original['Name'])
+            company = _variant(rng, original['Company Name'])
+        else:
+            # The serial keeps generated identities unique apart from intended duplicates
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}"
+            company = rng.choice(company_pool)
+        slug = name.strip().lower().replace(' ', '-')
+        domain = company.strip().lower().replace(' ', '').replace('.', '') + '.com'
+        records.append({
+            'Name': name,
+            'Email': f"{slug}@{domain}",
+            'Job Title': rng.choice(JOB_TITLES),
+            'Linkedin URL': f"https://www.linkedin.com/in/{slug}",
+            'Company Name': company,
+            'Company Website': f"https://{domain}",
+            'Company Linkedin': f"https://www.linkedin.com/company/{domain[:-4]}",
+            'Company Social': None if rng.random() < 0.7 else f"https://instagram.com/{domain[:-4]}",
+            'Company Twitter': None if rng.random() < 0.5 else f"https://twitter.com/{domain[:-4]}",
+            'Location': rng.choice(LOCATIONS),
+            'Company Niche': rng.choice(NICHES),
+        })
+    return pd.DataFrame(records)
+
+
+def assign_statuses(contact_ids, status_mix=STATUS_MIX, due_fraction=0.3, seed=42):
+    """Spread ids over statuses; returns {status: [ids]} and the ids whose
+    follow-up should be due (a fraction of Applied / Follow-Up Sent)"""
+    rng = random.Random(seed)
+    statuses = list(status_mix)
+    weights = list(status_mix.values())
+    by_status = {status: [] for status in statuses}
+    for contact_id in contact_ids:
+        by_status[rng.choices(statuses, weights)[0]].append(contact_id)
+    pending = by_status['Applied'] + by_status['Follow-Up Sent']
+    due = [contact_id for contact_id in pending if rng.random() < due_fraction]
+    return by_status, due
@@ -0,0 +1,192 @@
+"""Benchmark the database and service layers.
+
+    python -m benchmarks.run run --sizes 10000,100000 --output results.json
+    python -m benchmarks.run run --backends postgres --pg-url postgresql://localhost/bench
+    python -m benchmarks.run compare baseline.json results.json --threshold 0.2
+
+The Postgres database given by --pg-url is wiped (all contacts deleted)
+before every size, so point it at a scratch database.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import database
+from benchmarks.generator import generate_contacts, assign_statuses
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = [10_000, 100_000]
+
+
+def _timed(func, repeat):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+def _use_backend(backend, workdir, pg_url):
+    database.close_pools()
+    if backend == 'postgres':
+        os.environ['DB_URL'] = pg_url
+    else:
+        os.environ.pop('DB_URL', None)
+        database.SQLITE_PATH = os.path.join(workdir, 'bench.db')
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(database.SQLITE_PATH + suffix):
+                os.remove(database.SQLITE_PATH + suffix)
+    database.init_database()
+    database.delete_all_contacts()
+
+
+def _seed_statuses():
+    ids = database.get_contact_ids()
+    by_status, due = assign_statuses(ids)
+    for status, status_ids in by_status.items():
+        database.update_contacts_status(status_ids, status)
+    # A negative interval puts next_followup_date in the past
+    database.mark_followups_sent(due, followup_interval=-48)
+
+
+def _seed_legacy_duplicates(duplicate_rate):
+    """Keyless copies, as left behind by imports made before insert-time dedup"""
+    step = max(int(round(1 / duplicate_rate)), 1) if duplicate_rate else 0
+    if not step:
+        return 0
+    modulo = '%%' if database.is_postgres() else '%'
+    with database.DatabaseConnection() as cursor:
+        cursor.execute(database._sql(f'''
+        INSERT INTO contacts (name, company_name, job_title, status)
+        SELECT UPPER(name), company_name, job_title, status FROM contacts WHERE id {modulo} ? = 0
+        '''), (step,))
+        return cursor.rowcount
+
+
+def run_size(backend, size, repeat, duplicate_rate, workdir, pg_url):
+    from services.contact_service import load_contacts, refresh_data
+
+    _use_backend(backend, workdir, pg_url)
+    df = generate_contacts(size, duplicate_rate=duplicate_rate)
+    results = []
+
+    def record(operation, runs, **extra):
+        result = {
+            'backend': backend,
+            'size': size,
+            'operation': operation,
+            'median_s': statistics.median(runs),
+            'min_s': min(runs),
+            'runs_s': runs,
+        }
+        result.update(extra)
+        results.append(result)
+        logger.info(f"{backend:8} {size:>9} {operation:28} {result['median_s'] * 1000:10.1f} ms")
+
+    record('insert_bulk_contacts', _timed(lambda: database.insert_bulk_contacts(df), 1), rows=len(df))
+    _seed_statuses()
+
+    record('get_all_contacts', _timed(database.get_all_contacts, repeat))
+
+    def load_contacts_cold():
+        refresh_data()
+        load_contacts()
+    record('load_contacts', _timed(load_contacts_cold, repeat))
+    record('load_contacts_cached', _timed(load_contacts, repeat))
+    record('get_contact_stats', _timed(database.get_contact_stats, repeat))
+    record('get_due_followups', _timed(database.get_due_followups, repeat))
+
+    duplicates = _seed_legacy_duplicates(duplicate_rate)
+    record('remove_duplicate_contacts', _timed(database.remove_duplicate_contacts, 1), rows=duplicates)
+    return results
+
+
+def run(args):
+    backends = args.backends.split(',')
+    if 'postgres' in backends and not args.pg_url:
+        sys.exit("--pg-url (or BENCH_PG_URL) is required for the postgres backend")
+    sizes = [int(size) for size in args.sizes.split(',')] if args.sizes else DEFAULT_SIZES
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for backend in backends:
+            for size in sizes:
+                results.extend(run_size(backend, size, args.repeat, args.duplicate_rate, workdir, args.pg_url))
+        database.close_pools()
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'duplicate_rate': args.duplicate_rate,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Wrote {len(results)} results to {args.output}")
+
+
+def compare(args):
+    """Flag operations whose median got slower than the threshold allows"""
+    with open(args.baseline) as f:
+        baseline = {(r['backend'], r['size'], r['operation']): r for r in json.load(f)['results']}
+    with open(args.current) as f:
+        current = json.load(f)['results']
+
+    regressions = 0
+    print(f"{'backend':8} {'size':>9} {'operation':28} {'baseline':>10} {'current':>10} {'change':>8}")
+    for result in current:
+        key = (result['backend'], result['size'], result['operation'])
+        if key not in baseline:
+            continue
+        old, new = baseline[key]['median_s'], result['median_s']
+        change = (new - old) / old if old else 0.0
+        # Ignore sub-millisecond jitter on very fast operations
+        regressed = change > args.threshold and new - old > args.min_delta
+        regressions += regressed
+        print(f"{key[0]:8} {key[1]:>9} {key[2]:28} {old * 1000:8.1f}ms {new * 1000:8.1f}ms "
+              f"{change:+7.1%}{'  REGRESSION' if regressed else ''}")
+    if regressions:
+        print(f"\n{regressions} regression(s) above {args.threshold:.0%}")
+        sys.exit(1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold Email Tracker benchmarks")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="Run the benchmarks and write JSON results")
+    run_parser.add_argument('--backends', default='sqlite', help="Comma-separated: sqlite,postgres")
+    run_parser.add_argument('--sizes', help="Comma-separated row counts (default 10000,100000)")
+    run_parser.add_argument('--repeat', type=int, default=3, help="Runs per read operation")
+    run_parser.add_argument('--duplicate-rate', type=float, default=0.05)
+    run_parser.add_argument('--pg-url', default=os.environ.get('BENCH_PG_URL'))
+    run_parser.add_argument('--output', default='bench_results.json')
+    run_parser.set_defaults(func=run)
+
+    compare_parser = commands.add_parser('compare', help="Compare two result files")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.2, help="Allowed slowdown (0.2 = 20%%)")
+    compare_parser.add_argument('--min-delta', type=float, default=0.005, help="Ignore changes below this many seconds")
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args(argv)
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
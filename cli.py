@@ -0,0 +1,341 @@
+"""Command-line access to bulk operations, without Streamlit.
+
+    python cli.py import contacts/*.xlsx --workers 4
+    python cli.py dedup --fuzzy
+    python cli.py export --format parquet --status Applied --output applied.parquet
+    python cli.py merge 3 --niche SaaS --output outreach.csv
+    python cli.py enqueue 3 --status "Not Applied" && python cli.py send --once
+    python cli.py track --port 8080
+    python cli.py vacuum
+    python cli.py delete-all --yes
+
+Uses the same database and service code as the app. Set DB_URL for
+Postgres, or pass --sqlite-path to work on another SQLite file.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from datetime import date
+
+from dotenv import load_dotenv
+
+def _use_database(sqlite_path):
+    import database
+    if sqlite_path:
+        database.SQLITE_PATH = sqlite_path
+    return database
+
+
+def _init_worker(log_level):
+    # Spawned workers start afresh: settings from .env must be loaded again
+    # before database reads them
+    load_dotenv()
+    logging.getLogger().setLevel(log_level)
+
+
+def _import_file(path, sqlite_path, merge_policy):
+    """Import one file in a worker process; returns (path, imported, rows read)"""
+    _use_database(sqlite_path)
+    from services.import_service import import_contacts_stream
+
+    rows_read = 0
+    def progress(rows, total):
+        nonlocal rows_read
+        rows_read = rows
+        print(f"  {os.path.basename(path)}: {rows}{f'/{total}' if total else ''} rows", flush=True)
+
+    with open(path, 'rb') as f:
+        imported = import_contacts_stream(f, path, on_progress=progress, merge_policy=merge_policy)
+    return path, imported, rows_read
+
+
+def import_files(args):
+    database = _use_database(args.sqlite_path)
+    database.init_database()
+    # Workers open their own connections, and are spawned rather than forked
+    # so no pool, lock or thread of this process is inherited half-copied
+    database.close_pools()
+    start = time.perf_counter()
+    imported = rows = failed = 0
+    # One file per worker process; each commits its own chunks
+    with ProcessPoolExecutor(max_workers=min(args.workers, len(args.files)), mp_context=get_context('spawn'),
+                             initializer=_init_worker, initargs=(logging.getLogger().level,)) as pool:
+        futures = {pool.submit(_import_file, path, args.sqlite_path, args.merge_policy): path for path in args.files}
+        for future in as_completed(futures):
+            try:
+                path, file_imported, file_rows = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"FAILED {futures[future]}: {e}", file=sys.stderr)
+                continue
+            imported += file_imported
+            rows += file_rows
+            print(f"Done {path}: {file_imported} new of {file_rows} rows")
+    print(f"Imported {imported} new contacts from {rows} rows in {len(args.files) - failed} files "
+          f"({time.perf_counter() - start:.1f}s)")
+    if failed:
+        sys.exit(1)
+
+
+def dedup(args):
+    database = _use_database(args.sqlite_path)
+    database.init_database()
+    print("Removing duplicate contacts...", flush=True)
+    start = time.perf_counter()
+    removed = database.remove_duplicate_contacts()
+    print(f"Removed {removed} duplicate contacts ({time.perf_counter() - start:.1f}s)")
+    if not args.fuzzy:
+        return
+    print("Scanning for fuzzy duplicates...", flush=True)
+    start = time.perf_counter()
+    queued = database.detect_duplicates()
+    print(f"Queued {queued} duplicate clusters for review ({time.perf_counter() - start:.1f}s)")
+    if args.merge and queued:
+        clusters, _ = database.count_duplicate_clusters()
+        members = database.get_duplicate_clusters(clusters)
+        removed = database.merge_duplicate_clusters(members['cluster_id'].unique().tolist())
+        print(f"Merged {clusters} clusters, removing {removed} contacts")
+
+
+def _contact_filters(args):
+    return {column: value for column, value in (
+        ('status', args.status), ('company_name', args.company),
+        ('company_niche', args.niche), ('location', args.location),
+    ) if value}
+
+
+def export(args):
+    _use_database(args.sqlite_path)
+    from services.export_service import export_contacts
+
+    filters = _contact_filters(args)
+    output = args.output or f"contacts.{args.format}"
+    start = time.perf_counter()
+    with open(output, 'wb') as f:
+        count = export_contacts(
+            f, args.format, filters, args.search, args.due_before,
+            on_progress=lambda rows: print(f"  {rows} contacts", flush=True)
+        )
+    print(f"Exported {count} contacts to {output} ({time.perf_counter() - start:.1f}s)")
+
+
+def _load_template(database, template_id):
+    from services.merge_service import template_error
+
+    template = database.get_template(template_id)
+    if template is None:
+        sys.exit(f"No template with id {template_id}")
+    error = template_error(template['title'], template['body'])
+    if error:
+        sys.exit(f"Template {template_id} does not compile: {error}")
+    return template
+
+
+def merge(args):
+    database = _use_database(args.sqlite_path)
+    from services.export_service import export_merged
+
+    template = _load_template(database, args.template)
+    filters = _contact_filters(args)
+    output = args.output or f"mail_merge_{args.template}.{args.format}"
+    start = time.perf_counter()
+    with open(output, 'wb') as f:
+        count = export_merged(
+            f, template['title'], template['body'], args.format, filters, args.search, args.due_before,
+            on_progress=lambda rows: print(f"  {rows} emails", flush=True)
+        )
+    print(f"Rendered {count} emails to {output} ({time.perf_counter() - start:.1f}s)")
+
+
+def enqueue(args):
+    database = _use_database(args.sqlite_path)
+    from services.merge_service import enqueue_merge
+
+    template = _load_template(database, args.template)
+    start = time.perf_counter()
+    queued, skipped, already_queued = enqueue_merge(template, args.kind, _contact_filters(args), args.search,
+                                                    args.due_before)
+    print(f"Queued {queued} emails, skipped {skipped} contacts without an email address and "
+          f"{already_queued} already queued or sent this template ({time.perf_counter() - start:.1f}s)")
+
+
+def send(args):
+    database = _use_database(args.sqlite_path)
+    from services import email_sender
+
+    if not email_sender.is_configured():
+        sys.exit("Set SMTP_HOST and SMTP_FROM (see services/email_sender.py) to send")
+    sender = email_sender.OutboundSender()
+    start = time.perf_counter()
+    if args.once:
+        sent = sender.drain()
+        summary = database.get_outbound_summary()
+        print(f"Sent {sent} emails ({time.perf_counter() - start:.1f}s); {summary['counts']['queued']} still queued, "
+              f"{summary['counts']['failed']} failed")
+        return
+    sender.start()
+    print(f"Sending through {email_sender.SMTP_HOST}:{email_sender.SMTP_PORT}; Ctrl-C to stop", flush=True)
+    try:
+        while True:
+            time.sleep(60)
+            stats = sender.stats()
+            print(f"  {stats['sent']} sent, {stats['retried']} retried, {stats['failed']} failed", flush=True)
+    except KeyboardInterrupt:
+        sender.stop()
+        print(f"Stopped after sending {sender.sent} emails")
+
+
+def track(args):
+    database = _use_database(args.sqlite_path)
+    database.init_database()
+    import tracking
+    from services.tracking_server import start_tracking_server, stop_tracking_server
+    from services.event_ingest import get_event_buffer
+
+    if not tracking.TRACKING_SECRET:
+        sys.exit("Set TRACKING_SECRET (the same value the sender uses) to verify tracking links")
+    server = start_tracking_server(args.port, args.host)
+    print(f"Tracking on http://{args.host}:{server.server_address[1]}; Ctrl-C to stop", flush=True)
+    buffer = get_event_buffer()
+    try:
+        while True:
+            time.sleep(10)
+            stats = buffer.stats()
+            print(f"  {stats['received']} received, {stats['written']} written, {stats['buffered']} buffered, "
+                  f"{stats['dropped']} dropped", flush=True)
+    except KeyboardInterrupt:
+        stop_tracking_server()
+        print(f"Stopped after writing {buffer.written} events")
+
+
+def vacuum(args):
+    database = _use_database(args.sqlite_path)
+    start = time.perf_counter()
+    sizes = database.vacuum_database()
+    if sizes:
+        print(f"Vacuumed {database.SQLITE_PATH}: {sizes[0] / 1e6:.1f} MB -> {sizes[1] / 1e6:.1f} MB")
+    print(f"Vacuum and analyze finished ({time.perf_counter() - start:.1f}s)")
+
+
+def _confirm(args, action):
+    if not args.yes:
+        sys.exit(f"Refusing to {action} without --yes")
+
+
+def delete_all(args):
+    _confirm(args, "delete all contacts")
+    database = _use_database(args.sqlite_path)
+    print(f"Deleted {database.delete_all_contacts()} contacts")
+
+
+def reset(args):
+    _confirm(args, "reset the database")
+    database = _use_database(args.sqlite_path)
+    if database.is_postgres():
+        sys.exit("reset only applies to the SQLite database")
+    if not database.reset_database():
+        sys.exit(f"Could not reset {database.SQLITE_PATH}")
+    print(f"Reset {database.SQLITE_PATH}")
+
+
+def stats(args):
+    database = _use_database(args.sqlite_path)
+    aggregates = database.get_contact_aggregates()
+    print(f"Contacts: {aggregates['total_contacts']}")
+    print(f"Templates: {aggregates['total_templates']}")
+    print(f"Duplicate groups: {aggregates['duplicate_groups']}")
+    for status, count in sorted(aggregates['status_counts'].items(), key=lambda item: -item[1]):
+        print(f"  {status or 'Unknown'}: {count}")
+
+
+def _positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def _add_segment_arguments(parser):
+    parser.add_argument('--status')
+    parser.add_argument('--company')
+    parser.add_argument('--niche')
+    parser.add_argument('--location')
+    parser.add_argument('--search')
+    parser.add_argument('--due-before', type=date.fromisoformat, help="Follow-ups due by YYYY-MM-DD")
+
+
+def main(argv=None):
+    # Imported here so .env is loaded before database reads its settings
+    from database import MERGE_POLICIES, OUTBOUND_KINDS
+    from services.export_service import EXPORT_FORMATS
+
+    parser = argparse.ArgumentParser(description="Cold Email Tracker command line")
+    parser.add_argument('--sqlite-path', help="SQLite database file (ignored when DB_URL is set)")
+    parser.add_argument('--verbose', action='store_true', help="Log database activity, including slow queries")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = commands.add_parser('import', help="Import CSV/XLSX/XLS files")
+    import_parser.add_argument('files', nargs='+')
+    import_parser.add_argument('--workers', type=_positive_int, default=os.cpu_count() or 1, help="Files imported in parallel")
+    import_parser.add_argument('--merge-policy', choices=MERGE_POLICIES,
+                               help="How duplicates merge into existing contacts")
+    import_parser.set_defaults(func=import_files)
+
+    dedup_parser = commands.add_parser('dedup', help="Remove duplicate contacts")
+    dedup_parser.add_argument('--fuzzy', action='store_true',
+                              help="Also queue likely duplicates (nicknames, suffixes, URL forms) for review")
+    dedup_parser.add_argument('--merge', action='store_true', help="Merge every fuzzy cluster found")
+    dedup_parser.set_defaults(func=dedup)
+
+    export_parser = commands.add_parser('export', help="Export contacts matching filters")
+    export_parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv')
+    export_parser.add_argument('--output', help="Output file (default contacts.<format>)")
+    _add_segment_arguments(export_parser)
+    export_parser.set_defaults(func=export)
+
+    merge_parser = commands.add_parser('merge', help="Render a template for every matching contact")
+    merge_parser.add_argument('template', type=int, help="Template id")
+    merge_parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv')
+    merge_parser.add_argument('--output', help="Output file (default mail_merge_<id>.<format>)")
+    _add_segment_arguments(merge_parser)
+    merge_parser.set_defaults(func=merge)
+
+    enqueue_parser = commands.add_parser('enqueue', help="Queue a template's emails for sending")
+    enqueue_parser.add_argument('template', type=int, help="Template id")
+    enqueue_parser.add_argument('--kind', choices=OUTBOUND_KINDS, default='initial',
+                                help="followup moves contacts along their cadence once sent")
+    _add_segment_arguments(enqueue_parser)
+    enqueue_parser.set_defaults(func=enqueue)
+
+    send_parser = commands.add_parser('send', help="Send queued emails through SMTP_HOST")
+    send_parser.add_argument('--once', action='store_true', help="Send what is due now, then exit")
+    send_parser.set_defaults(func=send)
+
+    track_parser = commands.add_parser('track', help="Serve open pixels, click redirects and reply callbacks")
+    track_parser.add_argument('--port', type=int, default=8080)
+    track_parser.add_argument('--host', default='0.0.0.0')
+    track_parser.set_defaults(func=track)
+
+    commands.add_parser('vacuum', help="Reclaim space and refresh statistics").set_defaults(func=vacuum)
+    commands.add_parser('stats', help="Print contact counts").set_defaults(func=stats)
+
+    delete_parser = commands.add_parser('delete-all', help="Delete every contact")
+    delete_parser.add_argument('--yes', action='store_true')
+    delete_parser.set_defaults(func=delete_all)
+
+    reset_parser = commands.add_parser('reset', help="Drop and recreate the SQLite tables")
+    reset_parser.add_argument('--yes', action='store_true')
+    reset_parser.set_defaults(func=reset)
+
+    args = parser.parse_args(argv)
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.ERROR)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    load_dotenv()
+    main()
@@ -1,5 +1,7 @@
 from .contact_card import contact_card
 from .metric_card import metric_card
 from .status_badge import status_badge
+from .profile_panel import profile_panel
+from .file_download import prepare_file, prepared_file, file_download
 
-__all__ = ["contact_card", "metric_card", "status_badge"]
\ No newline at end of file
+__all__ = ["contact_card", "metric_card", "status_badge", "profile_panel", "prepare_file", "prepared_file", "file_download"]
\ No newline at end of file
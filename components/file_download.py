@@ -0,0 +1,58 @@
+import os
+import weakref
+import tempfile
+import streamlit as st
+
+def _remove(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+class PreparedFile:
+    """A temporary file on disk, removed as soon as nothing refers to it:
+    when another file replaces it in the session, when the session ends and
+    its state is dropped, or at exit"""
+
+    def __init__(self, key, path, result):
+        self.key = key
+        self.path = path
+        self.result = result
+        self.remove = weakref.finalize(self, _remove, path)
+
+def prepare_file(state_key, key, write):
+    """Run write(out) into a temporary file on disk, kept under state_key
+    (with key and write's result) for file_download. Only the path is held
+    in the session, never the file's bytes; returns write's result."""
+    drop_file(state_key)
+    with tempfile.NamedTemporaryFile(prefix='cold_email_tracker_', delete=False) as out:
+        try:
+            result = write(out)
+        except BaseException:
+            out.close()
+            _remove(out.name)
+            raise
+    st.session_state[state_key] = PreparedFile(key, out.name, result)
+    return result
+
+def drop_file(state_key):
+    prepared = st.session_state.pop(state_key, None)
+    if prepared is not None:
+        prepared.remove()
+
+def prepared_file(state_key, key):
+    """(path, result) of the file prepared for key, or None when there is
+    none or it was prepared for another key (which is then removed)"""
+    prepared = st.session_state.get(state_key)
+    if prepared is None:
+        return None
+    if prepared.key != key or not os.path.exists(prepared.path):
+        drop_file(state_key)
+        return None
+    return prepared.path, prepared.result
+
+def file_download(label, path, file_name, mime, key):
+    """Download button for a prepared file, read from disk on each render
+    rather than kept in the session; the file stays until replaced"""
+    with open(path, 'rb') as f:
+        st.download_button(label, f, file_name=file_name, mime=mime, key=key)
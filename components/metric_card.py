@@ -6,7 +6,7 @@ def metric_card(title, content_lines, urgent=False):
     
     # Generate content HTML
     content_html = "".join(
-        [f'<p style="color: #6c757d !important;"><strong>{line.split(":")[0]}:</strong> {line.split(":")[1].strip()}</p>' 
+        [f'<p style="color: #6c757d !important;"><strong>{line.split(":", 1)[0]}:</strong> {line.split(":", 1)[1].strip()}</p>' 
          for line in content_lines]
     )
     
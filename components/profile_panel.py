@@ -0,0 +1,25 @@
+import streamlit as st
+import pandas as pd
+
+def profile_panel(run):
+    """Collapsible sidebar breakdown of one profiled rerun"""
+    with st.sidebar.expander(f"⏱️ Profile: {run['page']} ({run['total_ms']:.0f} ms)"):
+        st.markdown(
+            f"**Loading:** {run['load_ms']:.0f} ms  \n"
+            f"**Page code:** {run['section_ms']:.0f} ms  \n"
+            f"**Widgets:** {run['render_ms']:.0f} ms"
+        )
+        if run['calls']:
+            calls = pd.DataFrame(run['calls']).sort_values('start_ms')
+            calls['name'] = ['  ' * depth + name for depth, name in zip(calls['depth'], calls['name'])]
+            if 'cache' not in calls:
+                calls['cache'] = None
+            st.dataframe(
+                calls[['name', 'ms', 'cache']],
+                column_config={'name': "Call", 'ms': st.column_config.NumberColumn("ms", format="%.1f"), 'cache': "Cache"},
+                hide_index=True,
+                use_container_width=True
+            )
+        if run.get('trace'):
+            st.code(run['trace'], language=None)
+        st.caption("Loads run through gather() overlap, so they can add up to more than the loading time")
@@ -268,40 +268,831 @@
 
 ######################
 import os
+import re
+import io
+import sys
+import csv
 import psycopg2
 import pandas as pd
 from datetime import datetime, timedelta
 import logging
+import threading
+import functools
+import time
+import atexit
+import itertools
+import contextvars
+from collections import deque
 from psycopg2 import sql
 from psycopg2.extras import DictCursor
 import sqlite3
+from dedup import dedup_key, company_key, company_color, find_duplicate_clusters
+from migrations import (
+    apply_migrations, SQLITE_CONNECTION_PRAGMAS, SEARCH_COLUMNS, PG_SEARCH_VECTOR, ENGAGEMENT_COLUMNS,
+    EVENT_COUNT_COLUMNS
+)
+from query_stats import get_query_stats, start_metrics_server, QUERY_STATS_ENABLED
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+SQLITE_PATH = 'email_tracker.db'
+
+# Pool settings (overridable through the environment)
+POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN', 1))
+POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX', 10))
+POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+POOL_HEALTH_CHECK_INTERVAL = float(os.environ.get('DB_POOL_HEALTH_CHECK_INTERVAL', 60))
+
+# Read replicas: reads go to a replica whose lag is within REPLICA_MAX_LAG
+# seconds; lag is re-measured at most every REPLICA_CHECK_INTERVAL seconds
+REPLICA_MAX_LAG = float(os.environ.get('DB_REPLICA_MAX_LAG', 5))
+REPLICA_CHECK_INTERVAL = float(os.environ.get('DB_REPLICA_CHECK_INTERVAL', 5))
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes available in time"""
+
+
+class _PoolMetrics:
+    """Counters shared by both pool implementations"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.created = 0
+        self.discarded = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record_wait(self, waited):
+        with self._lock:
+            self.acquired += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+    def incr(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'acquired': self.acquired,
+                'created': self.created,
+                'discarded': self.discarded,
+                'timeouts': self.timeouts,
+                'avg_wait_ms': (self.total_wait / self.acquired * 1000) if self.acquired else 0.0,
+                'max_wait_ms': self.max_wait * 1000,
+            }
+
+
+class PostgresPool:
+    """Bounded, thread-safe pool of psycopg2 connections"""
+
+    def __init__(self, dsn, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE,
+                 timeout=POOL_TIMEOUT, health_check_interval=POOL_HEALTH_CHECK_INTERVAL):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError("Invalid pool size: need 1 <= max_size and min_size <= max_size")
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.metrics = _PoolMetrics()
+        self._idle = deque()  # (connection, last_used)
+        self._size = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+        for _ in range(min_size):
+            self._idle.append((self._connect(), time.monotonic()))
+            self._size += 1
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn, cursor_factory=DictCursor)
+        self.metrics.incr('created')
+        return conn
+
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        self.metrics.incr('discarded')
+
+    def acquire(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.metrics.incr('timeouts')
+                    raise PoolTimeout(f"No database connection available after {self.timeout}s")
+                self._cond.wait(remaining)
+
+        # Connect / health-check outside the lock so other threads are not blocked
+        try:
+            if conn is None:
+                conn = self._connect()
+            elif not self._is_healthy(conn, last_used):
+                self._discard(conn)
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        self.metrics.record_wait(time.monotonic() - start)
+        return conn
+
+    def release(self, conn, broken=False):
+        if broken or conn.closed:
+            self._discard(conn)
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            return
+        with self._cond:
+            if self._closed:
+                conn.close()
+                self._size -= 1
+                return
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                conn.close()
+                self._size -= 1
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            in_use = self._size - len(self._idle)
+            info = {
+                'backend': 'postgres',
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': in_use,
+            }
+        info.update(self.metrics.snapshot())
+        return info
+
+
+class SQLitePool:
+    """Keeps one persistent SQLite connection per thread"""
+
+    def __init__(self, path=SQLITE_PATH, health_check_interval=POOL_HEALTH_CHECK_INTERVAL, read_only=False):
+        self.path = path
+        self.read_only = read_only
+        self.health_check_interval = health_check_interval
+        self.metrics = _PoolMetrics()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = {}  # connection -> owning thread
+
+    def _connect(self):
+        # Streamlit runs each rerun on a fresh thread, so reap connections
+        # left behind by threads that have since exited
+        with self._lock:
+            dead = [c for c, owner in self._connections.items() if not owner.is_alive()]
+            for c in dead:
+                del self._connections[c]
+        for c in dead:
+            c.close()
+            self.metrics.incr('discarded')
+
+        if self.read_only:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for pragma in SQLITE_CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        self.metrics.incr('created')
+        with self._lock:
+            self._connections[conn] = threading.current_thread()
+        return conn
+
+    def _forget(self, conn):
+        with self._lock:
+            self._connections.pop(conn, None)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        self.metrics.incr('discarded')
+
+    def acquire(self):
+        start = time.monotonic()
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and time.monotonic() - getattr(self._local, 'last_used', 0) >= self.health_check_interval:
+            try:
+                conn.execute('SELECT 1')
+            except sqlite3.Error:
+                self._forget(conn)
+                conn = None
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        self.metrics.record_wait(time.monotonic() - start)
+        return conn
+
+    def release(self, conn, broken=False):
+        if broken:
+            self._forget(conn)
+            self._local.conn = None
+            return
+        self._local.last_used = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = list(self._connections), {}
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+    def stats(self):
+        with self._lock:
+            open_connections = len(self._connections)
+        info = {'backend': 'sqlite', 'path': self.path, 'open_connections': open_connections}
+        info.update(self.metrics.snapshot())
+        return info
+
+
+def _query_caller(frame):
+    """Name of the public database function a query was issued from"""
+    first = frame
+    while frame is not None and frame.f_code.co_filename == __file__:
+        name = frame.f_code.co_name
+        if not name.startswith('_') and name != 'wrapper':
+            return name
+        frame = frame.f_back
+    return first.f_code.co_name if first is not None else 'unknown'
+
+
+class _TimedCursor:
+    """Cursor mixin recording each statement in the query stats.
+
+    A statement is timed from execute through its last fetch (SQLite only
+    steps to the first row on execute) and recorded once the next statement
+    starts or the cursor closes. Slow SELECTs get a sampled EXPLAIN.
+    """
+
+    backend = None
+    _query = None
+
+    def _run(self, method, query, args, many=False):
+        self._finish()
+        caller = _query_caller(sys._getframe(2))
+        start = time.perf_counter()
+        try:
+            result = method(query, *args)
+        except Exception:
+            get_query_stats().record(self._text(query), caller, self.backend,
+                                     time.perf_counter() - start, failed=True)
+            raise
+        self._query = query
+        self._params = None if many else args
+        self._caller = caller
+        self._elapsed = time.perf_counter() - start
+        # Postgres reports the rows a SELECT returned; SQLite only those changed
+        self._rows = self.rowcount
+        self._count_fetched = self.rowcount < 0
+        return result
+
+    def _fetched(self, start, rows):
+        if self._query is not None:
+            self._elapsed += time.perf_counter() - start
+            if self._count_fetched:
+                self._rows = max(self._rows, 0) + rows
+
+    def execute(self, query, *args):
+        return self._run(super().execute, query, args)
+
+    def executemany(self, query, *args):
+        return self._run(super().executemany, query, args, many=True)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start, row is not None)
+        return row
+
+    def fetchmany(self, *args):
+        start = time.perf_counter()
+        rows = super().fetchmany(*args)
+        self._fetched(start, len(rows))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, len(rows))
+        return rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def _text(self, query):
+        return query if isinstance(query, str) else query.as_string(self)
+
+    def _finish(self):
+        query, self._query = self._query, None
+        if query is None:
+            return
+        stats = get_query_stats()
+        text = self._text(query)
+        slow = stats.record(text, self._caller, self.backend, self._elapsed, self._rows)
+        if slow is not None and self._params is not None and stats.wants_plan(slow):
+            plan = self._explain(text, self._params)
+            if plan:
+                stats.add_plan(slow, plan)
+
+
+class _TimedSQLiteCursor(_TimedCursor, sqlite3.Cursor):
+    backend = 'sqlite'
+
+    def _explain(self, query, params):
+        # A separate cursor, so the rows of the explained query stay readable
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(f"EXPLAIN QUERY PLAN {query}", *params)
+            return '\n'.join(row[3] for row in cursor.fetchall())
+        except sqlite3.Error as e:
+            logger.warning(f"Could not capture query plan: {e}")
+            return None
+        finally:
+            cursor.close()
+
+
+class _TimedPostgresCursor(_TimedCursor, DictCursor):
+    backend = 'postgres'
+
+    def _explain(self, query, params):
+        conn = self.connection
+        if conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+            return None
+        cursor = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+        try:
+            # A failed EXPLAIN must not abort the caller's transaction
+            cursor.execute("SAVEPOINT query_plan")
+            try:
+                cursor.execute(f"EXPLAIN {query}", *params)
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+            except psycopg2.Error:
+                cursor.execute("ROLLBACK TO SAVEPOINT query_plan")
+                raise
+            cursor.execute("RELEASE SAVEPOINT query_plan")
+            return plan
+        except psycopg2.Error as e:
+            logger.warning(f"Could not capture query plan: {e}")
+            return None
+        finally:
+            cursor.close()
+
+
+def _open_cursor(conn):
+    if not QUERY_STATS_ENABLED:
+        return conn.cursor()
+    if isinstance(conn, sqlite3.Connection):
+        return conn.cursor(factory=_TimedSQLiteCursor)
+    return conn.cursor(cursor_factory=_TimedPostgresCursor)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def is_postgres():
+    return "DB_URL" in os.environ
+
+
+def _sql(query):
+    """Adapt a query written with ? placeholders to the active backend"""
+    return query.replace('?', '%s') if is_postgres() else query
+
+
+def get_pool(replica=None):
+    """Return the process-wide pool for the configured backend, or for one
+    of its read replicas"""
+    key = replica or os.environ.get('DB_URL') or SQLITE_PATH
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                if "DB_URL" in os.environ:
+                    pool = PostgresPool(key)
+                else:
+                    pool = SQLitePool(key, read_only=replica is not None)
+                _pools[key] = pool
+    return pool
+
+
+def get_pool_stats():
+    return get_pool().stats()
+
+
+def get_replicas():
+    """Configured read replicas: DB_READ_URLS for Postgres, SQLITE_READ_PATHS
+    (read-only copies of the database file) for SQLite; comma-separated"""
+    setting = os.environ.get('DB_READ_URLS' if is_postgres() else 'SQLITE_READ_PATHS', '')
+    return [target.strip() for target in setting.split(',') if target.strip()]
+
+
+# Read-your-writes: the last write time of each session. Streamlit pages set
+# the session with set_routing_session; other callers share the None session.
+_routing_session = contextvars.ContextVar('routing_session', default=None)
+# Set while a read fills a cache shared by every session
+_shared_cache_fill = contextvars.ContextVar('shared_cache_fill', default=False)
+_last_writes = {}
+_replica_lag = {}  # replica -> (checked_at, lag in seconds or None if unreachable)
+_routing_lock = threading.Lock()
+_replica_turn = itertools.count()
+_routing_counts = {'primary': 0, 'replica': 0, 'fallback': 0}
+
+
+def set_routing_session(session_id):
+    _routing_session.set(session_id)
+
+
+def _record_write():
+    now = time.monotonic()
+    with _routing_lock:
+        _last_writes[_routing_session.get()] = now
+        if len(_last_writes) > 1000:
+            for session, written in list(_last_writes.items()):
+                if now - written > REPLICA_MAX_LAG + REPLICA_CHECK_INTERVAL:
+                    del _last_writes[session]
+
+
+def _wrote_recently():
+    # Any replica we read from lags at most REPLICA_MAX_LAG (as of a check up
+    # to REPLICA_CHECK_INTERVAL old), so after that long it holds the write
+    with _routing_lock:
+        written = _last_writes.get(_routing_session.get())
+    return written is not None and time.monotonic() - written < REPLICA_MAX_LAG + REPLICA_CHECK_INTERVAL
+
+
+def _sqlite_modified(path):
+    return max((os.path.getmtime(p) for p in (path, path + '-wal') if os.path.exists(p)), default=0)
+
+
+def _measure_replica_lag(replica):
+    if not is_postgres():
+        # A file copy is as stale as the primary's newest change it lacks
+        return max(_sqlite_modified(SQLITE_PATH) - _sqlite_modified(replica), 0.0)
+    pool = get_pool(replica)
+    conn = pool.acquire()
+    broken = False
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+        SELECT CASE
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+        END
+        ''')
+        lag = float(cursor.fetchone()[0])
+        conn.rollback()
+        return lag
+    except psycopg2.Error:
+        broken = True
+        raise
+    finally:
+        pool.release(conn, broken=broken)
+
+
+def _replica_lag_seconds(replica):
+    with _routing_lock:
+        checked = _replica_lag.get(replica)
+    if checked is not None and time.monotonic() - checked[0] < REPLICA_CHECK_INTERVAL:
+        return checked[1]
+    try:
+        lag = _measure_replica_lag(replica)
+    except (psycopg2.Error, sqlite3.Error, OSError, PoolTimeout) as e:
+        logger.warning(f"Replica {_redact(replica)} unavailable: {e}")
+        lag = None
+    with _routing_lock:
+        _replica_lag[replica] = (time.monotonic(), lag)
+    return lag
+
+
+def _redact(target):
+    # Keep passwords in replica URLs out of logs and the UI
+    return re.sub(r'://([^:/@]+):[^@]+@', r'://\1:***@', target)
+
+
+def _count_route(route):
+    with _routing_lock:
+        _routing_counts[route] += 1
+
+
+def _bumped_recently():
+    # A data version changed so recently that a replica may not have the write
+    return time.monotonic() - _last_bump < REPLICA_MAX_LAG + REPLICA_CHECK_INTERVAL
+
+
+def fill_shared_cache(func, *args, **kwargs):
+    """Run a read whose result is cached for every session under the current
+    data versions. Right after a version changes (a write by any session or
+    process), such reads go to the primary: rows a lagging replica returned
+    would be cached under the new version, hiding the write from everyone,
+    the writer included."""
+    token = _shared_cache_fill.set(True)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _shared_cache_fill.reset(token)
+
+
+def _pick_replica():
+    """A replica fresh enough for this session's reads, or None for the primary"""
+    replicas = get_replicas()
+    if not replicas:
+        return None
+    if _wrote_recently():
+        return None
+    if _shared_cache_fill.get() and _bumped_recently():
+        return None
+    start = next(_replica_turn)
+    for i in range(len(replicas)):
+        replica = replicas[(start + i) % len(replicas)]
+        lag = _replica_lag_seconds(replica)
+        if lag is not None and lag <= REPLICA_MAX_LAG:
+            return replica
+    _count_route('fallback')
+    return None
+
+
+def get_routing_stats():
+    with _routing_lock:
+        counts = dict(_routing_counts)
+        lags = dict(_replica_lag)
+    replicas = []
+    for replica in get_replicas():
+        pool = _pools.get(replica)
+        lag = lags.get(replica, (None, None))[1]
+        replicas.append({
+            'replica': _redact(replica),
+            'lag_s': lag,
+            'healthy': lag is not None and lag <= REPLICA_MAX_LAG,
+            'pool': pool.stats() if pool else None,
+        })
+    return {'reads': counts, 'replicas': replicas, 'max_lag_s': REPLICA_MAX_LAG}
+
+
+
+def get_query_report(limit=20):
+    """Busiest queries by total time and by p95, plus the slow-query log"""
+    stats = get_query_stats()
+    return {
+        'by_total': stats.top(limit, by='total_ms'),
+        'by_p95': stats.top(limit, by='p95_ms'),
+        'slow': stats.slow_queries(),
+        'slow_query_ms': stats.slow_query_ms,
+        'since': datetime.fromtimestamp(stats.started_at),
+        'dropped': stats.dropped,
+    }
+
+
+def get_query_metrics():
+    """Query stats in the Prometheus text exposition format"""
+    return get_query_stats().prometheus_text()
+
+
+def reset_query_stats():
+    get_query_stats().reset()
+
+@atexit.register
+def close_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+# Per-table data versions. Writes bump the version of the tables they touch
+# and cached readers include it in their cache keys, so a write only
+# invalidates the caches that depend on what changed. Bumps are also counted
+# in the data_versions table, which get_data_version re-reads at most every
+# DATA_VERSION_POLL_SECONDS, so writes made by other processes (the CLI,
+# another app process, the tracking server) reach this process's caches too.
+DATA_VERSION_POLL_SECONDS = float(os.environ.get('DATA_VERSION_POLL_SECONDS', 2))
+_data_versions = {}
+_data_versions_lock = threading.Lock()
+_data_versions_polled = 0.0
+_data_version_listeners = []
+# When a data version last changed, in or outside this process
+_last_bump = 0.0
+# Transactions committed by DatabaseConnection on each thread
+_commits = threading.local()
+
+
+def _notify_listeners(tables):
+    with _data_versions_lock:
+        listeners = list(_data_version_listeners)
+    for listener in listeners:
+        listener(tables)
+
+
+def _poll_data_versions():
+    """Take up versions bumped by other processes, at most every
+    DATA_VERSION_POLL_SECONDS"""
+    global _data_versions_polled, _last_bump
+    now = time.monotonic()
+    with _data_versions_lock:
+        if now - _data_versions_polled < DATA_VERSION_POLL_SECONDS:
+            return
+        _data_versions_polled = now
+    try:
+        with DatabaseConnection() as cursor:
+            cursor.execute('SELECT name, version FROM data_versions')
+            shared = dict(cursor.fetchall())
+    except (psycopg2.Error, sqlite3.Error, PoolTimeout) as e:
+        # Before the first migration, or while the database is unavailable
+        logger.debug(f"Could not read shared data versions: {e}")
+        return
+    with _data_versions_lock:
+        changed = tuple(table for table, version in shared.items() if version > _data_versions.get(table, 0))
+        for table in changed:
+            _data_versions[table] = shared[table]
+        if changed:
+            _last_bump = time.monotonic()
+    if changed:
+        _notify_listeners(changed)
+
+
+def get_data_version(*tables):
+    _poll_data_versions()
+    with _data_versions_lock:
+        return tuple(_data_versions.get(table, 0) for table in tables)
+
+
+def _share_bump(tables):
+    """Count a bump in data_versions; returns the new shared versions"""
+    versions = {}
+    try:
+        with DatabaseConnection() as cursor:
+            for table in tables:
+                cursor.execute(_sql('''
+                INSERT INTO data_versions (name, version) VALUES (?, 1)
+                ON CONFLICT (name) DO UPDATE SET version = data_versions.version + 1
+                RETURNING version
+                '''), (table,))
+                versions[table] = cursor.fetchone()[0]
+    except (psycopg2.Error, sqlite3.Error, PoolTimeout) as e:
+        logger.warning(f"Other processes will see this write only when their caches expire: {e}")
+    return versions
+
+
+def bump_data_version(*tables):
+    global _last_bump
+    shared = _share_bump(tables)
+    with _data_versions_lock:
+        for table in tables:
+            _data_versions[table] = max(_data_versions.get(table, 0) + 1, shared.get(table, 0))
+        _last_bump = time.monotonic()
+    _notify_listeners(tables)
+
+
+def add_data_version_listener(callback):
+    """Call callback(tables) after every data version bump seen by this
+    process: its own writes at once, other processes' when polled"""
+    with _data_versions_lock:
+        _data_version_listeners.append(callback)
+
+
+def _commit_count():
+    return getattr(_commits, 'count', 0)
+
+
+def _record_commit():
+    _commits.count = _commit_count() + 1
+
+
+def writes_tables(*tables, changed=None):
+    """Decorator bumping the data version of tables once a write has
+    committed; a call that fails before committing anything bumps nothing.
+
+    changed, given the return value, tells whether the write changed
+    anything at all (e.g. changed=bool for functions returning a row count),
+    so writes that matched no rows do not invalidate every cached view.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            commits = _commit_count()
+            result, failed = None, True
+            try:
+                result = func(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                # Chunked writes may have committed some chunks before failing
+                if _commit_count() != commits and (failed or changed is None or changed(result)):
+                    _record_write()
+                    bump_data_version(*tables)
+        return wrapper
+    return decorator
+
+
 # Database connection context manager
 class DatabaseConnection:
-    def __init__(self):
+    """Cursor on a pooled connection, committed on success.
+
+    read_only=True lets the read go to a read replica (see _pick_replica);
+    writes, and reads of a session that has just written, use the primary.
+    """
+
+    def __init__(self, read_only=False):
+        self.read_only = read_only
         self.conn = None
-        
+        self.pool = None
+        self.cursor = None
+
     def __enter__(self):
-        if "DB_URL" in os.environ:
-            # PostgreSQL connection
-            self.conn = psycopg2.connect(os.environ['DB_URL'], cursor_factory=DictCursor)
-        else:
-            # SQLite connection (for local development)
-            self.conn = sqlite3.connect('email_tracker.db')
-            self.conn.row_factory = sqlite3.Row
-        return self.conn.cursor()
-    
+        # PostgreSQL when DB_URL is set, SQLite (for local development) otherwise
+        replica = _pick_replica() if self.read_only else None
+        if replica is not None:
+            try:
+                self.pool = get_pool(replica)
+                self.conn = self.pool.acquire()
+                _count_route('replica')
+                self.cursor = _open_cursor(self.conn)
+                return self.cursor
+            except (psycopg2.Error, sqlite3.Error, PoolTimeout) as e:
+                logger.warning(f"Falling back to the primary: replica {_redact(replica)} failed: {e}")
+                with _routing_lock:
+                    _replica_lag[replica] = (time.monotonic(), None)
+                _count_route('fallback')
+        if self.read_only:
+            _count_route('primary')
+        self.pool = get_pool()
+        self.conn = self.pool.acquire()
+        self.cursor = _open_cursor(self.conn)
+        return self.cursor
+
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if exc_type is None:
-            self.conn.commit()
-        else:
-            logger.error(f"Database error: {exc_val}")
-            self.conn.rollback()
-        self.conn.close()
+        broken = False
+        try:
+            # Closing records the cursor's last statement in the query stats
+            self.cursor.close()
+            if exc_type is None:
+                self.conn.commit()
+                if not self.read_only:
+                    _record_commit()
+            else:
+                logger.error(f"Database error: {exc_val}")
+                self.conn.rollback()
+        except (psycopg2.Error, sqlite3.Error) as e:
+            logger.error(f"Database error on connection release: {e}")
+            broken = True
+            if exc_type is None:
+                raise
+        finally:
+            if exc_type is not None and isinstance(exc_val, (psycopg2.OperationalError, psycopg2.InterfaceError)):
+                broken = True
+            self.pool.release(self.conn, broken=broken)
+            self.conn = None
+            self.cursor = None
 
 # Initialize database
 def init_database():
@@ -363,71 +1154,1039 @@ def init_database():
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
             ''')
-            
- 
-           # ... rest of SQLite init code ...
+
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS templates (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                body TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            ''')
+
+    # Versioned schema changes (indexes, pragmas, ...) on top of the base tables
+    migrate_database()
+
+
+def migrate_database():
+    """Apply pending schema migrations; returns the versions applied"""
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        applied = apply_migrations(conn, postgres=is_postgres())
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        pool.release(conn, broken=True)
+        raise
+    pool.release(conn)
+    return applied
+
+
+def vacuum_database():
+    """Reclaim free space and refresh the planner statistics.
+
+    Returns the SQLite file size before and after in bytes (None on Postgres).
+    """
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        if is_postgres():
+            # VACUUM cannot run inside a transaction block
+            conn.autocommit = True
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute('VACUUM ANALYZE')
+            finally:
+                conn.autocommit = False
+            sizes = None
+        else:
+            before = os.path.getsize(SQLITE_PATH)
+            conn.commit()
+            conn.execute('VACUUM')
+            conn.execute('ANALYZE')
+            conn.execute('PRAGMA optimize')
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            sizes = (before, os.path.getsize(SQLITE_PATH))
+    except Exception as e:
+        logger.error(f"Vacuum failed: {e}")
+        pool.release(conn, broken=True)
+        raise
+    pool.release(conn)
+    return sizes
+
 # # Contact operations
-def insert_contact(contact_data):
+# How an insert merges into an existing contact with the same dedup key
+MERGE_POLICIES = ('keep_first', 'keep_newest', 'fill_nulls')
+DEFAULT_MERGE_POLICY = os.environ.get('DEDUP_MERGE_POLICY', 'keep_first')
+
+# Columns a merge may change; identity and tracking state (status, dates) stay put
+MERGEABLE_COLUMNS = [
+    'email', 'job_title', 'linkedin_url', 'company_website', 'company_linkedin',
+    'company_social', 'company_twitter', 'location', 'company_niche',
+]
+
+def _conflict_clause(policy):
+    if policy not in MERGE_POLICIES:
+        raise ValueError(f"Unknown merge policy {policy!r}")
+    if policy == 'keep_first':
+        return 'ON CONFLICT (dedup_key) DO NOTHING'
+    if policy == 'keep_newest':
+        # New non-blank values win
+        assignments = [f"{c} = COALESCE(NULLIF(excluded.{c}, ''), contacts.{c})" for c in MERGEABLE_COLUMNS]
+    else:
+        # Only blanks in the existing contact are filled
+        assignments = [f"{c} = COALESCE(NULLIF(contacts.{c}, ''), excluded.{c})" for c in MERGEABLE_COLUMNS]
+    return f"ON CONFLICT (dedup_key) DO UPDATE SET {', '.join(assignments)}"
+
+def _company_delta(row):
+    """Company count change for a newly inserted keyed contact tuple"""
+    return (row[-1], row[CONTACT_INSERT_COLUMNS.index('company_name')],
+            row[CONTACT_INSERT_COLUMNS.index('status')], 1)
+
+def _keyed_rows(rows, policy):
+    """Append the KEY_COLUMNS and collapse duplicates within the batch itself
+    (one statement may not touch the same conflicting row twice)"""
+    name_idx = CONTACT_INSERT_COLUMNS.index('name')
+    company_idx = CONTACT_INSERT_COLUMNS.index('company_name')
+    merge_idx = [CONTACT_INSERT_COLUMNS.index(c) for c in MERGEABLE_COLUMNS]
+    keyed = {}
+    for row in rows:
+        key = dedup_key(row[name_idx], row[company_idx])
+        existing = keyed.get(key)
+        if existing is None:
+            keyed[key] = tuple(row) + (key, company_key(row[company_idx]))
+        elif policy != 'keep_first':
+            old, new = (existing, row) if policy == 'keep_newest' else (row, existing)
+            merged = list(existing)
+            for i in merge_idx:
+                merged[i] = new[i] if new[i] not in (None, '') else old[i]
+            keyed[key] = tuple(merged)
+    return list(keyed.values())
+
+@writes_tables('contacts')
+def insert_contact(contact_data, merge_policy=None):
+    """Insert or merge one contact given as a CONTACT_INSERT_COLUMNS tuple,
+    with or without the trailing email; returns the id of the stored contact"""
+    policy = merge_policy or DEFAULT_MERGE_POLICY
+    contact_data = tuple(contact_data) + (None,) * (len(CONTACT_INSERT_COLUMNS) - len(contact_data))
+    row = _keyed_rows([contact_data], policy)[0]
+    columns = CONTACT_INSERT_COLUMNS + KEY_COLUMNS
+    key = row[len(CONTACT_INSERT_COLUMNS)]
     with DatabaseConnection() as cursor:
-        cursor.execute('''
-        INSERT INTO contacts (
-            name, job_title, linkedin_url, company_name, company_website,
-            company_linkedin, company_social, company_twitter, location, company_niche,
-            applied_date, followup_interval, status
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', contact_data)
-        return cursor.lastrowid
+        cursor.execute(_sql('SELECT id FROM contacts WHERE dedup_key = ?'), (key,))
+        existing = cursor.fetchone()
+        cursor.execute(_sql(f'''
+        INSERT INTO contacts ({', '.join(columns)})
+        VALUES ({', '.join('?' * len(columns))})
+        {_conflict_clause(policy)}
+        '''), row)
+        if existing is not None:
+            return existing[0]
+        _adjust_company_counts(cursor, [_company_delta(row)])
+        cursor.execute(_sql('SELECT id FROM contacts WHERE dedup_key = ?'), (key,))
+        return cursor.fetchone()[0]
+
+CONTACT_COLUMNS = [
+    'id', 'name', 'email', 'job_title', 'linkedin_url', 'company_name', 'company_website',
+    'company_linkedin', 'company_social', 'company_twitter', 'location', 'company_niche',
+    'applied_date', 'followup_interval', 'last_followup_date', 'next_followup_date',
+    'status', 'notes', 'last_opened', 'last_clicked', 'last_replied', 'created_at',
+]
+
+# Low-cardinality columns stored as categoricals in loaded frames
+CATEGORICAL_COLUMNS = ('status', 'company_name', 'company_niche', 'location')
+DATE_COLUMNS = (
+    'applied_date', 'last_followup_date', 'next_followup_date', 'last_opened', 'last_clicked', 'last_replied',
+    'created_at',
+)
+
+def _typed_contact_frame(rows, columns):
+    """Build a compact contacts frame: categoricals for repetitive columns,
+    Arrow-backed strings for free text, dates parsed once"""
+    df = pd.DataFrame.from_records(rows, columns=columns)
+    for column in columns:
+        if column == 'id':
+            df[column] = df[column].astype('int64')
+        elif column == 'followup_interval':
+            df[column] = pd.to_numeric(df[column]).astype('Int32')
+        elif column in DATE_COLUMNS:
+            df[column] = pd.to_datetime(df[column], errors='coerce')
+        elif column in CATEGORICAL_COLUMNS:
+            df[column] = df[column].astype('category')
+        else:
+            df[column] = df[column].astype('string[pyarrow]')
+    return df
+
+def get_all_contacts(columns=None):
+    """All contacts, newest first; columns projects to a subset of CONTACT_COLUMNS"""
+    columns = list(columns or CONTACT_COLUMNS)
+    unknown = set(columns) - set(CONTACT_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown contact columns: {sorted(unknown)}")
+    with DatabaseConnection(read_only=True) as cursor:
+        if not is_postgres():
+            # Plain tuples instead of sqlite3.Row objects
+            cursor.row_factory = None
+        cursor.execute(f"SELECT {', '.join(columns)} FROM contacts ORDER BY created_at DESC, id DESC")
+        return _typed_contact_frame(cursor.fetchall(), columns)
+
+# Columns query_contacts() may filter on by equality / IN
+FILTERABLE_COLUMNS = ('status', 'company_name', 'company_niche', 'location')
+
+# Keyset sort orders: (key expression, direction). 'relevance' needs a search term.
+CONTACT_SORTS = {
+    'newest': ('contacts.created_at', 'DESC'),
+    'oldest': ('contacts.created_at', 'ASC'),
+    'relevance': ('matches.score', 'ASC'),
+}
+
+_search_index_available = {}
+
+def has_search_index():
+    """Whether the full-text index exists (SQLite may lack FTS5)"""
+    key = os.environ.get('DB_URL') or SQLITE_PATH
+    if key not in _search_index_available:
+        if is_postgres():
+            _search_index_available[key] = True
+        else:
+            with DatabaseConnection() as cursor:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'contacts_fts'")
+                _search_index_available[key] = cursor.fetchone() is not None
+    return _search_index_available[key]
+
+def _search_terms(search):
+    return re.findall(r'\w+', search.lower())
+
+def _search_match_query(search):
+    """Subquery yielding (id, score) of contacts matching every search term
+    as a prefix; lower score ranks higher"""
+    terms = _search_terms(search)
+    if is_postgres():
+        tsquery = ' & '.join(f"{term}:*" for term in terms)
+        return (f'''
+        SELECT id, -ts_rank({PG_SEARCH_VECTOR}, query) AS score
+        FROM contacts, to_tsquery('simple', ?) AS query
+        WHERE {PG_SEARCH_VECTOR} @@ query
+        ''', [tsquery])
+    weights = ', '.join(str(weight) for _, weight, _ in SEARCH_COLUMNS)
+    match = ' '.join(f'"{term}"*' for term in terms)
+    return (f'''
+    SELECT rowid AS id, bm25(contacts_fts, {weights}) AS score
+    FROM contacts_fts WHERE contacts_fts MATCH ?
+    ''', [match])
+
+def _contact_where(filters, search, use_index):
+    clauses, params = [], []
+    for column, value in (filters or {}).items():
+        if column not in FILTERABLE_COLUMNS:
+            raise ValueError(f"Cannot filter contacts on {column!r}")
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple, set)):
+            if not value:
+                continue
+            clauses.append(f"contacts.{column} IN ({', '.join('?' * len(value))})")
+            params.extend(value)
+        else:
+            clauses.append(f"contacts.{column} = ?")
+            params.append(value)
+    if search and not use_index:
+        # No full-text index: substring match over the searchable columns
+        like = 'ILIKE' if is_postgres() else 'LIKE'
+        clauses.append('(' + ' OR '.join(f"contacts.{column} {like} ?" for column, _, _ in SEARCH_COLUMNS) + ')')
+        params.extend([f"%{search}%"] * len(SEARCH_COLUMNS))
+    return clauses, params
+
+def _contact_source(filters, search):
+    """FROM clause and WHERE conditions selecting the contacts that match"""
+    use_index = bool(search) and has_search_index()
+    source, source_params = 'contacts', []
+    if use_index:
+        match_sql, source_params = _search_match_query(search)
+        source = f'contacts JOIN ({match_sql}) AS matches ON matches.id = contacts.id'
+    clauses, params = _contact_where(filters, search, use_index)
+    return source, source_params, clauses, params, use_index
+
+def query_contacts(filters=None, search=None, sort='newest', after_cursor=None, limit=20):
+    """Return one page of contacts matching the filters and search.
+
+    Pages are keyset-paginated on (created_at, id), or (search rank, id) for
+    sort='relevance': pass the returned next_cursor back as after_cursor to
+    fetch the following page.
+    """
+    if sort not in CONTACT_SORTS:
+        raise ValueError(f"Unknown sort {sort!r}")
+    if search and not _search_terms(search):
+        search = None
+    source, source_params, clauses, params, use_index = _contact_source(filters, search)
+    if sort == 'relevance' and not use_index:
+        sort = 'newest'
+    key_column, direction = CONTACT_SORTS[sort]
+    select = 'contacts.*, matches.score AS search_rank' if use_index else 'contacts.*'
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+
+    page_clauses, page_params = list(clauses), list(params)
+    if after_cursor is not None:
+        op = '<' if direction == 'DESC' else '>'
+        page_clauses.append(f"({key_column}, contacts.id) {op} (?, ?)")
+        page_params.extend(after_cursor)
+    page_where = f"WHERE {' AND '.join(page_clauses)}" if page_clauses else ''
+
+    with DatabaseConnection(read_only=True) as cursor:
+        cursor.execute(_sql(f'SELECT COUNT(*) FROM {source} {where}'), source_params + params)
+        total = cursor.fetchone()[0]
+
+        # Fetch one extra row to know whether another page follows
+        cursor.execute(_sql(f'''
+        SELECT {select} FROM {source} {page_where}
+        ORDER BY {key_column} {direction}, contacts.id {direction}
+        LIMIT ?
+        '''), source_params + page_params + [limit + 1])
+        rows = [dict(row) for row in cursor.fetchall()]
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more:
+        key_field = 'search_rank' if key_column == 'matches.score' else 'created_at'
+        next_cursor = (rows[-1][key_field], rows[-1]['id'])
+    return {
+        'contacts': pd.DataFrame(rows),
+        'total': total,
+        'next_cursor': next_cursor,
+    }
+
+def get_contact_ids(filters=None, search=None):
+    """Ids of every contact matching the filters and search"""
+    if search and not _search_terms(search):
+        search = None
+    source, source_params, clauses, params, _ = _contact_source(filters, search)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    with DatabaseConnection(read_only=True) as cursor:
+        cursor.execute(_sql(f'SELECT contacts.id FROM {source} {where}'), source_params + params)
+        return [row[0] for row in cursor.fetchall()]
+
+EXPORT_CHUNK_SIZE = 5000
+
+def _segment_source(filters, search, due_before):
+    """_contact_source for a mail-merge segment: due_before keeps contacts
+    with a follow-up scheduled up to that moment"""
+    if search and not _search_terms(search):
+        search = None
+    source, source_params, clauses, params, _ = _contact_source(filters, search)
+    if due_before is not None:
+        clauses.append('EXISTS (SELECT 1 FROM followup_schedule s WHERE s.contact_id = contacts.id AND s.due_at <= ?)')
+        params.append(_timestamp(due_before))
+    return source, source_params, clauses, params
+
+def iter_contacts(filters=None, search=None, due_before=None, columns=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Stream matching contacts as lists of row tuples, chunk_size rows at a time.
+
+    Rows come from a server-side (named) cursor on Postgres and a stepped
+    cursor on SQLite, so memory stays flat however many contacts match.
+    due_before keeps contacts with a follow-up scheduled up to that moment.
+    """
+    columns = list(columns or CONTACT_COLUMNS)
+    unknown = set(columns) - set(CONTACT_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown contact columns: {sorted(unknown)}")
+    source, source_params, clauses, params = _segment_source(filters, search, due_before)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    query = _sql(f'''
+    SELECT {', '.join(f'contacts.{column}' for column in columns)} FROM {source} {where}
+    ORDER BY contacts.created_at DESC, contacts.id DESC
+    ''')
+
+    with DatabaseConnection(read_only=True) as cursor:
+        if is_postgres():
+            stream = cursor.connection.cursor(name='contacts_export', cursor_factory=_TimedPostgresCursor)
+            stream.itersize = chunk_size
+        else:
+            stream = cursor
+            stream.row_factory = None
+        try:
+            stream.execute(query, source_params + params)
+            while True:
+                rows = stream.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield [tuple(row) for row in rows]
+        except GeneratorExit:
+            # The consumer stopped early; nothing to roll back for a read
+            return
+        finally:
+            if stream is not cursor:
+                stream.close()
+
+def get_distinct_values(column):
+    """Sorted distinct non-null values of a filterable contacts column"""
+    if column not in FILTERABLE_COLUMNS:
+        raise ValueError(f"Unknown column {column!r}")
+    with DatabaseConnection(read_only=True) as cursor:
+        cursor.execute(f'SELECT DISTINCT {column} FROM contacts WHERE {column} IS NOT NULL ORDER BY {column}')
+        return [row[0] for row in cursor.fetchall()]
+
+COMPANY_SORTS = {
+    'contacts': 'contact_count DESC, company_key',
+    'name': 'company_key',
+}
+
+def query_companies(search=None, sort='contacts', offset=0, limit=30):
+    """One page of the companies table, each with its per-status counts"""
+    if sort not in COMPANY_SORTS:
+        raise ValueError(f"Unknown sort {sort!r}")
+    where, params = '', []
+    search_key = company_key(search)
+    if search_key:
+        where, params = 'WHERE company_key LIKE ?', [f"%{search_key}%"]
+    with DatabaseConnection(read_only=True) as cursor:
+        cursor.execute(_sql(f'SELECT COUNT(*) FROM companies {where}'), params)
+        total = cursor.fetchone()[0]
+        cursor.execute(_sql(f'''
+        SELECT company_key, name, color, contact_count FROM companies {where}
+        ORDER BY {COMPANY_SORTS[sort]}
+        LIMIT ? OFFSET ?
+        '''), params + [limit, offset])
+        companies = [dict(row) for row in cursor.fetchall()]
+        for company in companies:
+            company['status_counts'] = {}
+        by_key = {company['company_key']: company for company in companies}
+        if by_key:
+            rows = _fetch_for_ids(
+                cursor, 'SELECT company_key, status, contact_count FROM company_status_counts',
+                list(by_key), column='company_key'
+            )
+            for key, status, count in rows:
+                by_key[key]['status_counts'][status] = count
+    return {'companies': companies, 'total': total}
+
+# Upper bound on ids (or keys) bound into one IN (...) list on SQLite
+ID_BATCH_SIZE = 10000
+
+def _id_batches(ids):
+    if is_postgres():
+        # A single array parameter, however many ids
+        yield "= ANY(%s)", [ids]
+        return
+    for start in range(0, len(ids), ID_BATCH_SIZE):
+        batch = ids[start:start + ID_BATCH_SIZE]
+        yield f"IN ({', '.join('?' * len(batch))})", batch
+
+def _for_ids(statement, column, where, condition):
+    where = f"{where} AND " if where else ""
+    return _sql(statement) + f" WHERE {_sql(where)}{column} {condition}"
+
+def _execute_for_ids(cursor, statement, params, ids, column='id', where=None):
+    """Run statement restricted to the given contact ids; returns affected rows.
+    params bind the statement's and then the extra where clause's placeholders."""
+    affected = 0
+    for condition, batch in _id_batches(ids):
+        cursor.execute(_for_ids(statement, column, where, condition), list(params) + batch)
+        affected += cursor.rowcount
+    return affected
+
+def _fetch_for_ids(cursor, query, ids, column='id', where=None, params=()):
+    """Rows of query restricted to the given contact ids"""
+    rows = []
+    for condition, batch in _id_batches(ids):
+        cursor.execute(_for_ids(query, column, where, condition), list(params) + batch)
+        rows.extend(cursor.fetchall())
+    return rows
 
+# Follow-up cadences: hours to wait before each successive follow-up. None
+# repeats the contact's own followup_interval for as long as it awaits a reply.
+FOLLOWUP_CADENCES = {
+    'interval': None,
+    'three_step': (72, 168, 336),
+    'weekly': (168, 168, 168, 168),
+}
+DEFAULT_CADENCE = os.environ.get('FOLLOWUP_CADENCE', 'interval')
+if DEFAULT_CADENCE not in FOLLOWUP_CADENCES:
+    logger.warning(f"Unknown FOLLOWUP_CADENCE {DEFAULT_CADENCE!r}, using 'interval' "
+                   f"(choose from {', '.join(FOLLOWUP_CADENCES)})")
+    DEFAULT_CADENCE = 'interval'
 
-def get_all_contacts():
+# Statuses that keep a contact on its follow-up cadence
+FOLLOWUP_STATUSES = ('Applied', 'Follow-Up Sent')
+
+def _timestamp(moment):
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+def _as_datetime(value):
+    # Postgres returns datetimes, SQLite the stored text
+    return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
+def _cadence_delay(cadence, step, followup_interval):
+    """Hours until follow-up number `step` (0-based), or None once the cadence is done"""
+    steps = FOLLOWUP_CADENCES.get(cadence, FOLLOWUP_CADENCES[DEFAULT_CADENCE])
+    if steps is None:
+        return followup_interval or 72
+    return steps[step] if step < len(steps) else None
+
+def _schedule_followups(cursor, ids, advance, cadence=None, hours=None, now=None):
+    """Put contacts on (or move them along) their follow-up cadence.
+
+    advance=False starts the cadence over; advance=True moves past the
+    follow-up that was just sent. hours overrides the cadence delay. Contacts
+    whose cadence is finished are taken off the schedule.
+    """
+    now = now or datetime.now()
+    rows = _fetch_for_ids(cursor, '''
+    SELECT c.id, c.followup_interval, s.cadence, s.step
+    FROM contacts c LEFT JOIN followup_schedule s ON s.contact_id = c.id
+    ''', ids, column='c.id')
+    scheduled, finished = [], []
+    for contact_id, followup_interval, current_cadence, current_step in rows:
+        contact_cadence = cadence or current_cadence or DEFAULT_CADENCE
+        step = (current_step or 0) + 1 if advance else 0
+        delay = hours if hours is not None else _cadence_delay(contact_cadence, step, followup_interval)
+        if delay is None:
+            finished.append(contact_id)
+        else:
+            scheduled.append((contact_id, contact_cadence, step, now + timedelta(hours=delay)))
+
+    if scheduled:
+        cursor.executemany(_sql('''
+        INSERT INTO followup_schedule (contact_id, cadence, step, due_at, state, updated_at)
+        VALUES (?, ?, ?, ?, 'scheduled', ?)
+        ON CONFLICT (contact_id) DO UPDATE SET
+            cadence = excluded.cadence, step = excluded.step, due_at = excluded.due_at,
+            state = 'scheduled', updated_at = excluded.updated_at
+        '''), [(contact_id, c, step, _timestamp(due), _timestamp(now)) for contact_id, c, step, due in scheduled])
+        # next_followup_date stays as the display date of the next follow-up
+        cursor.executemany(
+            _sql('UPDATE contacts SET next_followup_date = ? WHERE id = ?'),
+            [(due.strftime('%Y-%m-%d'), contact_id) for contact_id, _, _, due in scheduled]
+        )
+    if finished:
+        _unschedule_followups(cursor, finished)
+
+def _unschedule_followups(cursor, ids):
+    _execute_for_ids(cursor, 'DELETE FROM followup_schedule', (), ids, column='contact_id')
+    _execute_for_ids(cursor, 'UPDATE contacts SET next_followup_date = NULL', (), ids)
+
+def _contact_companies(cursor, ids):
+    """(company_key, company_name, status) of the given contacts, read before a write"""
+    return _fetch_for_ids(cursor, 'SELECT company_key, company_name, status FROM contacts', ids)
+
+def _adjust_company_counts(cursor, deltas):
+    """Apply (company_key, company_name, status, delta) changes to the companies
+    table and its per-status counts; companies left empty are removed"""
+    companies, statuses = {}, {}
+    for key, name, status, delta in deltas:
+        if key is None:
+            continue
+        company_name, count = companies.get(key, (name, 0))
+        companies[key] = (company_name, count + delta)
+        status_key = (key, status or 'Not Applied')
+        statuses[status_key] = statuses.get(status_key, 0) + delta
+    companies = {key: value for key, value in companies.items() if value[1]}
+    statuses = {key: count for key, count in statuses.items() if count}
+    if companies:
+        cursor.executemany(_sql('''
+        INSERT INTO companies (company_key, name, color, contact_count, updated_at)
+        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT (company_key) DO UPDATE SET
+            contact_count = companies.contact_count + excluded.contact_count, updated_at = excluded.updated_at
+        '''), [(key, ' '.join(name.split()), company_color(name), count) for key, (name, count) in companies.items()])
+        _execute_for_ids(cursor, 'DELETE FROM companies', (), list(companies), column='company_key',
+                         where='contact_count <= 0')
+    if statuses:
+        cursor.executemany(_sql('''
+        INSERT INTO company_status_counts (company_key, status, contact_count)
+        VALUES (?, ?, ?)
+        ON CONFLICT (company_key, status) DO UPDATE SET
+            contact_count = company_status_counts.contact_count + excluded.contact_count
+        '''), [(key, status, count) for (key, status), count in statuses.items()])
+        _execute_for_ids(cursor, 'DELETE FROM company_status_counts', (), sorted({key for key, _ in statuses}),
+                         column='company_key', where='contact_count <= 0')
+
+def _move_company_statuses(before, status):
+    """Deltas for contacts (as read by _contact_companies) switching to status"""
+    for key, name, old_status in before:
+        if old_status != status:
+            yield key, name, old_status, -1
+            yield key, name, status, 1
+
+@writes_tables('contacts', 'followup_schedule')
+def update_contacts_status(contact_ids, status, notes=None):
+    """Set the status of many contacts in one transaction; notes=None keeps notes.
+
+    'Applied' starts the follow-up cadence, 'Follow-Up Sent' advances it and
+    any other status takes the contacts off the schedule.
+    """
+    ids = [int(i) for i in contact_ids]
+    if not ids:
+        return 0
     with DatabaseConnection() as cursor:
-        cursor.execute('SELECT * FROM contacts ORDER BY created_at DESC')
-        rows = cursor.fetchall()
-        
-        # Convert to list of dictionaries
-        data = [dict(row) for row in rows]
-        
-        # Create DataFrame from list of dictionaries
-        return pd.DataFrame(data)
+        return _set_status(cursor, ids, status, notes)
+
+def _set_status(cursor, ids, status, notes=None):
+    before = _contact_companies(cursor, ids)
+    assignments, params = ['status = ?', 'last_followup_date = ?'], [status, datetime.now().strftime('%Y-%m-%d')]
+    if notes is not None:
+        assignments.append('notes = ?')
+        params.append(notes)
+    updated = _execute_for_ids(cursor, f"UPDATE contacts SET {', '.join(assignments)}", params, ids)
+    if status in FOLLOWUP_STATUSES:
+        _schedule_followups(cursor, ids, advance=status == 'Follow-Up Sent')
+    else:
+        _unschedule_followups(cursor, ids)
+    _adjust_company_counts(cursor, _move_company_statuses(before, status))
+    return updated
 
 def update_contact_status(contact_id, status, notes=""):
+    return update_contacts_status([contact_id], status, notes)
+
+# Columns the dashboard table lets users edit in place
+EDITABLE_COLUMNS = ('status', 'notes')
+
+@writes_tables('contacts', 'followup_schedule')
+def apply_contact_edits(edits):
+    """Apply {contact_id: {column: value}} edits in one transaction.
+
+    Status changes are grouped so each distinct status is one statement
+    (and keeps the follow-up schedule in step); returns contacts changed.
+    """
+    unknown = {column for changes in edits.values() for column in changes} - set(EDITABLE_COLUMNS)
+    if unknown:
+        raise ValueError(f"Columns not editable: {sorted(unknown)}")
+    by_status, notes = {}, []
+    for contact_id, changes in edits.items():
+        if 'status' in changes:
+            by_status.setdefault(changes['status'], []).append(int(contact_id))
+        if 'notes' in changes:
+            notes.append((changes['notes'], int(contact_id)))
     with DatabaseConnection() as cursor:
-        cursor.execute('''
-        UPDATE contacts 
-        SET status = ?, notes = ?, last_followup_date = ?
-        WHERE id = ?
-        ''', (status, notes, datetime.now().strftime('%Y-%m-%d'), contact_id))
+        for status, ids in by_status.items():
+            _set_status(cursor, ids, status)
+        if notes:
+            cursor.executemany(_sql('UPDATE contacts SET notes = ? WHERE id = ?'), notes)
+    return len(edits)
 
-def mark_followup_sent(contact_id, followup_interval=72):
-    now = datetime.now()
-    next_followup = now + timedelta(hours=followup_interval)
-    
+@writes_tables('contacts', 'followup_schedule')
+def mark_followups_sent(contact_ids, followup_interval=None):
+    """Record a sent follow-up and schedule the next step of each cadence;
+    followup_interval (hours) overrides the cadence delay"""
+    ids = [int(i) for i in contact_ids]
+    if not ids:
+        return 0
     with DatabaseConnection() as cursor:
-        cursor.execute('''
-        UPDATE contacts 
-        SET last_followup_date = ?, next_followup_date = ?, status = ?
+        return _record_followups_sent(cursor, ids, followup_interval)
+
+def mark_followup_sent(contact_id, followup_interval=None):
+    return mark_followups_sent([contact_id], followup_interval)
+
+@writes_tables('contacts', 'followup_schedule')
+def set_followup_cadence(contact_ids, cadence):
+    """Restart the given contacts on another cadence from its first step"""
+    if cadence not in FOLLOWUP_CADENCES:
+        raise ValueError(f"Unknown follow-up cadence {cadence!r}")
+    ids = [int(i) for i in contact_ids]
+    if not ids:
+        return 0
+    with DatabaseConnection() as cursor:
+        _schedule_followups(cursor, ids, advance=False, cadence=cadence)
+        return len(ids)
+
+def get_due_followups(now=None):
+    """Contacts whose next follow-up is due: a range read on the schedule's due_at index"""
+    with DatabaseConnection(read_only=True) as cursor:
+        cursor.execute(_sql('''
+        SELECT c.*, s.due_at, s.cadence, s.step AS followup_step
+        FROM followup_schedule s JOIN contacts c ON c.id = s.contact_id
+        WHERE s.due_at <= ?
+        ORDER BY s.due_at ASC
+        '''), (_timestamp(now or datetime.now()),))
+        return pd.DataFrame([dict(row) for row in cursor.fetchall()])
+
+def get_pending_followups(limit=1000):
+    """Earliest (contact_id, due_at) entries not yet marked due"""
+    with DatabaseConnection() as cursor:
+        cursor.execute(_sql('''
+        SELECT contact_id, due_at FROM followup_schedule
+        WHERE state = 'scheduled'
+        ORDER BY due_at ASC
+        LIMIT ?
+        '''), (limit,))
+        return [(_as_datetime(due_at), contact_id) for contact_id, due_at in cursor.fetchall()]
+
+@writes_tables('followup_schedule')
+def mark_followups_due(contact_ids, now=None):
+    """Flag schedule entries that have come due; returns the ids flagged.
+    Entries rescheduled in the meantime are left alone."""
+    ids = [int(i) for i in contact_ids]
+    if not ids:
+        return []
+    now = _timestamp(now or datetime.now())
+    with DatabaseConnection() as cursor:
+        due = [row[0] for row in _fetch_for_ids(
+            cursor, 'SELECT contact_id FROM followup_schedule', ids, column='contact_id',
+            where="state = 'scheduled' AND due_at <= ?", params=(now,)
+        )]
+        if due:
+            _execute_for_ids(
+                cursor, "UPDATE followup_schedule SET state = 'due', updated_at = ?", (now,), due, column='contact_id'
+            )
+        return due
+
+# Outbound email queue. A message goes queued -> sending -> sent; a failed
+# attempt puts it back in the queue with a later next_attempt_at until it is
+# sent or marked failed. Delivery is at least once: a sender that stops
+# between sending and recording leaves the message to be requeued.
+OUTBOUND_STATES = ('queued', 'sending', 'sent', 'failed')
+OUTBOUND_KINDS = ('initial', 'followup')
+OUTBOUND_COLUMNS = ('id', 'contact_id', 'recipient', 'domain', 'subject', 'body', 'kind', 'attempts')
+
+@writes_tables('outbound_queue', changed=bool)
+def enqueue_emails(messages, template_id=None, now=None):
+    """Queue (contact_id, recipient, subject, body, kind) messages rendered
+    from a template for sending now; returns the number queued.
+
+    A contact gets at most one message of each kind per template: messages
+    for contacts already holding one (queued, sending, sent or failed) are
+    skipped.
+    """
+    now = _timestamp(now or datetime.now())
+    template_id = int(template_id) if template_id is not None else None
+    rows = []
+    for contact_id, recipient, subject, body, kind in messages:
+        if kind not in OUTBOUND_KINDS:
+            raise ValueError(f"Unknown message kind {kind!r}")
+        recipient = recipient.strip()
+        rows.append((contact_id, template_id, recipient, recipient.rsplit('@', 1)[-1].lower(), subject, body, kind, now))
+    if not rows:
+        return 0
+    with DatabaseConnection() as cursor:
+        cursor.executemany(_sql('''
+        INSERT INTO outbound_queue (contact_id, template_id, recipient, domain, subject, body, kind, next_attempt_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (contact_id, template_id, kind) DO NOTHING
+        '''), rows)
+        # Summed over every row by both drivers
+        return cursor.rowcount
+
+# Rough SQL match for a usable address (a parameter, so Postgres never sees a bare %)
+_EMAIL_PATTERN = '%_@_%._%'
+
+def count_enqueueable(template_id, kind, filters=None, search=None, due_before=None):
+    """Contacts of a mail-merge segment, as a dict of how many match, how
+    many have no email address and how many already hold a message of this
+    kind for the template (see enqueue_emails)"""
+    source, source_params, clauses, params = _segment_source(filters, search, due_before)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    with DatabaseConnection(read_only=True) as cursor:
+        cursor.execute(_sql(f'''
+        SELECT COUNT(*),
+               SUM(CASE WHEN TRIM(contacts.email) LIKE ? THEN 1 ELSE 0 END),
+               SUM(CASE WHEN TRIM(contacts.email) LIKE ? AND EXISTS (
+                   SELECT 1 FROM outbound_queue q
+                   WHERE q.contact_id = contacts.id AND q.template_id = ? AND q.kind = ?
+               ) THEN 1 ELSE 0 END)
+        FROM {source} {where}
+        '''), [_EMAIL_PATTERN, _EMAIL_PATTERN, int(template_id), kind] + source_params + params)
+        matching, with_email, already_queued = cursor.fetchone()
+    return {'matching': matching, 'without_email': matching - (with_email or 0), 'already_queued': already_queued or 0}
+
+@writes_tables('outbound_queue', changed=bool)
+def claim_outbound(limit, now=None):
+    """Move up to limit due messages to 'sending' and return them as dicts,
+    oldest first. Concurrent senders never claim the same message: Postgres
+    skips rows another sender has locked, SQLite serializes writers."""
+    now = _timestamp(now or datetime.now())
+    lock = 'FOR UPDATE SKIP LOCKED' if is_postgres() else ''
+    with DatabaseConnection() as cursor:
+        cursor.execute(_sql(f'''
+        UPDATE outbound_queue SET state = 'sending', claimed_at = ?
+        WHERE id IN (
+            SELECT id FROM outbound_queue
+            WHERE state = 'queued' AND next_attempt_at <= ?
+            ORDER BY next_attempt_at, id
+            LIMIT ? {lock}
+        )
+        RETURNING {', '.join(OUTBOUND_COLUMNS)}
+        '''), (now, now, limit))
+        messages = [dict(zip(OUTBOUND_COLUMNS, row)) for row in cursor.fetchall()]
+    return sorted(messages, key=lambda message: message['id'])
+
+def _record_followups_sent(cursor, ids, followup_interval=None, now=None):
+    now = now or datetime.now()
+    before = _contact_companies(cursor, ids)
+    updated = _execute_for_ids(
+        cursor,
+        'UPDATE contacts SET last_followup_date = ?, status = ?',
+        (now.strftime('%Y-%m-%d'), 'Follow-Up Sent'),
+        ids
+    )
+    _schedule_followups(cursor, ids, advance=True, hours=followup_interval, now=now)
+    _adjust_company_counts(cursor, _move_company_statuses(before, 'Follow-Up Sent'))
+    return updated
+
+@writes_tables('outbound_queue', changed=bool)
+def complete_outbound(sent, now=None):
+    """Record delivered messages, given (queue id, message id) pairs, and move
+    their contacts along: 'Applied' after a first email, the next follow-up
+    step after a follow-up. Returns the number recorded.
+
+    Contact views are only invalidated when a message had a contact to move.
+    """
+    if not sent:
+        return 0
+    now = now or datetime.now()
+    with DatabaseConnection() as cursor:
+        cursor.executemany(_sql('''
+        UPDATE outbound_queue
+        SET state = 'sent', sent_at = ?, message_id = ?, attempts = attempts + 1, last_error = NULL
         WHERE id = ?
-        ''', (now.strftime('%Y-%m-%d'), next_followup.strftime('%Y-%m-%d'), 'Follow-Up Sent', contact_id))
+        '''), [(_timestamp(now), message_id, queue_id) for queue_id, message_id in sent])
+        rows = _fetch_for_ids(cursor, 'SELECT contact_id, kind FROM outbound_queue', [queue_id for queue_id, _ in sent],
+                              where='contact_id IS NOT NULL')
+        initial = sorted({contact_id for contact_id, kind in rows if kind == 'initial'})
+        followups = sorted({contact_id for contact_id, kind in rows if kind == 'followup'} - set(initial))
+        if initial:
+            _set_status(cursor, initial, 'Applied')
+            _execute_for_ids(cursor, 'UPDATE contacts SET applied_date = ?', (now.strftime('%Y-%m-%d'),), initial,
+                             where='applied_date IS NULL')
+        if followups:
+            _record_followups_sent(cursor, followups, now=now)
+    if initial or followups:
+        bump_data_version('contacts', 'followup_schedule')
+    return len(sent)
 
-def get_due_followups():
+@writes_tables('outbound_queue')
+def fail_outbound(failures):
+    """Record failed attempts, given (queue id, error, retry_at) triples; a
+    retry_at of None marks the message failed for good"""
+    retries = [(_timestamp(retry_at), error, queue_id) for queue_id, error, retry_at in failures if retry_at]
+    failed = [(error, queue_id) for queue_id, error, retry_at in failures if not retry_at]
     with DatabaseConnection() as cursor:
-        cursor.execute('''
-        SELECT * FROM contacts 
-        WHERE next_followup_date <= date('now') 
-        AND status IN ('Applied', 'Follow-Up Sent')
-        ORDER BY next_followup_date ASC
+        if retries:
+            cursor.executemany(_sql('''
+            UPDATE outbound_queue
+            SET state = 'queued', next_attempt_at = ?, attempts = attempts + 1, last_error = ?, claimed_at = NULL
+            WHERE id = ?
+            '''), retries)
+        if failed:
+            cursor.executemany(_sql('''
+            UPDATE outbound_queue
+            SET state = 'failed', attempts = attempts + 1, last_error = ?, claimed_at = NULL
+            WHERE id = ?
+            '''), failed)
+
+@writes_tables('outbound_queue', changed=bool)
+def defer_outbound(queue_ids, until):
+    """Put claimed messages back in the queue until a later time, without
+    counting an attempt (used when a rate limit is reached)"""
+    ids = [int(i) for i in queue_ids]
+    if not ids:
+        return 0
+    with DatabaseConnection() as cursor:
+        return _execute_for_ids(
+            cursor, "UPDATE outbound_queue SET state = 'queued', next_attempt_at = ?, claimed_at = NULL",
+            (_timestamp(until),), ids, where="state = 'sending'"
+        )
+
+@writes_tables('outbound_queue', changed=bool)
+def release_stale_outbound(claimed_before):
+    """Requeue messages a stopped sender left in 'sending'"""
+    with DatabaseConnection() as cursor:
+        cursor.execute(_sql('''
+        UPDATE outbound_queue SET state = 'queued', claimed_at = NULL
+        WHERE state = 'sending' AND claimed_at < ?
+        '''), (_timestamp(claimed_before),))
+        return cursor.rowcount
+
+def get_outbound_summary(now=None):
+    """Messages per state, sends in the last hour and the next attempt due"""
+    now = now or datetime.now()
+    with DatabaseConnection(read_only=True) as cursor:
+        cursor.execute(_sql('''
+        SELECT state, COUNT(*), MIN(next_attempt_at), SUM(CASE WHEN sent_at >= ? THEN 1 ELSE 0 END)
+        FROM outbound_queue GROUP BY state
+        '''), (_timestamp(now - timedelta(hours=1)),))
+        rows = cursor.fetchall()
+    summary = {'counts': {state: 0 for state in OUTBOUND_STATES}, 'sent_last_hour': 0, 'next_attempt_at': None}
+    for state, count, next_attempt_at, sent_last_hour in rows:
+        summary['counts'][state] = count
+        if state == 'sent':
+            summary['sent_last_hour'] = sent_last_hour or 0
+        elif state == 'queued' and next_attempt_at is not None:
+            summary['next_attempt_at'] = _as_datetime(next_attempt_at)
+    return summary
+
+def get_outbound_messages(state=None, limit=200):
+    """Latest queue entries, optionally in one state, with their contact's name"""
+    where, params = '', []
+    if state:
+        where, params = 'WHERE q.state = ?', [state]
+    with DatabaseConnection(read_only=True) as cursor:
+        cursor.execute(_sql(f'''
+        SELECT q.id, q.contact_id, c.name, q.recipient, q.subject, q.kind, q.state, q.attempts,
+               q.next_attempt_at, q.sent_at, q.last_error
+        FROM outbound_queue q LEFT JOIN contacts c ON c.id = q.contact_id
+        {where}
+        ORDER BY q.id DESC
+        LIMIT ?
+        '''), params + [limit])
+        return pd.DataFrame([dict(row) for row in cursor.fetchall()])
+
+@writes_tables('outbound_queue', changed=bool)
+def retry_failed_outbound(now=None):
+    """Queue every failed message again, with a fresh attempt count"""
+    with DatabaseConnection() as cursor:
+        cursor.execute(_sql('''
+        UPDATE outbound_queue SET state = 'queued', attempts = 0, next_attempt_at = ?
+        WHERE state = 'failed'
+        '''), (_timestamp(now or datetime.now()),))
+        return cursor.rowcount
+
+@writes_tables('outbound_queue', changed=bool)
+def cancel_queued_outbound():
+    """Drop every message still waiting to be sent"""
+    with DatabaseConnection() as cursor:
+        cursor.execute("DELETE FROM outbound_queue WHERE state = 'queued'")
+        return cursor.rowcount
+
+# Engagement events. The tracking server appends opens, clicks and replies
+# to events in batches; rollup_events folds everything past its watermark
+# into the contacts' last_opened/last_clicked/last_replied columns.
+EVENT_KINDS = ('open', 'click', 'reply')
+EVENT_COLUMNS = ('message_id', 'contact_id', 'kind', 'url', 'occurred_at')
+ENGAGEMENT_COLUMN_BY_KIND = dict(zip(EVENT_KINDS, ENGAGEMENT_COLUMNS))
+EVENT_ROLLUP_BATCH_SIZE = 50000
+
+@writes_tables('events')
+def insert_events(events):
+    """Append (message_id, contact_id, kind, url, occurred_at) events in one
+    transaction; returns the number inserted"""
+    rows = [(message_id, contact_id, kind, url, _timestamp(occurred_at))
+            for message_id, contact_id, kind, url, occurred_at in events]
+    if not rows:
+        return 0
+    with DatabaseConnection() as cursor:
+        if is_postgres():
+            # Serialize appenders (readers are not blocked) so ids commit in
+            # order and the rollup watermark never passes an uncommitted id
+            cursor.execute('LOCK TABLE events IN EXCLUSIVE MODE')
+            buffer = io.StringIO()
+            csv.writer(buffer, quoting=csv.QUOTE_NOTNULL).writerows(rows)
+            buffer.seek(0)
+            cursor.copy_expert(f"COPY events ({', '.join(EVENT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        else:
+            cursor.executemany(
+                f"INSERT INTO events ({', '.join(EVENT_COLUMNS)}) VALUES (?, ?, ?, ?, ?)", rows
+            )
+    return len(rows)
+
+@writes_tables('contacts', 'event_rollup')
+def rollup_events(name='contacts', batch_size=EVENT_ROLLUP_BATCH_SIZE):
+    """Fold up to batch_size events past the rollup's watermark into the
+    contacts' latest-engagement columns; returns the number of events read"""
+    with DatabaseConnection() as cursor:
+        cursor.execute(_sql('SELECT last_event_id FROM event_rollup WHERE name = ?'), (name,))
+        row = cursor.fetchone()
+        after = row[0] if row else 0
+        cursor.execute(_sql('SELECT MAX(id), COUNT(*) FROM (SELECT id FROM events WHERE id > ? ORDER BY id LIMIT ?) batch'),
+                       (after, batch_size))
+        last_id, count = cursor.fetchone()
+        if not count:
+            return 0
+        cursor.execute(_sql('''
+        SELECT contact_id, kind, MAX(occurred_at), COUNT(*) FROM events
+        WHERE id > ? AND id <= ?
+        GROUP BY contact_id, kind
+        '''), (after, last_id))
+        latest, totals = {}, dict.fromkeys(EVENT_COUNT_COLUMNS.values(), 0)
+        for contact_id, kind, occurred_at, events in cursor.fetchall():
+            if kind in EVENT_COUNT_COLUMNS:
+                totals[EVENT_COUNT_COLUMNS[kind]] += events
+            if contact_id is not None and kind in ENGAGEMENT_COLUMN_BY_KIND:
+                latest.setdefault(kind, []).append((_timestamp(_as_datetime(occurred_at)), contact_id))
+        for kind, updates in latest.items():
+            column = ENGAGEMENT_COLUMN_BY_KIND[kind]
+            # Events can arrive late; keep the newest
+            cursor.executemany(_sql(f'''
+            UPDATE contacts SET {column} = ?
+            WHERE id = ? AND ({column} IS NULL OR {column} < ?)
+            '''), [(moment, contact_id, moment) for moment, contact_id in updates])
+        cursor.execute(_sql(f'''
+        INSERT INTO event_rollup (name, last_event_id, updated_at, {', '.join(totals)})
+        VALUES (?, ?, ?, {', '.join('?' for _ in totals)})
+        ON CONFLICT (name) DO UPDATE SET last_event_id = excluded.last_event_id, updated_at = excluded.updated_at,
+            {', '.join(f'{column} = event_rollup.{column} + excluded.{column}' for column in totals)}
+        '''), (name, last_id, _timestamp(datetime.now()), *totals.values()))
+        return count
+
+def get_engagement_summary(name='contacts'):
+    """Events per kind applied by the rollup, the contacts who opened,
+    clicked or replied, and how many events the rollup has yet to apply.
+
+    Read from the rollup's counters and the contacts' engagement columns,
+    so it never scans events beyond those still pending.
+    """
+    columns = list(EVENT_COUNT_COLUMNS.values())
+    with DatabaseConnection(read_only=True) as cursor:
+        cursor.execute(f'''
+        SELECT {', '.join(f'COUNT({column})' for column in ENGAGEMENT_COLUMNS)},
+               {', '.join(f'MAX({column})' for column in ENGAGEMENT_COLUMNS)}
+        FROM contacts
         ''')
-        return pd.DataFrame(cursor.fetchall())
+        row = cursor.fetchone()
+        contact_counts, latest = row[:len(ENGAGEMENT_COLUMNS)], row[len(ENGAGEMENT_COLUMNS):]
+        cursor.execute(_sql(f"SELECT last_event_id, {', '.join(columns)} FROM event_rollup WHERE name = ?"), (name,))
+        rollup = cursor.fetchone() or [0] + [0] * len(columns)
+        cursor.execute(_sql('SELECT COUNT(*) FROM events WHERE id > ?'), (rollup[0],))
+        pending = cursor.fetchone()[0]
+    events = dict(zip(columns, rollup[1:]))
+    latest = [_as_datetime(moment) for moment in latest if moment is not None]
+    return {
+        'events': {kind: events[column] for kind, column in EVENT_COUNT_COLUMNS.items()},
+        'contacts': dict(zip(EVENT_KINDS, contact_counts)),
+        'last_event_at': max(latest, default=None),
+        'pending_rollup': pending,
+    }
 
-def delete_contact(contact_id):
+def _drop_outbound(cursor, ids):
+    """Cancel the queued messages of contacts about to be deleted and detach
+    the rest, as the queue's ON DELETE SET NULL would (SQLite ignores it)"""
+    _execute_for_ids(cursor, 'DELETE FROM outbound_queue', (), ids, column='contact_id', where="state = 'queued'")
+    _execute_for_ids(cursor, 'UPDATE outbound_queue SET contact_id = NULL', (), ids, column='contact_id')
+
+def _delete_contact_rows(cursor, ids):
+    """Delete contacts along with their schedule, queued messages and
+    duplicate reviews, keeping the company counts in step"""
+    before = _contact_companies(cursor, ids)
+    # SQLite does not enforce the schedule's ON DELETE CASCADE
+    _execute_for_ids(cursor, 'DELETE FROM followup_schedule', (), ids, column='contact_id')
+    _drop_outbound(cursor, ids)
+    _execute_for_ids(cursor, 'DELETE FROM duplicate_review', (), ids, column='contact_id')
+    deleted = _execute_for_ids(cursor, 'DELETE FROM contacts', (), ids)
+    _adjust_company_counts(cursor, [(key, name, status, -1) for key, name, status in before])
+    return deleted
+
+@writes_tables('contacts', 'followup_schedule', 'outbound_queue', 'duplicate_review')
+def delete_contacts(contact_ids):
+    ids = [int(i) for i in contact_ids]
+    if not ids:
+        return 0
     with DatabaseConnection() as cursor:
-        cursor.execute('DELETE FROM contacts WHERE id = ?', (contact_id,))
+        return _delete_contact_rows(cursor, ids)
+
+def delete_contact(contact_id):
+    return delete_contacts([contact_id])
 
+@writes_tables('contacts', 'followup_schedule', 'duplicate_review', 'outbound_queue')
 def delete_all_contacts():
     with DatabaseConnection() as cursor:
         cursor.execute('SELECT COUNT(*) FROM contacts')
         count_before = cursor.fetchone()[0]
         
+        cursor.execute('DELETE FROM followup_schedule')
+        cursor.execute("DELETE FROM outbound_queue WHERE state = 'queued'")
+        cursor.execute('UPDATE outbound_queue SET contact_id = NULL WHERE contact_id IS NOT NULL')
+        cursor.execute('DELETE FROM duplicate_review')
+        cursor.execute('DELETE FROM company_status_counts')
+        cursor.execute('DELETE FROM companies')
         cursor.execute('DELETE FROM contacts')
         
         cursor.execute('SELECT COUNT(*) FROM contacts')
@@ -435,23 +2194,28 @@ def delete_all_contacts():
         
         return count_before - count_after  # Return number of deleted contacts
 
+@writes_tables('contacts', 'templates', 'followup_schedule', 'duplicate_review', 'outbound_queue', 'events',
+               'event_rollup')
 def reset_database():
     """Completely reset the database by dropping all tables and re-initializing"""
     try:
         # Connect to the database without context manager for full control
-        conn = sqlite3.connect('email_tracker.db')
+        conn = sqlite3.connect(SQLITE_PATH)
         cursor = conn.cursor()
         
-        # Get list of all tables
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
+        # Get list of all tables, virtual (full-text) tables first: dropping
+        # one drops its shadow tables, which cannot be dropped on their own
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY sql NOT LIKE 'CREATE VIRTUAL%';")
         tables = [table[0] for table in cursor.fetchall()]
         
         # Disable foreign keys to allow dropping tables
         cursor.execute("PRAGMA foreign_keys = OFF;")
         
-        # Drop all tables
+        # Drop all tables. data_versions stays: other processes only take up
+        # versions above the ones they hold, so restarting the counters
+        # would hide this reset and the writes after it from them
         for table in tables:
-            if table != "sqlite_sequence":  # Skip the sequence table
+            if table not in ("sqlite_sequence", "data_versions"):
                 cursor.execute(f"DROP TABLE IF EXISTS {table};")
                 logger.info(f"Dropped table: {table}")
         
@@ -472,94 +2236,399 @@ def reset_database():
         logger.error(f"Error resetting database: {str(e)}")
         return False
     
+@writes_tables('contacts', 'followup_schedule', 'outbound_queue', 'duplicate_review', changed=bool)
 def remove_duplicate_contacts():
+    # Inserts merge on the unique dedup key, so the only duplicates left are
+    # pre-existing copies that were given no key when the key was introduced
     with DatabaseConnection() as cursor:
-        cursor.execute('''
-        DELETE FROM contacts 
-        WHERE id NOT IN (
-            SELECT MIN(id) 
-            FROM contacts 
-            GROUP BY LOWER(name), LOWER(company_name)
-        )  -- Added missing parenthesis
-        ''')
-        return cursor.rowcount
+        cursor.execute('SELECT id FROM contacts WHERE dedup_key IS NULL')
+        ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            return 0
+        return _delete_contact_rows(cursor, ids)
+
+# Dimensions get_contact_aggregates() reports top-N counts for
+AGGREGATE_DIMENSIONS = ('company_name', 'company_niche', 'location')
+
+def get_contact_aggregates(top_n=10, duplicate_limit=50):
+    """Dashboard/analytics aggregates computed with GROUP BY in one round trip.
+
+    Cost scales with the number of groups rather than the number of contacts.
+    """
+    parts = [
+        "SELECT 'total' AS dimension, NULL AS value, NULL AS detail, COUNT(*) AS count FROM contacts",
+        "SELECT 'templates', NULL, NULL, COUNT(*) FROM templates",
+        "SELECT 'companies', NULL, NULL, COUNT(DISTINCT company_name) FROM contacts",
+        "SELECT 'status', status, NULL, COUNT(*) FROM contacts GROUP BY status",
+    ]
+    params = []
+    for column in AGGREGATE_DIMENSIONS:
+        parts.append(f'''
+        SELECT * FROM (
+            SELECT '{column}' AS dimension, {column} AS value, NULL AS detail, COUNT(*) AS count
+            FROM contacts WHERE {column} IS NOT NULL AND {column} <> ''
+            GROUP BY {column} ORDER BY count DESC, {column} LIMIT ?
+        ) AS top_{column}''')
+        params.append(top_n)
+    # Inserts merge on the dedup key, so duplicates are the keyless leftovers;
+    # +1 counts the keyed contact each group duplicates
+    duplicate_groups = '''
+        SELECT MIN(name) AS name, MIN(company_name) AS company_name, COUNT(*) + 1 AS count
+        FROM contacts WHERE dedup_key IS NULL
+        GROUP BY LOWER(name), LOWER(company_name)'''
+    parts.append(f"SELECT 'duplicate_groups', NULL, NULL, COUNT(*) FROM ({duplicate_groups}) AS all_groups")
+    parts.append(f'''
+        SELECT * FROM (
+            SELECT 'duplicate' AS dimension, name AS value, company_name AS detail, count
+            FROM ({duplicate_groups}) AS groups ORDER BY count DESC LIMIT ?
+        ) AS top_duplicates''')
+    params.append(duplicate_limit)
+
+    with DatabaseConnection(read_only=True) as cursor:
+        cursor.execute(_sql('\nUNION ALL\n'.join(parts)), params)
+        rows = cursor.fetchall()
+
+    aggregates = {
+        'total_contacts': 0,
+        'total_templates': 0,
+        'unique_companies': 0,
+        'duplicate_groups': 0,
+        'status_counts': {},
+        'duplicates': [],
+    }
+    for column in AGGREGATE_DIMENSIONS:
+        aggregates[column] = []
+    scalars = {'total': 'total_contacts', 'templates': 'total_templates',
+               'companies': 'unique_companies', 'duplicate_groups': 'duplicate_groups'}
+    for dimension, value, detail, count in rows:
+        if dimension in scalars:
+            aggregates[scalars[dimension]] = count
+        elif dimension == 'status':
+            aggregates['status_counts'][value] = count
+        elif dimension == 'duplicate':
+            aggregates['duplicates'].append({'name': value, 'company': detail, 'count': count})
+        else:
+            aggregates[dimension].append({'value': value, 'count': count})
+    return aggregates
 
 def get_contact_stats():
+    aggregates = get_contact_aggregates()
+    return {
+        'total_contacts': aggregates['total_contacts'],
+        'total_templates': aggregates['total_templates'],
+        'duplicate_groups': aggregates['duplicate_groups'],
+        'duplicates': aggregates['duplicates']
+    }
+
+@writes_tables('duplicate_review')
+def detect_duplicates():
+    """Scan all contacts for fuzzy duplicates and queue the clusters for review.
+
+    Pending clusters from earlier scans are replaced; a cluster whose members
+    were all dismissed together before is not queued again. Returns the
+    number of clusters queued.
+    """
+    with DatabaseConnection(read_only=True) as cursor:
+        if not is_postgres():
+            cursor.row_factory = None
+        cursor.execute('SELECT id, name, company_name, linkedin_url, company_website FROM contacts')
+        clusters = find_duplicate_clusters(cursor.fetchall())
+
     with DatabaseConnection() as cursor:
-        cursor.execute('SELECT COUNT(*) FROM contacts')
-        total_contacts = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(*) FROM templates')
-        total_templates = cursor.fetchone()[0]
-        
+        cursor.execute("SELECT cluster_id, contact_id FROM duplicate_review WHERE state = 'dismissed'")
+        dismissed = {}
+        for cluster_id, contact_id in cursor.fetchall():
+            dismissed.setdefault(cluster_id, set()).add(contact_id)
+        by_contact = {}
+        for members in dismissed.values():
+            for contact_id in members:
+                by_contact.setdefault(contact_id, []).append(members)
+
+        cursor.execute("DELETE FROM duplicate_review WHERE state = 'pending'")
+        cursor.execute('SELECT COALESCE(MAX(cluster_id), 0) FROM duplicate_review')
+        next_id = cursor.fetchone()[0] + 1
+        rows = []
+        for cluster in clusters:
+            ids = {contact_id for contact_id, _, _ in cluster}
+            if any(ids <= members for members in by_contact.get(cluster[0][0], ())):
+                continue
+            rows.extend((next_id, contact_id, score, reason) for contact_id, score, reason in cluster)
+            next_id += 1
+        cursor.executemany(_sql('''
+        INSERT INTO duplicate_review (cluster_id, contact_id, score, reason)
+        VALUES (?, ?, ?, ?)
+        '''), rows)
+        queued = len({row[0] for row in rows})
+    logger.info(f"Queued {queued} duplicate clusters for review")
+    return queued
+
+def count_duplicate_clusters():
+    """(clusters, contacts) awaiting review"""
+    with DatabaseConnection(read_only=True) as cursor:
         cursor.execute('''
-        SELECT name, company_name, COUNT(*) as count 
-        FROM contacts 
-        GROUP BY LOWER(name), LOWER(company_name) 
-        HAVING count > 1
-        ORDER BY count DESC
+        SELECT COUNT(DISTINCT cluster_id), COUNT(*) FROM duplicate_review WHERE state = 'pending'
         ''')
-        duplicates = cursor.fetchall()
-        
-        # Convert to serializable format
-        serializable_duplicates = []
-        for row in duplicates:
-            # Convert sqlite3.Row to tuple first, then to dict
-            row_tuple = tuple(row)
-            serializable_duplicates.append({
-                'name': row_tuple[0],
-                'company': row_tuple[1],
-                'count': row_tuple[2]
-            })
-        
-        return {
-            'total_contacts': total_contacts,
-            'total_templates': total_templates,
-            'duplicate_groups': len(duplicates),
-            'duplicates': serializable_duplicates
-        }
+        clusters, contacts = cursor.fetchone()
+        return clusters, contacts
 
-def insert_bulk_contacts(df):
-    contacts_data = []
-    for _, row in df.iterrows():
-        contact = (
-            row.get('Name', ''),
-            row.get('Job Title', ''),
-            row.get('Linkedin URL', ''),
-            row.get('Company Name', ''),
-            row.get('Company Website', ''),
-            row.get('Company Linkedin', ''),
-            row.get('Company Social', ''),
-            row.get('Company Twitter', ''),
-            row.get('Location', ''),
-            row.get('Company Niche', ''),
-            None,  # applied_date
-            72,    # followup_interval (default 3 days)
-            'Not Applied'  # status
+def get_duplicate_clusters(limit=100):
+    """Members of the first limit pending clusters, one row per contact"""
+    with DatabaseConnection(read_only=True) as cursor:
+        cursor.execute(_sql('''
+        SELECT r.cluster_id, r.contact_id, r.score, r.reason,
+               c.name, c.company_name, c.job_title, c.linkedin_url, c.company_website, c.status
+        FROM duplicate_review r JOIN contacts c ON c.id = r.contact_id
+        WHERE r.state = 'pending' AND r.cluster_id IN (
+            SELECT DISTINCT cluster_id FROM duplicate_review
+            WHERE state = 'pending' ORDER BY cluster_id LIMIT ?
         )
-        contacts_data.append(contact)
-    
+        ORDER BY r.cluster_id, r.contact_id
+        '''), (limit,))
+        return pd.DataFrame([dict(row) for row in cursor.fetchall()])
+
+def _merged_values(primary, others):
+    """Updates that fill the primary contact's blanks from the other members
+    (oldest first), keep the latest engagement of any member and append
+    their notes"""
+    updates = {}
+    for column in MERGEABLE_COLUMNS:
+        if not primary[column]:
+            value = next((other[column] for other in others if other[column]), None)
+            if value:
+                updates[column] = value
+    for column in ENGAGEMENT_COLUMNS:
+        values = [contact[column] for contact in [primary, *others] if contact[column]]
+        latest = max(values, key=_as_datetime, default=None)
+        if latest is not None and latest != primary[column]:
+            updates[column] = latest
+    notes = [primary['notes']] if primary['notes'] else []
+    for other in others:
+        if other['notes'] and other['notes'] not in notes:
+            notes.append(other['notes'])
+    if len(notes) > (1 if primary['notes'] else 0):
+        updates['notes'] = '\n'.join(notes)
+    return updates
+
+def _repoint_outbound(cursor, merged):
+    """Move the outbound messages of merged-away contacts to their primary,
+    given {removed contact id: primary id}.
+
+    A contact holds one message per (template, kind); where the members of a
+    cluster hold the same one, a message already sent (or being sent) wins
+    over a queued one. The surplus queued copies are cancelled and the
+    surplus sent ones detached, as if their contact had been deleted.
+    """
+    members = list(merged) + sorted(set(merged.values()))
+    rows = _fetch_for_ids(cursor, 'SELECT id, contact_id, template_id, kind, state FROM outbound_queue', members,
+                          column='contact_id')
+    rows = sorted(rows, key=lambda row: (row[4] == 'queued', row[1] in merged, row[0]))
+    taken, cancel, detach, move = set(), [], [], []
+    for queue_id, contact_id, template_id, kind, state in rows:
+        key = (merged.get(contact_id, contact_id), template_id, kind)
+        if template_id is not None and key in taken:
+            (cancel if state == 'queued' else detach).append(queue_id)
+            continue
+        taken.add(key)
+        if contact_id in merged:
+            move.append((merged[contact_id], queue_id))
+    if cancel:
+        _execute_for_ids(cursor, 'DELETE FROM outbound_queue', (), cancel)
+    if detach:
+        _execute_for_ids(cursor, 'UPDATE outbound_queue SET contact_id = NULL', (), detach)
+    if move:
+        cursor.executemany(_sql('UPDATE outbound_queue SET contact_id = ? WHERE id = ?'), move)
+
+@writes_tables('contacts', 'followup_schedule', 'duplicate_review', 'outbound_queue', 'events')
+def merge_duplicate_clusters(cluster_ids):
+    """Merge each pending cluster into its oldest contact.
+
+    The oldest contact keeps its name, status and follow-up schedule; blank
+    fields are filled from the other members and it takes their latest
+    opens, clicks and replies. Their notes are appended and their outbound
+    messages and engagement events move over before they are deleted.
+    Returns the number of contacts removed.
+    """
+    cluster_ids = [int(i) for i in cluster_ids]
+    if not cluster_ids:
+        return 0
+    with DatabaseConnection() as cursor:
+        members = {}
+        for cluster_id, contact_id in _fetch_for_ids(
+            cursor, 'SELECT cluster_id, contact_id FROM duplicate_review', cluster_ids,
+            column='cluster_id', where="state = 'pending'"
+        ):
+            members.setdefault(cluster_id, []).append(contact_id)
+        contact_ids = [contact_id for ids in members.values() for contact_id in ids]
+        contacts = {
+            row['id']: dict(row) for row in _fetch_for_ids(
+                cursor, f"SELECT id, notes, {', '.join(MERGEABLE_COLUMNS + list(ENGAGEMENT_COLUMNS))} FROM contacts",
+                contact_ids
+            )
+        }
+
+        merged = {}
+        for ids in members.values():
+            # Contacts deleted since the scan drop out of their cluster
+            present = sorted(contact_id for contact_id in ids if contact_id in contacts)
+            if len(present) < 2:
+                continue
+            primary, others = present[0], present[1:]
+            updates = _merged_values(contacts[primary], [contacts[i] for i in others])
+            if updates:
+                assignments = ', '.join(f"{column} = ?" for column in updates)
+                cursor.execute(_sql(f'UPDATE contacts SET {assignments} WHERE id = ?'), [*updates.values(), primary])
+            merged.update((other, primary) for other in others)
+
+        removed = 0
+        removed_ids = sorted(merged)
+        if removed_ids:
+            _repoint_outbound(cursor, merged)
+            for primary in sorted(set(merged.values())):
+                _execute_for_ids(cursor, 'UPDATE events SET contact_id = ?', (primary,),
+                                 [other for other in removed_ids if merged[other] == primary], column='contact_id')
+            before = _contact_companies(cursor, removed_ids)
+            _execute_for_ids(cursor, 'DELETE FROM followup_schedule', (), removed_ids, column='contact_id')
+            removed = _execute_for_ids(cursor, 'DELETE FROM contacts', (), removed_ids)
+            _adjust_company_counts(cursor, [(key, name, status, -1) for key, name, status in before])
+        _execute_for_ids(cursor, "UPDATE duplicate_review SET state = 'merged'", (), cluster_ids,
+                         column='cluster_id', where="state = 'pending'")
+    logger.info(f"Merged {len(members)} duplicate clusters, removing {removed} contacts")
+    return removed
+
+@writes_tables('duplicate_review')
+def dismiss_duplicate_clusters(cluster_ids):
+    """Mark clusters as not duplicates so later scans leave them out"""
+    cluster_ids = [int(i) for i in cluster_ids]
+    if not cluster_ids:
+        return 0
     with DatabaseConnection() as cursor:
-        cursor.executemany('''
-        INSERT INTO contacts (
-            name, job_title, linkedin_url, company_name, company_website,
-            company_linkedin, company_social, company_twitter, location, company_niche,
-            applied_date, followup_interval, status
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', contacts_data)
-        return len(contacts_data)
+        return _execute_for_ids(cursor, "UPDATE duplicate_review SET state = 'dismissed'", (), cluster_ids,
+                                column='cluster_id', where="state = 'pending'")
+
+# Import spreadsheet header -> contacts column
+IMPORT_COLUMN_MAP = {
+    'Name': 'name',
+    'Job Title': 'job_title',
+    'Linkedin URL': 'linkedin_url',
+    'Company Name': 'company_name',
+    'Company Website': 'company_website',
+    'Company Linkedin': 'company_linkedin',
+    'Company Social': 'company_social',
+    'Company Twitter': 'company_twitter',
+    'Location': 'location',
+    'Company Niche': 'company_niche',
+    'Email': 'email',
+}
+
+# Positional order of contact insert tuples. email came later and goes last,
+# so the original 13 fields keep their positions and may omit it
+CONTACT_INSERT_COLUMNS = [
+    'name', 'job_title', 'linkedin_url', 'company_name', 'company_website',
+    'company_linkedin', 'company_social', 'company_twitter', 'location', 'company_niche',
+    'applied_date', 'followup_interval', 'status', 'email',
+]
+
+# Derived keys appended to every insert tuple, in this order
+KEY_COLUMNS = ['dedup_key', 'company_key']
+
+IMPORT_CHUNK_SIZE = 5000
+
+def contact_rows_from_frame(df):
+    """Map an import DataFrame to insert tuples (vectorized, no iterrows)"""
+    # Blank spreadsheet rows carry no data at all
+    present = [header for header in IMPORT_COLUMN_MAP if header in df.columns]
+    df = df[df[present].notna().any(axis=1)]
+    mapped = pd.DataFrame(index=df.index)
+    for header, column in IMPORT_COLUMN_MAP.items():
+        mapped[column] = df[header] if header in df.columns else ''
+    mapped = mapped.astype(object).where(mapped.notna(), None)
+    mapped['applied_date'] = None
+    mapped['followup_interval'] = 72  # default 3 days
+    mapped['status'] = 'Not Applied'
+    return list(mapped[CONTACT_INSERT_COLUMNS].itertuples(index=False, name=None))
+
+def _copy_contact_rows(cursor, rows, policy):
+    """Stream rows into a Postgres staging table with COPY FROM STDIN,
+    then upsert them into contacts"""
+    columns = ', '.join(CONTACT_INSERT_COLUMNS + KEY_COLUMNS)
+    cursor.execute(f'''
+    CREATE TEMP TABLE IF NOT EXISTS contacts_staging
+    ON COMMIT DELETE ROWS
+    AS SELECT {columns} FROM contacts WITH NO DATA
+    ''')
+    buffer = io.StringIO()
+    # QUOTE_NOTNULL leaves None unquoted, which COPY's CSV format reads as NULL
+    csv.writer(buffer, quoting=csv.QUOTE_NOTNULL).writerows(rows)
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY contacts_staging ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+    cursor.execute(f'''
+    INSERT INTO contacts ({columns})
+    SELECT {columns} FROM contacts_staging
+    {_conflict_clause(policy)}
+    ''')
+
+@writes_tables('contacts')
+def insert_contact_rows(rows, merge_policy=None):
+    """Upsert one chunk of contact tuples in its own transaction.
+
+    Returns the number of new contacts; duplicates of existing contacts are
+    merged according to merge_policy instead of being inserted.
+    """
+    policy = merge_policy or DEFAULT_MERGE_POLICY
+    rows = _keyed_rows(rows, policy)
+    if not rows:
+        return 0
+    key_idx = len(CONTACT_INSERT_COLUMNS)
+    keys = [row[key_idx] for row in rows]
+    with DatabaseConnection() as cursor:
+        # Existing identities in this chunk: one unique-index lookup per row
+        if is_postgres():
+            cursor.execute('SELECT dedup_key FROM contacts WHERE dedup_key = ANY(%s)', (keys,))
+        else:
+            cursor.execute(
+                f"SELECT dedup_key FROM contacts WHERE dedup_key IN ({', '.join('?' * len(keys))})", keys
+            )
+        existing = {row[0] for row in cursor.fetchall()}
+
+        if is_postgres():
+            _copy_contact_rows(cursor, rows, policy)
+        else:
+            columns = CONTACT_INSERT_COLUMNS + KEY_COLUMNS
+            cursor.executemany(f'''
+            INSERT INTO contacts ({', '.join(columns)})
+            VALUES ({', '.join('?' * len(columns))})
+            {_conflict_clause(policy)}
+            ''', rows)
+        new_rows = [row for row in rows if row[key_idx] not in existing]
+        _adjust_company_counts(cursor, [_company_delta(row) for row in new_rows])
+    return len(new_rows)
+
+def insert_bulk_contacts(df, chunk_size=IMPORT_CHUNK_SIZE, merge_policy=None):
+    rows = contact_rows_from_frame(df)
+    inserted = 0
+    for start in range(0, len(rows), chunk_size):
+        inserted += insert_contact_rows(rows[start:start + chunk_size], merge_policy)
+    return inserted
 
 # Template operations
+@writes_tables('templates')
 def add_template(title, body):
     with DatabaseConnection() as cursor:
         cursor.execute('INSERT INTO templates (title, body) VALUES (?, ?)', (title, body))
         return cursor.lastrowid
 
 def get_all_templates():
-    with DatabaseConnection() as cursor:
+    with DatabaseConnection(read_only=True) as cursor:
         cursor.execute('SELECT * FROM templates ORDER BY created_at DESC')
-        return pd.DataFrame(cursor.fetchall())
+        return pd.DataFrame([dict(row) for row in cursor.fetchall()], columns=['id', 'title', 'body', 'created_at'])
+
+def get_template(template_id):
+    with DatabaseConnection(read_only=True) as cursor:
+        cursor.execute(_sql('SELECT * FROM templates WHERE id = ?'), (int(template_id),))
+        row = cursor.fetchone()
+        return dict(row) if row else None
 
+@writes_tables('templates')
 def delete_template(template_id):
     with DatabaseConnection() as cursor:
         cursor.execute('DELETE FROM templates WHERE id = ?', (template_id,))
@@ -0,0 +1,264 @@
+import re
+import hashlib
+import unicodedata
+from urllib.parse import unquote
+import numpy as np
+
+
+def _normalize(value):
+    if value is None:
+        return ''
+    return ' '.join(str(value).split()).casefold()
+
+
+def dedup_key(name, company_name):
+    """Normalized identity of a contact: name + company, case and whitespace folded"""
+    return f"{_normalize(name)}|{_normalize(company_name)}"
+
+
+def company_key(company_name):
+    """Normalized company identity, or None for a blank company"""
+    return _normalize(company_name) or None
+
+
+def company_color(company_name):
+    """Dark theme color for a company, stable across processes (unlike hash())"""
+    key = company_key(company_name)
+    if key is None:
+        return "#555555"
+    hue = int(hashlib.md5(key.encode('utf-8')).hexdigest()[:8], 16) % 360
+    return f"hsl({hue}, 65%, 25%)"
+
+
+# Fuzzy matching: contacts that are probably the same person even though
+# their dedup keys differ ("Acme Inc" vs "ACME, Inc.", "Bob" vs "Robert",
+# LinkedIn URL variants)
+
+NICKNAMES = {
+    'abby': 'abigail', 'al': 'albert', 'alex': 'alexander', 'andy': 'andrew', 'ben': 'benjamin',
+    'bill': 'william', 'billy': 'william', 'bob': 'robert', 'bobby': 'robert', 'cathy': 'catherine',
+    'chris': 'christopher', 'dan': 'daniel', 'danny': 'daniel', 'dave': 'david', 'ed': 'edward',
+    'eddie': 'edward', 'fred': 'frederick', 'greg': 'gregory', 'jake': 'jacob', 'jen': 'jennifer',
+    'jenny': 'jennifer', 'jim': 'james', 'jimmy': 'james', 'joe': 'joseph', 'jon': 'jonathan',
+    'kate': 'katherine', 'katie': 'katherine', 'ken': 'kenneth', 'kim': 'kimberly', 'liz': 'elizabeth',
+    'beth': 'elizabeth', 'matt': 'matthew', 'mike': 'michael', 'nick': 'nicholas', 'pat': 'patrick',
+    'pete': 'peter', 'rick': 'richard', 'rich': 'richard', 'dick': 'richard', 'rob': 'robert',
+    'sam': 'samuel', 'steve': 'steven', 'sue': 'susan', 'ted': 'edward', 'tom': 'thomas',
+    'tony': 'anthony', 'vicky': 'victoria', 'will': 'william', 'zach': 'zachary',
+}
+NAME_TITLES = {'mr', 'mrs', 'ms', 'miss', 'dr', 'prof', 'sir', 'jr', 'sr', 'ii', 'iii', 'phd', 'mba'}
+COMPANY_SUFFIXES = {
+    'inc', 'incorporated', 'llc', 'llp', 'ltd', 'limited', 'corp', 'corporation', 'co', 'company',
+    'gmbh', 'ag', 'sa', 'sas', 'bv', 'plc', 'pvt', 'pty', 'group', 'holdings', 'the',
+}
+
+_NON_WORD = re.compile(r'[^\w\s]+')
+_NUMBER = re.compile(r'\d+')
+
+
+def _words(value):
+    """Accent-stripped, casefolded words without punctuation"""
+    if value is None:
+        return []
+    text = str(value)
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_WORD.sub(' ', text.casefold()).split()
+
+
+def normalize_person(name):
+    """Name with titles dropped and nicknames expanded: 'Dr. Bob  Smith' -> 'robert smith'"""
+    return ' '.join(NICKNAMES.get(word, word) for word in _words(name) if word not in NAME_TITLES)
+
+
+def normalize_company(name):
+    """Company without legal suffixes: 'ACME, Inc.' -> 'acme'"""
+    words = [word for word in _words(name) if word not in COMPANY_SUFFIXES]
+    # Keep a name made only of suffix words ("The Company") rather than blank it
+    return ' '.join(words) or ' '.join(_words(name))
+
+
+_URL = re.compile(r'^(?:[a-z][a-z0-9+.-]*:)?(?://)?(?:[^@/?#]*@)?([^:/?#]*)(?::\d*)?([^?#]*)')
+
+
+def _host_and_path(url):
+    # Scheme, credentials, port, query and fragment are all optional
+    if not isinstance(url, str) or not url.strip():
+        return '', ''
+    host, path = _URL.match(url.strip().casefold()).groups()
+    return (host[4:] if host.startswith('www.') else host), path
+
+
+def url_domain(url):
+    """Host of a URL without www.: 'https://www.Acme.com/about' -> 'acme.com'"""
+    return _host_and_path(url)[0]
+
+
+def linkedin_handle(url):
+    """Profile handle of a LinkedIn URL, whatever its form: 'in/jane-doe'"""
+    host, path = _host_and_path(url)
+    if not (host == 'linkedin.com' or host.endswith('.linkedin.com')):
+        return ''
+    segments = [segment for segment in path.split('/') if segment]
+    if len(segments) >= 2 and segments[0] in ('in', 'pub', 'company'):
+        return f"{segments[0]}/{unquote(segments[1])}"
+    return ''
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+# MinHash-LSH: NUM_BANDS bands of BAND_ROWS hashes; two contacts whose
+# name+company trigram sets have Jaccard similarity s share a bucket in at
+# least one band with probability 1 - (1 - s^BAND_ROWS)^NUM_BANDS (about
+# 0.15 at s = 0.5, 0.9 at s = 0.77, 0.99 at s = 0.85)
+NUM_BANDS = 10
+BAND_ROWS = 6
+# Buckets larger than this are too generic to say anything ("john smith")
+MAX_BUCKET_SIZE = 50
+NAME_THRESHOLD = 0.6
+COMPANY_THRESHOLD = 0.7
+_MERSENNE_PRIME = (1 << 31) - 1
+
+
+def _minhash_signatures(shingle_sets, num_hashes, seed=42):
+    """(len(shingle_sets), num_hashes) MinHash signature matrix, computed for
+    all sets at once with one reduceat per hash function"""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _MERSENNE_PRIME, num_hashes, dtype=np.int64)
+    b = rng.integers(0, _MERSENNE_PRIME, num_hashes, dtype=np.int64)
+    lengths = np.fromiter((len(s) for s in shingle_sets), dtype=np.int64, count=len(shingle_sets))
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    # hash() varies between processes but not within one, which is all the
+    # signatures need; strings cache it, so repeated shingles are cheap
+    hashes = np.fromiter(
+        (hash(shingle) & _MERSENNE_PRIME for s in shingle_sets for shingle in s),
+        dtype=np.int64, count=int(lengths.sum())
+    )
+    signatures = np.empty((len(shingle_sets), num_hashes), dtype=np.int64)
+    for i in range(num_hashes):
+        signatures[:, i] = np.minimum.reduceat((a[i] * hashes + b[i]) % _MERSENNE_PRIME, offsets)
+    return signatures
+
+
+def _lsh_candidates(signatures):
+    """Index pairs sharing a bucket in some band"""
+    pairs = set()
+    for band in range(NUM_BANDS):
+        rows = np.ascontiguousarray(signatures[:, band * BAND_ROWS:(band + 1) * BAND_ROWS])
+        _, bucket, counts = np.unique(rows.view(f'V{rows.itemsize * BAND_ROWS}').ravel(),
+                                      return_inverse=True, return_counts=True)
+        shared = np.flatnonzero((counts[bucket] > 1) & (counts[bucket] <= MAX_BUCKET_SIZE))
+        order = shared[np.argsort(bucket[shared], kind='stable')]
+        for members in np.split(order, np.flatnonzero(np.diff(bucket[order])) + 1):
+            members = members.tolist()
+            for i, left in enumerate(members):
+                for right in members[i + 1:]:
+                    pairs.add((left, right))
+    return pairs
+
+
+class _DisjointSet:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i, j):
+        root_i, root_j = self.find(i), self.find(j)
+        if root_i != root_j:
+            self.parent[max(root_i, root_j)] = min(root_i, root_j)
+
+
+def find_duplicate_clusters(contacts):
+    """Group likely duplicate contacts.
+
+    contacts is an iterable of (id, name, company_name, linkedin_url,
+    company_website). Candidates come from blocking on exact normalized
+    keys (LinkedIn handle, name + company, name + website domain) and from
+    MinHash-LSH over name + company trigrams, then each candidate pair is
+    verified on name and company similarity. Returns a list of clusters,
+    each a list of (contact_id, score, reason) with at least two members.
+    """
+    ids, names, companies, domains, handles = [], [], [], [], []
+    for contact_id, name, company, linkedin_url, website in contacts:
+        ids.append(contact_id)
+        names.append(normalize_person(name))
+        companies.append(normalize_company(company))
+        domains.append(url_domain(website))
+        handles.append(linkedin_handle(linkedin_url))
+    if len(ids) < 2:
+        return []
+
+    matches = _DisjointSet(len(ids))
+    evidence = {}  # index -> (score, reason) of its best match
+
+    def link(i, j, score, reason):
+        matches.union(i, j)
+        for k in (i, j):
+            if score > evidence.get(k, (0.0, ''))[0]:
+                evidence[k] = (score, reason)
+
+    # Blocking: exact keys are transitive, so linking each member to the
+    # first of its block is enough (linear in the block size)
+    blocks = {}
+    for i in range(len(ids)):
+        keys = []
+        if handles[i]:
+            keys.append(('linkedin', handles[i]))
+        if names[i] and companies[i]:
+            keys.append(('name+company', names[i], companies[i]))
+        if names[i] and domains[i]:
+            keys.append(('name+domain', names[i], domains[i]))
+        for key in keys:
+            first = blocks.setdefault(key, i)
+            if first != i:
+                link(first, i, 1.0, key[0])
+
+    # LSH candidates, verified on name and company similarity
+    grams = {}
+    def grams_of(text):
+        if text not in grams:
+            grams[text] = trigrams(text)
+        return grams[text]
+
+    signatures = _minhash_signatures(
+        [trigrams(f"{name} {company}") for name, company in zip(names, companies)],
+        NUM_BANDS * BAND_ROWS
+    )
+    for i, j in _lsh_candidates(signatures):
+        if not (names[i] and names[j]) or matches.find(i) == matches.find(j):
+            continue
+        if companies[i] == companies[j] or (domains[i] and domains[i] == domains[j]):
+            company_score = 1.0
+        else:
+            company_score = jaccard(grams_of(companies[i]), grams_of(companies[j]))
+            if company_score < COMPANY_THRESHOLD:
+                continue
+        # Numbers in a name tell otherwise identical names apart ("Jane Doe 2")
+        if _NUMBER.findall(names[i]) != _NUMBER.findall(names[j]):
+            continue
+        name_score = jaccard(grams_of(names[i]), grams_of(names[j]))
+        if name_score >= NAME_THRESHOLD:
+            link(i, j, round((name_score + company_score) / 2, 3), 'similar name+company')
+
+    clusters = {}
+    for i in evidence:
+        clusters.setdefault(matches.find(i), []).append(i)
+    return [
+        [(ids[i], *evidence[i]) for i in sorted(members, key=ids.__getitem__)]
+        for members in clusters.values() if len(members) > 1
+    ]
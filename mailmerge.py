@@ -0,0 +1,136 @@
+import re
+import functools
+import numpy as np
+
+# Template syntax:
+#   {name}                               a contact field
+#   {job_title|there}                    the field, or the default when blank
+#   {?company_name}at {company_name}{/company_name}
+#                                        a section shown when the field is set
+#   {!company_name}...{/company_name}    a section shown when it is blank
+#   {{ and }}                            literal braces
+# first_name and last_name are taken from name.
+
+DERIVED_FIELDS = ('first_name', 'last_name')
+
+_TAG = re.compile(r'\{\{|\}\}|\{([?!/]?)\s*(\w+)\s*(?:\|([^{}]*))?\}')
+
+
+class TemplateError(ValueError):
+    """A template that does not compile, with the offending position"""
+
+
+def _append_text(nodes, text):
+    if not text:
+        return
+    if nodes and nodes[-1][0] == 'text':
+        nodes[-1] = ('text', nodes[-1][1] + text)
+    else:
+        nodes.append(('text', text))
+
+
+def _parse(text, fields):
+    """Node tree of a template: ('text', str), ('field', name, default) and
+    ('section', name, shown_when_blank, children)"""
+    root = []
+    open_sections = [(None, root)]
+    position = 0
+    for match in _TAG.finditer(text):
+        nodes = open_sections[-1][1]
+        _append_text(nodes, text[position:match.start()])
+        position = match.end()
+        if match.group(0) in ('{{', '}}'):
+            _append_text(nodes, match.group(0)[0])
+            continue
+        sigil, field, default = match.groups()
+        field = field.lower()
+        if sigil == '/':
+            if open_sections[-1][0] != field:
+                raise TemplateError(f"{{/{field}}} at character {match.start()} closes no open {{?{field}}} section")
+            open_sections.pop()
+            continue
+        if field not in fields:
+            raise TemplateError(f"Unknown field {{{field}}} at character {match.start()}")
+        if sigil:
+            children = []
+            nodes.append(('section', field, sigil == '!', children))
+            open_sections.append((field, children))
+        else:
+            nodes.append(('field', field, default or ''))
+    _append_text(open_sections[-1][1], text[position:])
+    if len(open_sections) > 1:
+        field = open_sections[-1][0]
+        raise TemplateError(f"Section {{?{field}}} is never closed with {{/{field}}}")
+    return root
+
+
+def _referenced(nodes):
+    for node in nodes:
+        if node[0] != 'text':
+            yield node[1]
+        if node[0] == 'section':
+            yield from _referenced(node[3])
+
+
+def _render(nodes, values, size):
+    out = np.full(size, '', dtype=object)
+    for node in nodes:
+        if node[0] == 'text':
+            out += node[1]
+        elif node[0] == 'field':
+            _, field, default = node
+            column = values[field]
+            out += np.where(column == '', default, column) if default else column
+        else:
+            _, field, when_blank, children = node
+            shown = (values[field] == '') if when_blank else (values[field] != '')
+            if shown.any():
+                out += np.where(shown, _render(children, values, size), '')
+    return out
+
+
+def name_parts(names):
+    """(first names, last names) object arrays of an array of full names"""
+    split = [name.split() for name in names]
+    first = np.array([words[0] if words else '' for words in split], dtype=object)
+    last = np.array([words[-1] if len(words) > 1 else '' for words in split], dtype=object)
+    return first, last
+
+
+class CompiledTemplate:
+    """A parsed template, rendered against a whole batch of contacts at once"""
+
+    def __init__(self, text, nodes):
+        self.text = text
+        self.nodes = nodes
+        self.fields = frozenset(_referenced(nodes))
+        # Columns the template needs from the contact rows
+        self.source_fields = frozenset(
+            'name' if field in DERIVED_FIELDS else field for field in self.fields
+        )
+
+    def render_batch(self, values, size):
+        """Rendered text for size contacts, as an object array of strings.
+
+        values maps each of source_fields to an object array of size strings,
+        with '' for blank values.
+        """
+        values = dict(values)
+        if self.fields & set(DERIVED_FIELDS):
+            values['first_name'], values['last_name'] = name_parts(values['name'])
+        return _render(self.nodes, values, size)
+
+    def render(self, contact):
+        """Rendered text for one contact mapping"""
+        values = {field: np.array([str(contact.get(field) or '').strip()], dtype=object)
+                  for field in self.source_fields}
+        return self.render_batch(values, 1)[0]
+
+
+@functools.lru_cache(maxsize=256)
+def compile_template(text, fields):
+    """Parse template text once; fields is the tuple of fields it may use.
+
+    Raises TemplateError for unknown fields and unbalanced sections.
+    """
+    return CompiledTemplate(text, _parse(text or '', frozenset(fields) | set(DERIVED_FIELDS)))
@@ -1,14 +1,22 @@
-
 import streamlit as st
-from pages import dashboard, import_data, followups, templates, analytics, db_info, landing
-from config import CSS_STYLES
-from database import init_database
+from dotenv import load_dotenv
 
 import os
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+# Load environment variables once per process, before importing modules
+# that read their settings at import time
+@st.cache_resource(show_spinner=False)
+def load_environment():
+    return load_dotenv()
+
+load_environment()
+
+from pages import PAGES, load_page
+from config import CSS_STYLES
+from components import profile_panel
+from services.profiling import profile_page
+from database import init_database, set_routing_session, start_metrics_server
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 # Page configuration
 st.set_page_config(
@@ -18,8 +26,35 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Initialize database
-init_database()
+@st.cache_resource(show_spinner=False)
+def start_app():
+    """Schema setup and background workers, once per process rather than
+    on every rerun"""
+    init_database()
+
+    # Prometheus scrape endpoint for the query stats, when a port is configured
+    if os.environ.get("QUERY_METRICS_PORT"):
+        start_metrics_server(int(os.environ["QUERY_METRICS_PORT"]))
+
+    # Background worker that flags follow-ups as they come due
+    from services.followup_service import start_followup_scheduler
+    start_followup_scheduler()
+
+    # Outbound email sender, when an SMTP relay is configured
+    from services.outbox_service import start_sender, start_tracking
+    start_sender()
+
+    # Open/click/reply tracking endpoint, when TRACKING_PORT is set
+    start_tracking()
+    return True
+
+start_app()
+
+# Reads right after this session's own writes skip the read replicas. There
+# is no script context when main.py runs outside `streamlit run` (bare mode)
+script_ctx = get_script_run_ctx()
+session_id = script_ctx.session_id if script_ctx else None
+set_routing_session(session_id)
 
 # Inject CSS
 st.markdown(CSS_STYLES, unsafe_allow_html=True)
@@ -29,15 +64,7 @@ query_params = st.query_params
 nav_selection = query_params.get("nav", None)
 
 # Page options
-page_options = [
-    "Home", 
-    "Dashboard", 
-    "Import Data", 
-    "Follow-Up Reminders", 
-    "Email Templates", 
-    "Analytics", 
-    "Database Info"
-]
+page_options = list(PAGES)
 
 # Set current page based on URL or default
 current_page = "Home"
@@ -49,7 +76,7 @@ if nav_selection:
 
 # Always show the landing page when no nav selection
 if not nav_selection:
-    landing.show_landing()
+    profile_page("Home", load_page("Home"), session_id)
     st.stop()
 
 # Sidebar Navigation
@@ -64,40 +91,28 @@ with st.sidebar.expander("Data Management", expanded=False):
         with st.spinner("Removing duplicates..."):
             from services.contact_service import remove_duplicates_wrapper
             removed_count = remove_duplicates_wrapper()
-            st.cache_data.clear()
             st.success(f"Removed {removed_count} duplicate contacts!")
 
     if st.button("Delete ALL Data", help="Delete all contacts - CANNOT be undone!"):
         if st.checkbox("I understand this will delete ALL contacts"):
             from services.contact_service import delete_all_contacts_wrapper
             deleted_count = delete_all_contacts_wrapper()
-            st.cache_data.clear()
             st.success(f"Deleted {deleted_count} contacts!")
             st.rerun()
 
 # Refresh button
 if st.sidebar.button("Refresh Data"):
-    st.cache_data.clear()
+    from services.contact_service import refresh_data
+    refresh_data()
     st.rerun()
 
 # Render sidebar selectbox with current selection
 page = st.sidebar.selectbox("Navigate to:", page_options, index=page_options.index(current_page))
 
-# Page routing
-if page == "Home":
-    landing.show_landing()
-elif page == "Dashboard":
-    dashboard.show_dashboard()
-elif page == "Import Data":
-    import_data.show_import_data()
-elif page == "Follow-Up Reminders":
-    followups.show_followups()
-elif page == "Email Templates":
-    templates.show_templates()
-elif page == "Analytics":
-    analytics.show_analytics()
-elif page == "Database Info":
-    db_info.show_db_info()
+# Page routing, timed when profiling is on (PROFILE_PAGES, or ?profile=1 with PROFILE_URL_PARAM=1)
+profile_run = profile_page(page, load_page(page), session_id)
+if profile_run:
+    profile_panel(profile_run)
 
 # Footer
 st.sidebar.markdown("---")
@@ -0,0 +1,595 @@
+import logging
+import sqlite3
+from collections import namedtuple
+from dedup import dedup_key, company_key, company_color
+
+logger = logging.getLogger(__name__)
+
+# Per-connection SQLite settings; applied by the connection pool on connect.
+# journal_mode=WAL is persistent and is switched on by a migration instead.
+SQLITE_CONNECTION_PRAGMAS = [
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -32000",  # ~32MB page cache
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+]
+
+# A migration step is either a SQL string or a callable taking a cursor.
+# Postgres steps of a migration marked transactional=False run in autocommit
+# mode (required for CREATE INDEX CONCURRENTLY).
+Migration = namedtuple('Migration', ['version', 'description', 'sqlite', 'postgres', 'transactional'])
+
+
+def _create_index_concurrently(name, definition, unique=False):
+    """Postgres step that builds an index without blocking writes.
+
+    A failed concurrent build leaves an INVALID index behind which IF NOT
+    EXISTS would silently keep, so drop it first and rebuild.
+    """
+    def step(cursor):
+        cursor.execute('''
+        SELECT i.indisvalid
+        FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+        WHERE c.relname = %s
+        ''', (name,))
+        row = cursor.fetchone()
+        if row is not None and not row[0]:
+            logger.warning(f"Dropping invalid index {name} before rebuilding")
+            cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        cursor.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX CONCURRENTLY IF NOT EXISTS {name} {definition}")
+    return step
+
+
+# Columns covered by the contact search index, with their ranking weight
+SEARCH_COLUMNS = [
+    ('name', 10.0, 'A'),
+    ('company_name', 8.0, 'A'),
+    ('job_title', 4.0, 'B'),
+    ('location', 2.0, 'C'),
+    ('company_niche', 2.0, 'C'),
+    ('notes', 1.0, 'D'),
+]
+
+# Postgres queries must repeat this exact expression to use the GIN index
+PG_SEARCH_VECTOR = ' || '.join(
+    f"setweight(to_tsvector('simple', COALESCE({column}, '')), '{pg_weight}')"
+    for column, _, pg_weight in SEARCH_COLUMNS
+)
+
+
+def _create_sqlite_search_index(cursor):
+    """FTS5 index over contacts kept in sync by triggers"""
+    columns = ', '.join(column for column, _, _ in SEARCH_COLUMNS)
+    new_values = ', '.join(f'new.{column}' for column, _, _ in SEARCH_COLUMNS)
+    old_values = ', '.join(f'old.{column}' for column, _, _ in SEARCH_COLUMNS)
+    try:
+        cursor.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts USING fts5(
+            {columns},
+            content='contacts', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        ''')
+    except sqlite3.OperationalError as e:
+        # SQLite builds without FTS5 fall back to LIKE search
+        logger.warning(f"Full-text search unavailable: {e}")
+        return
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS contacts_fts_ai AFTER INSERT ON contacts BEGIN
+        INSERT INTO contacts_fts (rowid, {columns}) VALUES (new.id, {new_values});
+    END
+    ''')
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS contacts_fts_ad AFTER DELETE ON contacts BEGIN
+        INSERT INTO contacts_fts (contacts_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+    END
+    ''')
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS contacts_fts_au AFTER UPDATE OF {columns} ON contacts BEGIN
+        INSERT INTO contacts_fts (contacts_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+        INSERT INTO contacts_fts (rowid, {columns}) VALUES (new.id, {new_values});
+    END
+    ''')
+    cursor.execute("INSERT INTO contacts_fts (contacts_fts) VALUES ('rebuild')")
+
+
+def _placeholder(cursor):
+    return '?' if isinstance(cursor, sqlite3.Cursor) else '%s'
+
+
+def _add_dedup_key_column(cursor):
+    if isinstance(cursor, sqlite3.Cursor):
+        cursor.execute("PRAGMA table_info(contacts)")
+        if 'dedup_key' not in [col[1] for col in cursor.fetchall()]:
+            cursor.execute("ALTER TABLE contacts ADD COLUMN dedup_key TEXT")
+    else:
+        cursor.execute("ALTER TABLE contacts ADD COLUMN IF NOT EXISTS dedup_key TEXT")
+
+
+def _backfill_dedup_keys(cursor, batch_size=5000):
+    """Key existing contacts; later copies of an identity keep a NULL key so
+    the unique index can be built (remove_duplicate_contacts deletes them)"""
+    p = _placeholder(cursor)
+    cursor.execute('SELECT id, name, company_name FROM contacts WHERE dedup_key IS NULL ORDER BY id')
+    rows = cursor.fetchall()
+    cursor.execute('SELECT dedup_key FROM contacts WHERE dedup_key IS NOT NULL')
+    seen = {row[0] for row in cursor.fetchall()}
+    updates = []
+    for contact_id, name, company_name in rows:
+        key = dedup_key(name, company_name)
+        if key not in seen:
+            seen.add(key)
+            updates.append((key, contact_id))
+    for start in range(0, len(updates), batch_size):
+        cursor.executemany(f'UPDATE contacts SET dedup_key = {p} WHERE id = {p}', updates[start:start + batch_size])
+
+
+FOLLOWUP_SCHEDULE_TABLE = '''
+CREATE TABLE IF NOT EXISTS followup_schedule (
+    contact_id INTEGER PRIMARY KEY REFERENCES contacts (id) ON DELETE CASCADE,
+    cadence TEXT NOT NULL,
+    step INTEGER NOT NULL DEFAULT 0,
+    due_at TIMESTAMP NOT NULL,
+    state TEXT NOT NULL DEFAULT 'scheduled',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+'''
+
+
+def _backfill_followup_schedule(due_at):
+    """Schedule contacts already awaiting a follow-up at their stored date"""
+    return f'''
+    INSERT INTO followup_schedule (contact_id, cadence, step, due_at)
+    SELECT id, 'interval', CASE WHEN status = 'Follow-Up Sent' THEN 1 ELSE 0 END, {due_at}
+    FROM contacts
+    WHERE status IN ('Applied', 'Follow-Up Sent') AND next_followup_date IS NOT NULL
+    ON CONFLICT (contact_id) DO NOTHING
+    '''
+
+
+def _add_company_key_column(cursor):
+    if isinstance(cursor, sqlite3.Cursor):
+        cursor.execute("PRAGMA table_info(contacts)")
+        if 'company_key' not in [col[1] for col in cursor.fetchall()]:
+            cursor.execute("ALTER TABLE contacts ADD COLUMN company_key TEXT")
+    else:
+        cursor.execute("ALTER TABLE contacts ADD COLUMN IF NOT EXISTS company_key TEXT")
+
+
+def _backfill_company_keys(cursor, batch_size=5000):
+    p = _placeholder(cursor)
+    cursor.execute('SELECT id, company_name FROM contacts WHERE company_key IS NULL AND company_name IS NOT NULL')
+    updates = [(company_key(name), contact_id) for contact_id, name in cursor.fetchall()]
+    for start in range(0, len(updates), batch_size):
+        cursor.executemany(f'UPDATE contacts SET company_key = {p} WHERE id = {p}', updates[start:start + batch_size])
+
+
+COMPANY_TABLES = [
+    '''
+    CREATE TABLE IF NOT EXISTS companies (
+        company_key TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        color TEXT NOT NULL,
+        contact_count INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS company_status_counts (
+        company_key TEXT NOT NULL,
+        status TEXT NOT NULL,
+        contact_count INTEGER NOT NULL,
+        PRIMARY KEY (company_key, status)
+    )
+    ''',
+]
+
+
+def _backfill_companies(cursor):
+    """Count every company from scratch"""
+    p = _placeholder(cursor)
+    cursor.execute('''
+    SELECT company_key, MIN(company_name), COUNT(*) FROM contacts
+    WHERE company_key IS NOT NULL
+    GROUP BY company_key
+    ''')
+    companies = [(key, ' '.join(name.split()), company_color(name), count) for key, name, count in cursor.fetchall()]
+    cursor.executemany(
+        f'''INSERT INTO companies (company_key, name, color, contact_count) VALUES ({p}, {p}, {p}, {p})
+        ON CONFLICT (company_key) DO NOTHING''',
+        companies
+    )
+    cursor.execute('''
+    INSERT INTO company_status_counts (company_key, status, contact_count)
+    SELECT company_key, COALESCE(status, 'Not Applied'), COUNT(*) FROM contacts
+    WHERE company_key IS NOT NULL
+    GROUP BY company_key, COALESCE(status, 'Not Applied')
+    ON CONFLICT (company_key, status) DO NOTHING
+    ''')
+
+
+DUPLICATE_REVIEW_TABLE = '''
+CREATE TABLE IF NOT EXISTS duplicate_review (
+    cluster_id INTEGER NOT NULL,
+    contact_id INTEGER NOT NULL,
+    score REAL NOT NULL,
+    reason TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    detected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (cluster_id, contact_id)
+)
+'''
+
+
+def _add_email_column(cursor):
+    if isinstance(cursor, sqlite3.Cursor):
+        cursor.execute("PRAGMA table_info(contacts)")
+        if 'email' not in [col[1] for col in cursor.fetchall()]:
+            cursor.execute("ALTER TABLE contacts ADD COLUMN email TEXT")
+    else:
+        cursor.execute("ALTER TABLE contacts ADD COLUMN IF NOT EXISTS email TEXT")
+
+
+def _outbound_queue_table(id_column):
+    return f'''
+    CREATE TABLE IF NOT EXISTS outbound_queue (
+        id {id_column},
+        contact_id INTEGER REFERENCES contacts (id) ON DELETE SET NULL,
+        recipient TEXT NOT NULL,
+        domain TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        body TEXT NOT NULL,
+        kind TEXT NOT NULL DEFAULT 'initial',
+        state TEXT NOT NULL DEFAULT 'queued',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at TIMESTAMP NOT NULL,
+        claimed_at TIMESTAMP,
+        sent_at TIMESTAMP,
+        message_id TEXT,
+        last_error TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    '''
+
+
+# Latest event of each kind per contact, maintained by the event rollup
+ENGAGEMENT_COLUMNS = ('last_opened', 'last_clicked', 'last_replied')
+
+
+def _add_engagement_columns(cursor):
+    if isinstance(cursor, sqlite3.Cursor):
+        cursor.execute("PRAGMA table_info(contacts)")
+        existing = [col[1] for col in cursor.fetchall()]
+        for column in ENGAGEMENT_COLUMNS:
+            if column not in existing:
+                cursor.execute(f"ALTER TABLE contacts ADD COLUMN {column} TIMESTAMP")
+    else:
+        for column in ENGAGEMENT_COLUMNS:
+            cursor.execute(f"ALTER TABLE contacts ADD COLUMN IF NOT EXISTS {column} TIMESTAMP")
+
+
+def _events_table(id_column):
+    # Append-only and unconstrained, so bursts insert at full speed; the
+    # rollup reads it by id past event_rollup's watermark
+    return f'''
+    CREATE TABLE IF NOT EXISTS events (
+        id {id_column},
+        message_id INTEGER,
+        contact_id INTEGER,
+        kind TEXT NOT NULL,
+        url TEXT,
+        occurred_at TIMESTAMP NOT NULL
+    )
+    '''
+
+
+EVENT_ROLLUP_TABLE = '''
+CREATE TABLE IF NOT EXISTS event_rollup (
+    name TEXT PRIMARY KEY,
+    last_event_id INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP
+)
+'''
+
+
+def _add_outbound_template_column(cursor):
+    if isinstance(cursor, sqlite3.Cursor):
+        cursor.execute("PRAGMA table_info(outbound_queue)")
+        if 'template_id' not in [col[1] for col in cursor.fetchall()]:
+            cursor.execute("ALTER TABLE outbound_queue ADD COLUMN template_id INTEGER")
+    else:
+        cursor.execute("ALTER TABLE outbound_queue ADD COLUMN IF NOT EXISTS template_id INTEGER")
+
+
+# One message of each kind per contact and template, so queueing a merge
+# twice sends nothing twice; messages queued without a template never clash
+OUTBOUND_TEMPLATE_INDEX = (
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_outbound_queue_template ON outbound_queue (contact_id, template_id, kind)"
+)
+
+
+# Events of each kind a rollup has applied, kept as it runs so totals never
+# need a scan of events
+EVENT_COUNT_COLUMNS = {'open': 'opens', 'click': 'clicks', 'reply': 'replies'}
+
+
+def _add_event_count_columns(cursor):
+    if isinstance(cursor, sqlite3.Cursor):
+        cursor.execute("PRAGMA table_info(event_rollup)")
+        existing = [col[1] for col in cursor.fetchall()]
+        for column in EVENT_COUNT_COLUMNS.values():
+            if column not in existing:
+                cursor.execute(f"ALTER TABLE event_rollup ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0")
+    else:
+        for column in EVENT_COUNT_COLUMNS.values():
+            cursor.execute(f"ALTER TABLE event_rollup ADD COLUMN IF NOT EXISTS {column} INTEGER NOT NULL DEFAULT 0")
+
+
+def _backfill_event_counts(cursor):
+    # Once, for the events rolled up before the counters existed
+    for kind, column in EVENT_COUNT_COLUMNS.items():
+        cursor.execute(f'''
+        UPDATE event_rollup SET {column} = (
+            SELECT COUNT(*) FROM events WHERE events.kind = '{kind}' AND events.id <= event_rollup.last_event_id
+        )
+        ''')
+
+
+DATA_VERSIONS_TABLE = '''
+CREATE TABLE IF NOT EXISTS data_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+)
+'''
+
+
+MIGRATIONS = [
+    Migration(
+        1,
+        "Hot-path indexes on contacts",
+        sqlite=[
+            "CREATE INDEX IF NOT EXISTS idx_contacts_status_next_followup ON contacts (status, next_followup_date)",
+            "CREATE INDEX IF NOT EXISTS idx_contacts_company_name ON contacts (company_name)",
+            "CREATE INDEX IF NOT EXISTS idx_contacts_created_at ON contacts (created_at DESC, id DESC)",
+            "CREATE INDEX IF NOT EXISTS idx_contacts_name_company_lower ON contacts (LOWER(name), LOWER(company_name))",
+        ],
+        postgres=[
+            _create_index_concurrently('idx_contacts_status_next_followup', 'ON contacts (status, next_followup_date)'),
+            _create_index_concurrently('idx_contacts_company_name', 'ON contacts (company_name)'),
+            _create_index_concurrently('idx_contacts_created_at', 'ON contacts (created_at DESC, id DESC)'),
+            _create_index_concurrently('idx_contacts_name_company_lower', 'ON contacts (LOWER(name), LOWER(company_name))'),
+        ],
+        transactional=False,
+    ),
+    Migration(
+        2,
+        "SQLite write-ahead logging",
+        sqlite=["PRAGMA journal_mode = WAL"],
+        postgres=[],
+        transactional=True,
+    ),
+    Migration(
+        3,
+        "Full-text search index on contacts",
+        sqlite=[_create_sqlite_search_index],
+        postgres=[
+            _create_index_concurrently('idx_contacts_search', f'ON contacts USING GIN (({PG_SEARCH_VECTOR}))'),
+        ],
+        transactional=False,
+    ),
+    Migration(
+        4,
+        "Normalized dedup key with unique index",
+        sqlite=[
+            _add_dedup_key_column,
+            _backfill_dedup_keys,
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_contacts_dedup_key ON contacts (dedup_key)",
+        ],
+        postgres=[
+            _add_dedup_key_column,
+            _backfill_dedup_keys,
+            _create_index_concurrently('idx_contacts_dedup_key', 'ON contacts (dedup_key)', unique=True),
+        ],
+        transactional=False,
+    ),
+    Migration(
+        5,
+        "Follow-up schedule keyed on due timestamp",
+        sqlite=[
+            FOLLOWUP_SCHEDULE_TABLE,
+            "CREATE INDEX IF NOT EXISTS idx_followup_schedule_due_at ON followup_schedule (due_at)",
+            "CREATE INDEX IF NOT EXISTS idx_followup_schedule_state_due_at ON followup_schedule (state, due_at)",
+            _backfill_followup_schedule('datetime(next_followup_date)'),
+        ],
+        postgres=[
+            FOLLOWUP_SCHEDULE_TABLE,
+            "CREATE INDEX IF NOT EXISTS idx_followup_schedule_due_at ON followup_schedule (due_at)",
+            "CREATE INDEX IF NOT EXISTS idx_followup_schedule_state_due_at ON followup_schedule (state, due_at)",
+            _backfill_followup_schedule('next_followup_date'),
+        ],
+        transactional=True,
+    ),
+    Migration(
+        6,
+        "Company dimension with contact and status counts",
+        sqlite=[
+            _add_company_key_column,
+            _backfill_company_keys,
+            *COMPANY_TABLES,
+            "CREATE INDEX IF NOT EXISTS idx_companies_contact_count ON companies (contact_count DESC, company_key)",
+            _backfill_companies,
+        ],
+        postgres=[
+            _add_company_key_column,
+            _backfill_company_keys,
+            *COMPANY_TABLES,
+            "CREATE INDEX IF NOT EXISTS idx_companies_contact_count ON companies (contact_count DESC, company_key)",
+            _backfill_companies,
+        ],
+        transactional=True,
+    ),
+    Migration(
+        7,
+        "Review queue for fuzzy duplicate clusters",
+        sqlite=[
+            DUPLICATE_REVIEW_TABLE,
+            "CREATE INDEX IF NOT EXISTS idx_duplicate_review_state ON duplicate_review (state, cluster_id)",
+            "CREATE INDEX IF NOT EXISTS idx_duplicate_review_contact ON duplicate_review (contact_id)",
+        ],
+        postgres=[
+            DUPLICATE_REVIEW_TABLE,
+            "CREATE INDEX IF NOT EXISTS idx_duplicate_review_state ON duplicate_review (state, cluster_id)",
+            "CREATE INDEX IF NOT EXISTS idx_duplicate_review_contact ON duplicate_review (contact_id)",
+        ],
+        transactional=True,
+    ),
+    Migration(
+        8,
+        "Contact email and outbound send queue",
+        sqlite=[
+            _add_email_column,
+            _outbound_queue_table('INTEGER PRIMARY KEY'),
+            "CREATE INDEX IF NOT EXISTS idx_outbound_queue_state_next ON outbound_queue (state, next_attempt_at)",
+            "CREATE INDEX IF NOT EXISTS idx_outbound_queue_contact ON outbound_queue (contact_id)",
+        ],
+        postgres=[
+            _add_email_column,
+            _outbound_queue_table('SERIAL PRIMARY KEY'),
+            "CREATE INDEX IF NOT EXISTS idx_outbound_queue_state_next ON outbound_queue (state, next_attempt_at)",
+            "CREATE INDEX IF NOT EXISTS idx_outbound_queue_contact ON outbound_queue (contact_id)",
+        ],
+        transactional=True,
+    ),
+    Migration(
+        9,
+        "Engagement events with per-contact rollups",
+        sqlite=[
+            _add_engagement_columns,
+            _events_table('INTEGER PRIMARY KEY'),
+            "CREATE INDEX IF NOT EXISTS idx_events_contact ON events (contact_id, occurred_at)",
+            EVENT_ROLLUP_TABLE,
+        ],
+        postgres=[
+            _add_engagement_columns,
+            _events_table('BIGSERIAL PRIMARY KEY'),
+            "CREATE INDEX IF NOT EXISTS idx_events_contact ON events (contact_id, occurred_at)",
+            EVENT_ROLLUP_TABLE,
+        ],
+        transactional=True,
+    ),
+    Migration(
+        10,
+        "Data versions shared between processes",
+        sqlite=[DATA_VERSIONS_TABLE],
+        postgres=[DATA_VERSIONS_TABLE],
+        transactional=True,
+    ),
+    Migration(
+        11,
+        "Outbound queue keyed on contact, template and kind",
+        sqlite=[_add_outbound_template_column, OUTBOUND_TEMPLATE_INDEX],
+        postgres=[_add_outbound_template_column, OUTBOUND_TEMPLATE_INDEX],
+        transactional=True,
+    ),
+    Migration(
+        12,
+        "Event totals kept by the rollup",
+        sqlite=[_add_event_count_columns, _backfill_event_counts],
+        postgres=[_add_event_count_columns, _backfill_event_counts],
+        transactional=True,
+    ),
+]
+
+# Arbitrary key for the Postgres advisory lock serialising concurrent migrators
+_PG_LOCK_KEY = 727274
+
+
+def _run_step(cursor, step):
+    if callable(step):
+        step(cursor)
+    else:
+        cursor.execute(step)
+
+
+def _ensure_version_table(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+
+def get_schema_version(cursor):
+    cursor.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version')
+    return cursor.fetchone()[0]
+
+
+def _apply_sqlite(conn):
+    cursor = conn.cursor()
+    _ensure_version_table(cursor)
+    conn.commit()
+    current = get_schema_version(cursor)
+    applied = []
+    for migration in MIGRATIONS:
+        if migration.version <= current:
+            continue
+        try:
+            for step in migration.sqlite:
+                _run_step(cursor, step)
+            cursor.execute(
+                'INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                (migration.version, migration.description)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(migration.version)
+    return applied
+
+
+def _apply_postgres(conn):
+    cursor = conn.cursor()
+    previous_autocommit = conn.autocommit
+    conn.autocommit = True
+    applied = []
+    try:
+        # Session-level lock so only one process migrates at a time
+        cursor.execute('SELECT pg_advisory_lock(%s)', (_PG_LOCK_KEY,))
+        try:
+            _ensure_version_table(cursor)
+            current = get_schema_version(cursor)
+            for migration in MIGRATIONS:
+                if migration.version <= current:
+                    continue
+                if migration.transactional:
+                    cursor.execute('BEGIN')
+                try:
+                    for step in migration.postgres:
+                        _run_step(cursor, step)
+                    cursor.execute(
+                        'INSERT INTO schema_version (version, description) VALUES (%s, %s)',
+                        (migration.version, migration.description)
+                    )
+                except Exception:
+                    if migration.transactional:
+                        cursor.execute('ROLLBACK')
+                    raise
+                if migration.transactional:
+                    cursor.execute('COMMIT')
+                applied.append(migration.version)
+        finally:
+            cursor.execute('SELECT pg_advisory_unlock(%s)', (_PG_LOCK_KEY,))
+    finally:
+        conn.autocommit = previous_autocommit
+    return applied
+
+
+def apply_migrations(conn, postgres):
+    """Bring the schema up to the latest version; returns applied versions"""
+    applied = _apply_postgres(conn) if postgres else _apply_sqlite(conn)
+    for version in applied:
+        logger.info(f"Applied migration {version}")
+    return applied
@@ -0,0 +1,20 @@
+import importlib
+
+# Navigation label -> (module, render function). A page module, and heavy
+# imports such as plotly that come with it, loads on first visit only.
+PAGES = {
+    "Home": ("landing", "show_landing"),
+    "Dashboard": ("dashboard", "show_dashboard"),
+    "Import Data": ("import_data", "show_import_data"),
+    "Follow-Up Reminders": ("followups", "show_followups"),
+    "Email Templates": ("templates", "show_templates"),
+    "Outbox": ("outbox", "show_outbox"),
+    "Analytics": ("analytics", "show_analytics"),
+    "Database Info": ("db_info", "show_db_info"),
+}
+
+
+def load_page(label):
+    """The render function of the page shown under label"""
+    module_name, function = PAGES[label]
+    return getattr(importlib.import_module(f"{__name__}.{module_name}"), function)
@@ -1,40 +1,56 @@
 import streamlit as st
 import plotly.express as px
-from services.contact_service import load_contacts
+import pandas as pd
+from services.contact_service import load_aggregates
+
+def _top_bar(rows, label, title):
+    # Create a DataFrame for Plotly
+    top = pd.DataFrame(rows).rename(columns={'value': label, 'count': 'Count'})
+    fig = px.bar(
+        top, 
+        x='Count', 
+        y=label, 
+        orientation='h', 
+        title=title
+    )
+    fig.update_yaxes(autorange="reversed")
+    st.plotly_chart(fig, use_container_width=True)
 
 def show_analytics():
     st.title("📈 Analytics")
     
-    contacts_df = load_contacts()
+    aggregates = load_aggregates()
     
-    if len(contacts_df) == 0:
+    if aggregates['total_contacts'] == 0:
         st.info("No data yet!")
     else:
         col1, col2 = st.columns(2)
         
         with col1:
-            # Ensure status column exists
-            if 'status' in contacts_df.columns:
-                status_counts = contacts_df['status'].value_counts()
-                fig = px.pie(values=status_counts.values, names=status_counts.index, title="Status Distribution")
-                st.plotly_chart(fig, use_container_width=True)
+            status_counts = aggregates['status_counts']
+            fig = px.pie(
+                values=list(status_counts.values()),
+                names=[status or 'Unknown' for status in status_counts],
+                title="Status Distribution"
+            )
+            st.plotly_chart(fig, use_container_width=True)
+        
+        with col2:
+            if aggregates['company_name']:
+                _top_bar(aggregates['company_name'], 'Company', "Top Companies")
+            else:
+                st.warning("Company data not available")
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            if aggregates['company_niche']:
+                _top_bar(aggregates['company_niche'], 'Niche', "Top Niches")
             else:
-                st.warning("Status data not available")
+                st.warning("Niche data not available")
         
         with col2:
-            # Ensure company_name column exists
-            if 'company_name' in contacts_df.columns:
-                # Create a DataFrame for Plotly
-                top_companies = contacts_df['company_name'].value_counts().head(10).reset_index()
-                top_companies.columns = ['Company', 'Count']
-                
-                fig = px.bar(
-                    top_companies, 
-                    x='Count', 
-                    y='Company', 
-                    orientation='h', 
-                    title="Top Companies"
-                )
-                st.plotly_chart(fig, use_container_width=True)
+            if aggregates['location']:
+                _top_bar(aggregates['location'], 'Location', "Top Locations")
             else:
-                st.warning("Company data not available")
\ No newline at end of file
+                st.warning("Location data not available")
\ No newline at end of file
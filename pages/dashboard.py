@@ -1,21 +1,30 @@
+from datetime import datetime
 import streamlit as st
 import pandas as pd
-from services.followup_service import load_due_followups
-from components import contact_card, status_badge, metric_card
-from services.contact_service import load_contacts, update_contact_status, delete_contact
-from services.followup_service import load_due_followups, mark_followup_sent_wrapper as mark_followup_sent
+from components import contact_card, status_badge, metric_card, prepare_file, prepared_file, file_download
+from services.contact_service import (
+    load_aggregates, load_filter_options, load_contact_page, load_companies, company_color,
+    update_contact_status, delete_contact,
+    update_contacts_status, delete_contacts, get_contact_ids, apply_contact_edits
+)
+from services.followup_service import load_due_followups, mark_followup_sent_wrapper as mark_followup_sent, mark_followups_sent
+from services.gather import gather
+from services.profiling import profile_section
+from services.export_service import export_contacts, EXPORT_FORMATS
+
+STATUS_OPTIONS = ['Not Applied', 'Applied', 'Follow-Up Sent', 'Rejected', 'Accepted', 'No Response']
+
+CARD_PAGE_SIZE = 20
+TABLE_PAGE_SIZES = [50, 100, 250, 500, 1000, 2500, 5000]
+TABLE_COLUMNS = [
+    'id', 'name', 'job_title', 'company_name', 'status', 'notes', 'next_followup_date',
+    'linkedin_url', 'company_website', 'company_linkedin', 'location',
+]
 
 # Dark theme color mapping with better contrast
 def get_company_color(company_name):
-    """Assign consistent dark theme color to a company using hash algorithm"""
-    if not company_name:
-        return "#555555"  # Dark gray for missing company
-    
-    # Generate hue from hash (0-360)
-    hue = hash(company_name) % 360
-    
-    # Dark theme colors: higher saturation, lower lightness
-    return f"hsl({hue}, 65%, 25%)"
+    """Assign consistent dark theme color to a company (same in every process)"""
+    return company_color(company_name)
 
 def format_social_links(row):
     """Format social links with pipe separators"""
@@ -56,27 +65,247 @@ def dashboard_contact_card(row):
         if phone:
             contact_info.append(f"📞 {phone}")
         st.write(" | ".join(contact_info))
+
+    # Latest engagement recorded by the tracking server
+    for column, label in (('last_replied', "↩️ Replied"), ('last_clicked', "🔗 Clicked"), ('last_opened', "👁️ Opened")):
+        moment = row.get(column)
+        if pd.notna(moment):
+            st.caption(f"{label} {pd.Timestamp(moment):%Y-%m-%d %H:%M}")
+            break
     
     # Formatted social links with pipe separators
     links_text = format_social_links(row)
     st.markdown(links_text)
 
+def bulk_actions(page_data, filters, search_term, total_found, selected_ids=None):
+    """Actions applied in one batched write, to the contacts selected here
+    (or, in table mode, in the table: pass selected_ids) or to every match"""
+    with st.expander("☑️ Bulk Actions"):
+        if selected_ids is None:
+            selection = page_data[['id', 'name', 'company_name', 'job_title', 'status']].copy()
+            selection.insert(0, 'selected', False)
+            edited = st.data_editor(
+                selection,
+                column_config={
+                    'selected': st.column_config.CheckboxColumn("Select"),
+                    'id': None,
+                    'name': "Name",
+                    'company_name': "Company",
+                    'job_title': "Job Title",
+                    'status': "Status",
+                },
+                disabled=['name', 'company_name', 'job_title', 'status'],
+                hide_index=True,
+                use_container_width=True,
+                key=f"bulk_select_{_page_key(page_data)}"
+            )
+            selected_ids = edited.loc[edited['selected'], 'id'].tolist()
+        else:
+            st.caption(f"{len(selected_ids)} contacts selected in the table")
+
+        all_matching = f"All {total_found} contacts matching the filters"
+        scope = st.radio("Apply to:", ["Selected contacts", all_matching], horizontal=True)
+        col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
+        with col1:
+            new_status = st.selectbox("Status", STATUS_OPTIONS, key="bulk_status")
+
+        def target_ids():
+            if scope == "Selected contacts":
+                return selected_ids
+            return get_contact_ids(filters, search_term or None)
+
+        message = None
+        with col2:
+            if st.button("Update", key="bulk_update", help="Set status for all targeted contacts"):
+                message = f"Updated {update_contacts_status(target_ids(), new_status)} contacts"
+        with col3:
+            if st.button("Mark Follow-up", key="bulk_followup", help="Mark follow-up sent for all targeted contacts"):
+                message = f"Marked follow-up for {mark_followups_sent(target_ids())} contacts"
+        with col4:
+            if st.button("Delete", key="bulk_delete", help="Delete all targeted contacts"):
+                if scope == all_matching:
+                    st.session_state['bulk_delete_pending'] = (tuple(sorted(filters.items())), search_term)
+                else:
+                    message = f"Deleted {delete_contacts(target_ids())} contacts"
+
+        # Deleting every match cannot be undone, so it asks first
+        pending = st.session_state.get('bulk_delete_pending')
+        if pending is not None and pending == (tuple(sorted(filters.items())), search_term) and scope == all_matching:
+            st.warning(f"Delete all {total_found} contacts matching the filters? This cannot be undone.")
+            col1, col2, _ = st.columns([1, 1, 4])
+            if col1.button("Confirm delete", key="bulk_delete_confirm", type="primary"):
+                del st.session_state['bulk_delete_pending']
+                message = f"Deleted {delete_contacts(target_ids())} contacts"
+            if col2.button("Cancel", key="bulk_delete_cancel"):
+                del st.session_state['bulk_delete_pending']
+                st.rerun()
+        elif pending is not None:
+            # The filters or scope changed since the request; ask again
+            del st.session_state['bulk_delete_pending']
+        if message:
+            st.session_state['dashboard_flash'] = message
+            st.rerun()
+
+def export_panel(filters, search_term):
+    """Download the contacts matching the current filters, optionally
+    narrowed by niche and follow-up due date"""
+    with st.expander("⬇️ Export"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            fmt = st.selectbox("Format", list(EXPORT_FORMATS), key="export_format", format_func=str.upper)
+        with col2:
+            niche = st.selectbox("Niche", ['All'] + load_filter_options('company_niche'), key="export_niche")
+        with col3:
+            due_before = st.date_input("Follow-up due by", value=None, key="export_due")
+
+        export_filters = dict(filters)
+        if niche != 'All':
+            export_filters['company_niche'] = niche
+        export_key = (tuple(sorted(export_filters.items())), search_term, due_before, fmt)
+
+        if st.button("Prepare export", key="export_prepare"):
+            progress = st.empty()
+            # Rows are written to disk as they stream in, and read back only on download
+            prepare_file('dashboard_export', export_key, lambda out: export_contacts(
+                out, fmt, export_filters, search_term or None, due_before,
+                on_progress=lambda rows: progress.caption(f"Exported {rows} contacts...")
+            ))
+            progress.empty()
+
+        prepared = prepared_file('dashboard_export', export_key)
+        if prepared:
+            path, count = prepared
+            file_download(
+                f"Download {count} contacts ({fmt.upper()})",
+                path,
+                file_name=f"contacts_{datetime.now():%Y%m%d_%H%M}.{fmt}",
+                mime=EXPORT_FORMATS[fmt],
+                key="export_download"
+            )
+
+def _page_key(page_data):
+    # Widget state must not carry over to a page holding different contacts
+    return hash(tuple(page_data['id']))
+
+def _cell_changed(old, new):
+    if pd.isna(old) and (new is None or new == ''):
+        return False
+    return old != new
+
+def contacts_table(page_data, editor_key):
+    """Table mode: the whole page in one data editor, status and notes
+    editable in place, saved together in one batch write. Returns the ids
+    of the rows ticked for bulk actions."""
+    table = page_data.reindex(columns=TABLE_COLUMNS)
+    table.insert(0, 'selected', False)
+    st.data_editor(
+        table,
+        column_config={
+            'selected': st.column_config.CheckboxColumn("Select"),
+            'id': None,
+            'name': "Name",
+            'job_title': "Job Title",
+            'company_name': "Company",
+            'status': st.column_config.SelectboxColumn("Status", options=STATUS_OPTIONS, required=True),
+            'notes': st.column_config.TextColumn("Notes"),
+            'next_followup_date': "Next Follow-up",
+            'linkedin_url': st.column_config.LinkColumn("LinkedIn"),
+            'company_website': st.column_config.LinkColumn("Website"),
+            'company_linkedin': st.column_config.LinkColumn("Company LinkedIn"),
+            'location': "Location",
+        },
+        disabled=[c for c in TABLE_COLUMNS if c not in ('status', 'notes')],
+        hide_index=True,
+        use_container_width=True,
+        key=editor_key
+    )
+
+    # edited_rows maps row positions to the changed cells only
+    edited_rows = st.session_state.get(editor_key, {}).get('edited_rows', {})
+    edits, selected_ids = {}, []
+    with profile_section("diff table edits"):
+        for position, changes in edited_rows.items():
+            row = table.iloc[int(position)]
+            if changes.get('selected'):
+                selected_ids.append(int(row['id']))
+            changed = {
+                column: value for column, value in changes.items()
+                if column != 'selected' and _cell_changed(row[column], value)
+            }
+            if changed:
+                edits[int(row['id'])] = changed
+
+    col1, col2, _ = st.columns([1, 1, 4])
+    with col1:
+        if st.button(f"💾 Save changes ({len(edits)})", disabled=not edits, key="table_save"):
+            st.session_state['dashboard_flash'] = f"Saved changes to {apply_contact_edits(edits)} contacts"
+            st.session_state['dashboard_table_rev'] = st.session_state.get('dashboard_table_rev', 0) + 1
+            st.rerun()
+    with col2:
+        if st.button("Discard", disabled=not edits, key="table_discard"):
+            st.session_state['dashboard_table_rev'] = st.session_state.get('dashboard_table_rev', 0) + 1
+            st.rerun()
+    return selected_ids
+
+COMPANIES_PER_PAGE = 30
+
+def companies_panel():
+    """Unique companies from the companies table, searchable and paginated"""
+    st.markdown("### Unique Companies")
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        search = st.text_input("Search companies:", key="company_search")
+    with col2:
+        sort = st.selectbox("Sort by:", ["contacts", "name"], key="company_sort",
+                            format_func=lambda s: "Most contacts" if s == "contacts" else "Name")
+    total = load_companies(search or None, sort, 0, 1)['total']
+    pages = max((total - 1) // COMPANIES_PER_PAGE + 1, 1)
+    with col3:
+        page = st.number_input(f"Page (of {pages}):", min_value=1, max_value=pages, value=1,
+                               key=f"company_page_{search}_{sort}")
+    offset = (page - 1) * COMPANIES_PER_PAGE
+    companies = load_companies(search or None, sort, offset, COMPANIES_PER_PAGE)['companies']
+
+    cols = st.columns(3)
+    for i, company in enumerate(companies, start=offset + 1):
+        statuses = ", ".join(f"{status} {count}" for status, count in sorted(company['status_counts'].items()))
+        with cols[(i - 1) % 3]:
+            st.markdown(
+                f'<div style="background-color: {company["color"]}; color: white; padding: 8px 12px; '
+                f'border-radius: 4px; margin-bottom: 10px; font-weight: 500;">'
+                f'<b>{i}. {company["name"]}</b> ({company["contact_count"]})'
+                f'<br><small>{statuses}</small></div>',
+                unsafe_allow_html=True
+            )
+
+def _keyset_page(query_key):
+    """Track the keyset cursors of the pages visited for the current query"""
+    if st.session_state.get('dashboard_query') != query_key:
+        st.session_state['dashboard_query'] = query_key
+        st.session_state['dashboard_cursors'] = [None]
+    return st.session_state['dashboard_cursors']
+
 def show_dashboard():
     st.title("📊 Dashboard - All Contacts")
 
-    # Get contacts with caching
-    contacts_df = load_contacts()
+    # Independent loads run concurrently; the page waits for the slowest only
+    aggregates, due_followups, companies, statuses = gather(
+        load_aggregates,
+        load_due_followups,
+        (load_filter_options, 'company_name'),
+        (load_filter_options, 'status'),
+    )
+    status_counts = aggregates['status_counts']
+    total_contacts = aggregates['total_contacts']
 
-    if len(contacts_df) == 0:
+    if total_contacts == 0:
         st.info("No contacts found. Start by importing your Excel file!")
         st.markdown("👆 Use the sidebar to navigate to 'Import Data'")
     else:
         # Quick stats
-        total_contacts = len(contacts_df)
-        status_counts = contacts_df['status'].value_counts()
         applied_count = status_counts.get('Applied', 0) + status_counts.get('Follow-Up Sent', 0)
         accepted_count = status_counts.get('Accepted', 0)
-        followup_due = len(load_due_followups())
+        followup_due = len(due_followups)
 
         col1, col2, col3, col4 = st.columns(4)
         with col1: st.metric("Total Contacts", total_contacts)
@@ -89,48 +318,67 @@ def show_dashboard():
         # Filters
         col1, col2, col3 = st.columns(3)
         with col1:
-            status_options = ['All'] + list(contacts_df['status'].unique())
+            status_options = ['All'] + statuses
             status_filter = st.selectbox("Filter by Status:", status_options)
         with col2:
-            company_options = ['All'] + sorted(contacts_df['company_name'].dropna().unique())
+            company_options = ['All'] + companies
             company_filter = st.selectbox("Filter by Company:", company_options)
         with col3:
-            search_term = st.text_input("Search (Name/Company):")
+            search_term = st.text_input(
+                "Search:", help="Matches name, company, job title, location, niche and notes (prefixes work too)"
+            )
 
-        # Apply filters
-        filtered_df = contacts_df.copy()
+        # Filtering and pagination happen in the database
+        filters = {}
         if status_filter != 'All':
-            filtered_df = filtered_df[filtered_df['status'] == status_filter]
+            filters['status'] = status_filter
         if company_filter != 'All':
-            filtered_df = filtered_df[filtered_df['company_name'] == company_filter]
-        if search_term:
-            mask = (
-                filtered_df['name'].str.contains(search_term, case=False, na=False) |
-                filtered_df['company_name'].str.contains(search_term, case=False, na=False)
-            )
-            filtered_df = filtered_df[mask]
+            filters['company_name'] = company_filter
 
-        # Pagination
-        contacts_per_page = 20
-        total_pages = (len(filtered_df) - 1) // contacts_per_page + 1 if len(filtered_df) > 0 else 1
+        col1, col2, _ = st.columns([1, 1, 2])
+        with col1:
+            view = st.radio("View:", ["Cards", "Table"], horizontal=True, key="dashboard_view")
+        if view == "Table":
+            with col2:
+                contacts_per_page = st.selectbox("Rows per page:", TABLE_PAGE_SIZES, key="dashboard_page_size")
+        else:
+            contacts_per_page = CARD_PAGE_SIZE
+        cursors = _keyset_page((status_filter, company_filter, search_term, contacts_per_page))
+        page_num = len(cursors)
+        sort = 'relevance' if search_term else 'newest'
+        result = load_contact_page(filters, search_term or None, sort, cursors[-1], contacts_per_page)
+        page_data = result['contacts']
+        total_found = result['total']
+        total_pages = (total_found - 1) // contacts_per_page + 1 if total_found > 0 else 1
 
         if total_pages > 1:
             col1, col2, col3 = st.columns([1, 2, 1])
-            with col2:
-                page_num = st.selectbox(
-                    f"Page (showing {contacts_per_page} per page):",
-                    range(1, total_pages + 1)
-                )
-        else:
-            page_num = 1
+            with col1:
+                if st.button("← Previous", disabled=page_num == 1):
+                    cursors.pop()
+                    st.rerun()
+            with col3:
+                if st.button("Next →", disabled=result['next_cursor'] is None):
+                    cursors.append(result['next_cursor'])
+                    st.rerun()
 
-        start_idx = (page_num - 1) * contacts_per_page
-        end_idx = start_idx + contacts_per_page
-        page_data = filtered_df.iloc[start_idx:end_idx]
+        st.subheader(f"Contacts ({total_found} found, page {page_num} of {total_pages})")
 
-        st.subheader(f"Contacts ({len(filtered_df)} found, page {page_num} of {total_pages})")
+        if 'dashboard_flash' in st.session_state:
+            st.success(st.session_state.pop('dashboard_flash'))
+
+        if total_found > 0:
+            export_panel(filters, search_term)
+
+        if len(page_data) > 0 and view == "Table":
+            rev = st.session_state.get('dashboard_table_rev', 0)
+            selected_ids = contacts_table(page_data, f"contacts_table_{_page_key(page_data)}_{rev}")
+            # The table's own Select column drives the bulk actions
+            bulk_actions(page_data, filters, search_term, total_found, selected_ids)
+
+        elif len(page_data) > 0:
+            bulk_actions(page_data, filters, search_term, total_found)
 
-        if len(page_data) > 0:
             st.markdown('<div class="contact-table">', unsafe_allow_html=True)
 
             for idx, (_, row) in enumerate(page_data.iterrows()):
@@ -156,8 +404,8 @@ def show_dashboard():
                 with col1:
                     new_status = st.selectbox(
                         "Status",
-                        ['Not Applied', 'Applied', 'Follow-Up Sent', 'Rejected', 'Accepted', 'No Response'],
-                        index=['Not Applied', 'Applied', 'Follow-Up Sent', 'Rejected', 'Accepted', 'No Response'].index(
+                        STATUS_OPTIONS,
+                        index=STATUS_OPTIONS.index(
                             row.get('status', 'Not Applied')
                         ),
                         key=f"status_{row_id}"
@@ -166,7 +414,6 @@ def show_dashboard():
                     if st.button("Update", key=f"update_{row_id}", help="Update Status"):
                         if 'id' in row and row['id']:
                             update_contact_status(row['id'], new_status)
-                            st.cache_data.clear()
                             st.success("Updated!")
                             st.rerun()
                         else:
@@ -175,7 +422,6 @@ def show_dashboard():
                     if st.button("Mark Follow-up", key=f"followup_{row_id}", help="Mark Follow-up Sent"):
                         if 'id' in row and row['id']:
                             mark_followup_sent(row['id'])
-                            st.cache_data.clear()
                             st.success("Follow-up marked!")
                             st.rerun()
                         else:
@@ -184,7 +430,6 @@ def show_dashboard():
                     if st.button("Delete", key=f"delete_{row_id}", help="Delete Contact"):
                         if 'id' in row and row['id']:
                             delete_contact(row['id'])
-                            st.cache_data.clear()
                             st.success("Deleted!")
                             st.rerun()
                         else:
@@ -196,16 +441,4 @@ def show_dashboard():
             st.markdown("---")
             st.markdown('</div>', unsafe_allow_html=True)
 
-            # Show unique company names with serial numbers and dark theme colors
-            unique_companies = contacts_df['company_name'].dropna().unique()
-            st.markdown("### Unique Companies")
-            cols = st.columns(3)
-            for i, name in enumerate(sorted(unique_companies), start=1):
-                color = get_company_color(name)
-                with cols[(i-1) % 3]:
-                    st.markdown(
-                        f'<div style="background-color: {color}; color: white; padding: 8px 12px; '
-                        f'border-radius: 4px; margin-bottom: 10px; font-weight: 500;">'
-                        f'<b>{i}. {name}</b></div>',
-                        unsafe_allow_html=True
-                    )
\ No newline at end of file
+        companies_panel()
@@ -1,10 +1,103 @@
 import streamlit as st
-from services.contact_service import load_stats
+import pandas as pd
+from services.contact_service import (
+    load_aggregates, get_pool_stats, get_routing_stats,
+    get_query_report, get_query_metrics, reset_query_stats,
+    load_duplicate_clusters, detect_duplicates, merge_duplicate_clusters, dismiss_duplicate_clusters
+)
+
+# Clusters listed for review at a time
+REVIEW_CLUSTERS = 100
+
+def fuzzy_duplicates():
+    """Review queue of likely duplicates that differ in spelling, legal
+    suffix, nickname or LinkedIn URL form"""
+    st.subheader("🧬 Fuzzy Duplicates")
+    (clusters, contacts), members = load_duplicate_clusters(REVIEW_CLUSTERS)
+
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        st.caption(f"{clusters} clusters ({contacts} contacts) awaiting review. Merging keeps the oldest "
+                   "contact of a cluster, fills its blank fields from the others and deletes them.")
+    with col2:
+        if st.button("Scan for duplicates", key="fuzzy_scan"):
+            with st.spinner("Scanning contacts..."):
+                st.session_state['db_info_flash'] = f"Found {detect_duplicates()} duplicate clusters"
+            st.rerun()
+
+    if 'db_info_flash' in st.session_state:
+        st.success(st.session_state.pop('db_info_flash'))
+    if members.empty:
+        return
+
+    # One row per cluster, the members' names and companies side by side
+    summary = members.groupby('cluster_id', sort=True).agg(
+        names=('name', lambda values: ' · '.join(str(v) for v in values)),
+        companies=('company_name', lambda values: ' · '.join(dict.fromkeys(str(v) for v in values))),
+        size=('contact_id', 'count'),
+        score=('score', 'min'),
+        reason=('reason', 'first'),
+    ).reset_index()
+    summary.insert(0, 'selected', False)
+    edited = st.data_editor(
+        summary,
+        column_config={
+            'selected': st.column_config.CheckboxColumn("Select"),
+            'cluster_id': None,
+            'names': "Names",
+            'companies': "Companies",
+            'size': "Contacts",
+            'score': st.column_config.NumberColumn("Score", format="%.2f"),
+            'reason': "Matched on",
+        },
+        disabled=['names', 'companies', 'size', 'score', 'reason'],
+        hide_index=True,
+        use_container_width=True,
+        key=f"fuzzy_select_{summary['cluster_id'].iloc[0]}"
+    )
+    selected = edited.loc[edited['selected'], 'cluster_id'].tolist()
+    if clusters > len(summary):
+        st.caption(f"Showing the first {len(summary)} of {clusters} clusters")
+
+    message = None
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        if st.button("Merge selected", key="fuzzy_merge", disabled=not selected):
+            message = f"Merged {len(selected)} clusters, removing {merge_duplicate_clusters(selected)} contacts"
+    with col2:
+        if st.button("Dismiss selected", key="fuzzy_dismiss", disabled=not selected):
+            message = f"Dismissed {dismiss_duplicate_clusters(selected)} contacts as not duplicates"
+    with col3:
+        if st.button(f"Merge all {len(summary)} shown", key="fuzzy_merge_all"):
+            st.session_state['fuzzy_merge_all_pending'] = tuple(summary['cluster_id'])
+
+    # Merging deletes contacts, so merging every shown cluster asks first
+    pending = st.session_state.get('fuzzy_merge_all_pending')
+    if pending is not None and pending == tuple(summary['cluster_id']):
+        removing = int(summary['size'].sum()) - len(summary)
+        st.warning(f"Merge all {len(pending)} clusters shown? This deletes {removing} contacts.")
+        col1, col2, _ = st.columns([1, 1, 4])
+        if col1.button("Confirm merge", key="fuzzy_merge_all_confirm", type="primary"):
+            del st.session_state['fuzzy_merge_all_pending']
+            ids = list(pending)
+            message = f"Merged {len(ids)} clusters, removing {merge_duplicate_clusters(ids)} contacts"
+        if col2.button("Cancel", key="fuzzy_merge_all_cancel"):
+            del st.session_state['fuzzy_merge_all_pending']
+            st.rerun()
+    elif pending is not None:
+        # The shown clusters changed since the request; ask again
+        del st.session_state['fuzzy_merge_all_pending']
+    if message:
+        st.session_state['db_info_flash'] = message
+        st.rerun()
+
+    with st.expander("Cluster members"):
+        st.dataframe(members, hide_index=True, use_container_width=True)
 
 def show_db_info():
     st.title("🗂️ Database Information")
     
-    stats = load_stats()
+    stats = load_aggregates()
     
     # Database stats
     col1, col2, col3 = st.columns(3)
@@ -17,12 +110,62 @@ def show_db_info():
         st.subheader("🔍 Found Duplicates")
         st.markdown("**These contacts appear to be duplicates (same name + company):**")
         
-        for name, company, count in stats['duplicates'][:10]:
-            st.markdown(f"- **{name}** at **{company}** ({count} entries)")
+        for group in stats['duplicates'][:10]:
+            st.markdown(f"- **{group['name']}** at **{group['company']}** ({group['count']} entries)")
         
-        if len(stats['duplicates']) > 10:
-            st.markdown(f"... and {len(stats['duplicates']) - 10} more duplicate groups")
+        if stats['duplicate_groups'] > 10:
+            st.markdown(f"... and {stats['duplicate_groups'] - 10} more duplicate groups")
         
         st.info("💡 Use 'Remove Duplicates' in the sidebar to clean up your data!")
     else:
-        st.success("✅ No duplicates found!")
\ No newline at end of file
+        st.success("✅ No duplicates found!")
+
+    fuzzy_duplicates()
+
+    # Connection pool health
+    with st.expander("🔌 Connection Pool"):
+        st.json(get_pool_stats())
+
+    routing = get_routing_stats()
+    if routing['replicas']:
+        with st.expander("📖 Read Replicas"):
+            reads = routing['reads']
+            col1, col2, col3 = st.columns(3)
+            with col1: st.metric("Reads on replicas", reads['replica'])
+            with col2: st.metric("Reads on primary", reads['primary'])
+            with col3: st.metric("Fallbacks to primary", reads['fallback'])
+            st.caption(f"Replicas lagging more than {routing['max_lag_s']:g}s are skipped")
+            st.json(routing['replicas'])
+
+    # Query performance
+    with st.expander("⏱️ Query Performance"):
+        report = get_query_report()
+        st.caption(f"Since {report['since']:%Y-%m-%d %H:%M:%S} · queries over "
+                   f"{report['slow_query_ms']:g} ms are logged as slow")
+        if not report['by_total']:
+            st.info("No queries recorded yet")
+        else:
+            columns = ['caller', 'calls', 'total_ms', 'p95_ms', 'mean_ms', 'max_ms', 'rows', 'slow', 'fingerprint']
+            by_total, by_p95 = st.tabs(["Top by total time", "Top by p95"])
+            with by_total:
+                st.dataframe(pd.DataFrame(report['by_total'])[columns], hide_index=True, use_container_width=True)
+            with by_p95:
+                st.dataframe(pd.DataFrame(report['by_p95'])[columns], hide_index=True, use_container_width=True)
+
+        if report['slow']:
+            st.markdown(f"**Slow queries** (latest {len(report['slow'])})")
+            for entry in report['slow'][:10]:
+                st.markdown(f"- {entry['duration_ms']:.0f} ms, {entry['rows']} rows in `{entry['caller']}` "
+                            f"({entry['backend']}, query `{entry['query_id']}`)")
+                st.code(entry['fingerprint'], language='sql')
+                if entry.get('plan'):
+                    st.code(entry['plan'])
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("Download Prometheus metrics", get_query_metrics(),
+                               file_name="query_metrics.prom", mime="text/plain")
+        with col2:
+            if st.button("Reset query stats"):
+                reset_query_stats()
+                st.rerun()
@@ -1,33 +1,57 @@
 import streamlit as st
-from services.followup_service import load_due_followups, mark_followup_sent
+import pandas as pd
+from services.followup_service import (
+    load_due_followups, mark_followup_sent, set_followup_cadence, get_scheduler_stats, FOLLOWUP_CADENCES
+)
 from components import metric_card
 
+def _cadence_label(cadence, step):
+    steps = FOLLOWUP_CADENCES.get(cadence)
+    if steps is None:
+        return f"{cadence} (follow-up #{step + 1})"
+    return f"{cadence} (step {step + 1} of {len(steps)})"
+
 def show_followups():
     st.title("⏰ Follow-Up Reminders")
     
     due_contacts = load_due_followups()
+
+    scheduler = get_scheduler_stats()
+    if scheduler['next_due'] is not None:
+        st.caption(f"Next scheduled follow-up: {scheduler['next_due']:%Y-%m-%d %H:%M}")
     
     if len(due_contacts) == 0:
         st.success("🎉 No follow-ups due right now!")
     else:
         st.warning(f"⚠️ {len(due_contacts)} contacts need follow-up!")
         
+        cadences = list(FOLLOWUP_CADENCES)
         for i, (_, contact) in enumerate(due_contacts.iterrows()):
             metric_card(
                 title=f"{contact['name']} - {contact['company_name']}",
-                content=[
-                    f"<strong>Job Title:</strong> {contact['job_title']}",
-                    f"<strong>Last Follow-up:</strong> {contact['last_followup_date'] or 'Never'}"
+                content_lines=[
+                    f"Job Title: {contact['job_title']}",
+                    f"Due: {pd.to_datetime(contact['due_at']):%Y-%m-%d %H:%M}",
+                    f"Cadence: {_cadence_label(contact['cadence'], int(contact['followup_step']))}",
+                    f"Last Follow-up: {contact['last_followup_date'] or 'Never'}"
                 ],
                 urgent=True
             )
             
             col1, col2, col3 = st.columns([2, 1, 1])
+            with col1:
+                cadence = st.selectbox(
+                    "Cadence", cadences,
+                    index=cadences.index(contact['cadence']) if contact['cadence'] in cadences else 0,
+                    key=f"cadence_{contact['id']}", label_visibility="collapsed"
+                )
+                if cadence != contact['cadence']:
+                    set_followup_cadence([contact['id']], cadence)
+                    st.rerun()
             with col2:
                 if st.button("✅ Mark Sent", key=f"mark_{contact['id']}"):
                     mark_followup_sent(contact['id'])
-                    st.cache_data.clear()
                     st.rerun()
             with col3:
                 if contact['linkedin_url']:
-                    st.markdown(f"[🔗 LinkedIn]({contact['linkedin_url']})")
\ No newline at end of file
+                    st.markdown(f"[🔗 LinkedIn]({contact['linkedin_url']})")
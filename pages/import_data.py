@@ -1,45 +1,69 @@
 import streamlit as st
 import pandas as pd
-from services.contact_service import insert_bulk_contacts_wrapper as insert_bulk_contacts
+from services.import_service import (
+    preview_import, import_contacts_stream, MERGE_POLICIES, DEFAULT_MERGE_POLICY
+)
+
+MERGE_POLICY_LABELS = {
+    'keep_first': 'Keep existing contact',
+    'keep_newest': 'Update with new values',
+    'fill_nulls': 'Only fill empty fields',
+}
 
 def show_import_data():
     st.title("⬆️ Import Excel Data")
     
     st.markdown("""
     ### 📋 Expected Excel Columns:
-    `Name | Job Title | Linkedin URL | Company Name | Company Website | Company Linkedin | Company Social | Company Twitter | Location | Company Niche`
+    `Name | Email | Job Title | Linkedin URL | Company Name | Company Website | Company Linkedin | Company Social | Company Twitter | Location | Company Niche`
     """)
     
     uploaded_file = st.file_uploader(
-        "Choose Excel file (.xlsx or .xls)",
-        type=['xlsx', 'xls']
+        "Choose Excel or CSV file (.xlsx, .xls or .csv)",
+        type=['xlsx', 'xls', 'csv']
     )
     
     if uploaded_file is not None:
         try:
-            with st.spinner("Loading Excel file..."):
-                df = pd.read_excel(uploaded_file)
+            with st.spinner("Reading file..."):
+                preview_df = preview_import(uploaded_file, uploaded_file.name)
             
-            st.success(f"✅ File loaded! Found {len(df)} contacts")
+            st.success(f"✅ File loaded! ({uploaded_file.size / 1024 / 1024:.1f} MB)")
             
             with st.expander("📋 Preview Data (first 5 rows)"):
-                st.dataframe(df.head(), use_container_width=True)
+                st.dataframe(preview_df, use_container_width=True)
+            
+            merge_policy = st.selectbox(
+                "When a contact already exists (same name + company):",
+                MERGE_POLICIES,
+                index=MERGE_POLICIES.index(DEFAULT_MERGE_POLICY),
+                format_func=MERGE_POLICY_LABELS.get
+            )
             
             if st.button("📥 Import All Contacts", type="primary"):
                 try:
                     progress_bar = st.progress(0)
                     status_text = st.empty()
                     
-                    status_text.text("Importing contacts...")
-                    progress_bar.progress(50)
+                    def on_progress(rows_read, total):
+                        # Estimated totals can be off for sheets without a dimension record
+                        if total:
+                            progress_bar.progress(min(rows_read / total, 1.0))
+                            status_text.text(f"Importing contacts... {rows_read:,} of ~{total:,} rows")
+                        else:
+                            status_text.text(f"Importing contacts... {rows_read:,} rows")
                     
-                    count = insert_bulk_contacts(df)
+                    status_text.text("Importing contacts...")
+                    uploaded_file.seek(0)
+                    count = import_contacts_stream(
+                        uploaded_file, uploaded_file.name,
+                        on_progress=on_progress, merge_policy=merge_policy
+                    )
                     
                     progress_bar.progress(100)
                     status_text.text("Import complete!")
                     
-                    st.cache_data.clear()
-                    st.success(f"🎉 Successfully imported {count} contacts!")
+                    st.success(f"🎉 Successfully imported {count} new contacts!")
                     st.balloons()
                     
                 except Exception as e:
@@ -0,0 +1,96 @@
+import streamlit as st
+import tracking
+from services.outbox_service import (
+    load_outbox, get_sender_stats, send_now, retry_failed_outbound, cancel_queued_outbound, OUTBOUND_STATES,
+    load_engagement, get_tracking_stats
+)
+
+def engagement_section(sent):
+    st.subheader("Engagement")
+    engagement = load_engagement()
+    contacts = engagement['contacts']
+    col1, col2, col3 = st.columns(3)
+    with col1: st.metric("Opened", contacts['open'], help=f"{engagement['events']['open']} opens")
+    with col2: st.metric("Clicked", contacts['click'], help=f"{engagement['events']['click']} clicks")
+    with col3: st.metric("Replied", contacts['reply'], help=f"{engagement['events']['reply']} replies")
+    if sent:
+        st.caption(f"Contacts who opened, clicked or replied, out of {sent} emails sent · "
+                   f"{engagement['pending_rollup']} events not yet applied to contacts")
+
+    server = get_tracking_stats()
+    if not tracking.is_enabled():
+        st.info("Tracking is off. Set TRACKING_URL (the tracking server's public address) and "
+                "TRACKING_SECRET to add open pixels and tracked links to sent emails.")
+    if server is not None:
+        st.caption(f"Tracking server: {server['received']} events received, {server['written']} written, "
+                   f"{server['buffered']} buffered, {server['dropped']} dropped since start")
+        if server['last_error']:
+            st.caption(f"Last error: {server['last_error']}")
+
+def show_outbox():
+    st.title("📤 Outbox")
+
+    state = st.selectbox("Show:", ['All'] + list(OUTBOUND_STATES), key="outbox_state")
+    summary, messages = load_outbox(None if state == 'All' else state)
+    counts = summary['counts']
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1: st.metric("Queued", counts['queued'])
+    with col2: st.metric("Sending", counts['sending'])
+    with col3: st.metric("Sent (last hour)", summary['sent_last_hour'])
+    with col4: st.metric("Failed", counts['failed'])
+
+    sender = get_sender_stats()
+    if sender is None:
+        st.info("Sending is off. Set SMTP_HOST, SMTP_PORT and SMTP_FROM (plus SMTP_USER/SMTP_PASSWORD "
+                "for an authenticated relay) to start the sender; queued emails wait until then.")
+    else:
+        next_attempt = summary['next_attempt_at']
+        st.caption(f"Sending through {sender['host']} with {sender['workers']} workers · "
+                   f"{sender['sent']} sent, {sender['retried']} retried, {sender['deferred']} rate-limited "
+                   f"since start" + (f" · next attempt {next_attempt:%Y-%m-%d %H:%M:%S}" if next_attempt else ""))
+        if sender['last_error']:
+            st.caption(f"Last error: {sender['last_error']}")
+
+    message = None
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        if st.button("Send now", key="outbox_send", disabled=sender is None or not counts['queued']):
+            send_now()
+            message = "Sender woken"
+    with col2:
+        if st.button("Retry failed", key="outbox_retry", disabled=not counts['failed']):
+            message = f"Queued {retry_failed_outbound()} failed emails again"
+    with col3:
+        if st.button("Cancel queued", key="outbox_cancel", disabled=not counts['queued']):
+            message = f"Cancelled {cancel_queued_outbound()} queued emails"
+    if message:
+        st.session_state['outbox_flash'] = message
+        st.rerun()
+    if 'outbox_flash' in st.session_state:
+        st.success(st.session_state.pop('outbox_flash'))
+
+    engagement_section(counts['sent'])
+
+    st.subheader("Messages")
+    if messages.empty:
+        st.info("No emails queued yet. Queue a template's mail merge from Email Templates.")
+        return
+    st.dataframe(
+        messages,
+        column_config={
+            'id': None,
+            'contact_id': None,
+            'name': "Contact",
+            'recipient': "To",
+            'subject': "Subject",
+            'kind': "Kind",
+            'state': "State",
+            'attempts': "Attempts",
+            'next_attempt_at': "Next attempt",
+            'sent_at': "Sent",
+            'last_error': "Last error",
+        },
+        hide_index=True,
+        use_container_width=True
+    )
@@ -1,26 +1,125 @@
+from datetime import datetime
 import streamlit as st
+from components import prepare_file, prepared_file, file_download
 from services.template_service import load_templates, add_template, delete_template
+from services.contact_service import load_filter_options
+from services.merge_service import (
+    preview_merge, template_error, enqueue_merge, count_merge_recipients, MERGE_FIELDS
+)
+from services.export_service import export_merged, EXPORT_FORMATS
+from services.outbox_service import OUTBOUND_KINDS
+
+SYNTAX_HELP = (
+    "Placeholders: `{first_name}`, `{company_name}`, `{job_title|there}` (default when blank). "
+    "Sections: `{?company_name}at {company_name}{/company_name}` shows only when set, "
+    "`{!job_title}...{/job_title}` only when blank. `{{` and `}}` are literal braces."
+)
+
+def merge_panel(template):
+    """Render a template for a segment of contacts: a preview grid, a
+    streamed download of every email, or queueing them for sending"""
+    key = template['id']
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        status = st.selectbox("Status", ['All'] + load_filter_options('status'), key=f"merge_status_{key}")
+    with col2:
+        niche = st.selectbox("Niche", ['All'] + load_filter_options('company_niche'), key=f"merge_niche_{key}")
+    with col3:
+        due_before = st.date_input("Follow-up due by", value=None, key=f"merge_due_{key}")
+    search = st.text_input("Search", key=f"merge_search_{key}") or None
+
+    filters = {}
+    if status != 'All':
+        filters['status'] = status
+    if niche != 'All':
+        filters['company_niche'] = niche
+
+    st.dataframe(
+        preview_merge(template['title'], template['body'], filters, search, due_before),
+        column_config={'id': None}, hide_index=True, use_container_width=True
+    )
+
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        fmt = st.selectbox("Format", list(EXPORT_FORMATS), key=f"merge_format_{key}", format_func=str.upper)
+    merge_key = (key, tuple(sorted(filters.items())), search, due_before, fmt)
+    with col2:
+        if st.button("Render all emails", key=f"merge_prepare_{key}"):
+            progress = st.empty()
+            # Emails are written to disk as each chunk renders, and read back only on download
+            prepare_file(f'templates_merge_{key}', merge_key, lambda out: export_merged(
+                out, template['title'], template['body'], fmt, filters, search, due_before,
+                on_progress=lambda rows: progress.caption(f"Rendered {rows} emails...")
+            ))
+            progress.empty()
+
+    prepared = prepared_file(f'templates_merge_{key}', merge_key)
+    if prepared:
+        path, count = prepared
+        file_download(
+            f"Download {count} emails ({fmt.upper()})",
+            path,
+            file_name=f"mail_merge_{key}_{datetime.now():%Y%m%d_%H%M}.{fmt}",
+            mime=EXPORT_FORMATS[fmt],
+            key=f"merge_download_{key}"
+        )
+
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        kind = st.selectbox("Send as", OUTBOUND_KINDS, key=f"merge_kind_{key}",
+                            help="A sent first email marks the contact Applied; a follow-up moves its cadence along")
+    with col2:
+        if st.button("📤 Queue for sending", key=f"merge_queue_{key}"):
+            st.session_state['templates_queue'] = (key, tuple(sorted(filters.items())), search, due_before, kind)
+
+    # Queueing sends real email, so it waits for a confirmation of the count
+    queue_key = (key, tuple(sorted(filters.items())), search, due_before, kind)
+    if st.session_state.get('templates_queue') == queue_key:
+        counts = count_merge_recipients(template, kind, filters, search, due_before)
+        notes = []
+        if counts['already_queued']:
+            notes.append(f"{counts['already_queued']} that already have this {kind} email")
+        if counts['without_email']:
+            notes.append(f"{counts['without_email']} without an email address")
+        st.warning(f"Queue {counts['to_queue']} emails to send?" + (f" Skipping {', '.join(notes)}." if notes else ""))
+        col1, col2, _ = st.columns([1, 1, 4])
+        if col1.button("Confirm", key=f"merge_queue_confirm_{key}", type="primary", disabled=not counts['to_queue']):
+            del st.session_state['templates_queue']
+            queued, _, _ = enqueue_merge(template, kind, filters, search, due_before)
+            st.success(f"Queued {queued} emails")
+        if col2.button("Cancel", key=f"merge_queue_cancel_{key}"):
+            del st.session_state['templates_queue']
+            st.rerun()
 
 def show_templates():
     st.title("📝 Email Templates")
-    
+
     with st.expander("➕ Add New Template"):
+        st.caption(SYNTAX_HELP)
+        st.caption("Fields: " + ", ".join(f"`{field}`" for field in MERGE_FIELDS))
         title = st.text_input("Title:")
         body = st.text_area("Body:", height=150)
-        
+
         if st.button("💾 Save"):
             if title and body:
-                add_template(title, body)
-                st.cache_data.clear()
-                st.success("Saved!")
-                st.rerun()
-    
+                error = template_error(title, body)
+                if error:
+                    st.error(f"Template not saved: {error}")
+                else:
+                    add_template(title, body)
+                    st.success("Saved!")
+                    st.rerun()
+
     templates_df = load_templates()
-    
+
     for _, template in templates_df.iterrows():
         with st.expander(f"📄 {template['title']}"):
             st.code(template['body'])
+            error = template_error(template['title'], template['body'])
+            if error:
+                st.warning(f"Cannot mail-merge this template: {error}")
+            elif st.toggle("✉️ Mail merge", key=f"merge_{template['id']}"):
+                merge_panel(template)
             if st.button("🗑️ Delete", key=f"del_{template['id']}"):
                 delete_template(template['id'])
-                st.cache_data.clear()
-                st.rerun()
\ No newline at end of file
+                st.rerun()
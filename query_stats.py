@@ -0,0 +1,275 @@
+import os
+import re
+import time
+import random
+import hashlib
+import logging
+import threading
+import functools
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Instrumentation settings (overridable through the environment)
+QUERY_STATS_ENABLED = os.environ.get('DB_QUERY_STATS', '1') != '0'
+SLOW_QUERY_MS = float(os.environ.get('DB_SLOW_QUERY_MS', 200))
+# Share of slow SELECTs whose plan is captured, at most once per query per
+# EXPLAIN_INTERVAL seconds
+EXPLAIN_SAMPLE_RATE = float(os.environ.get('DB_EXPLAIN_SAMPLE_RATE', 0.1))
+EXPLAIN_INTERVAL = float(os.environ.get('DB_EXPLAIN_INTERVAL', 300))
+# Interface the /metrics endpoint listens on; the stats include query text,
+# so only this machine can scrape it unless set to e.g. 0.0.0.0
+QUERY_METRICS_HOST = os.environ.get('QUERY_METRICS_HOST', '127.0.0.1')
+
+# Prometheus-style histogram buckets, in seconds
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Recent durations kept per query for percentiles
+RECENT_SAMPLES = 500
+# Distinct (query, caller, backend) series kept; later ones are only counted
+MAX_SERIES = 500
+SLOW_LOG_SIZE = 100
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+@functools.lru_cache(maxsize=2048)
+def fingerprint(query):
+    """Normalized SQL: literals and placeholders become ?, IN lists collapse.
+
+    Both backends' placeholders map to ?, so a query fingerprints the same
+    on SQLite and Postgres, however many ids a batch carries.
+    """
+    text = _WHITESPACE.sub(' ', query).strip()
+    text = _STRING_LITERAL.sub('?', text.replace('%s', '?'))
+    text = _NUMBER_LITERAL.sub('?', text)
+    return _PLACEHOLDER_LIST.sub('(...)', text)
+
+
+def query_id(fingerprint_text):
+    """Short stable id for a fingerprint, used as the metrics label"""
+    return hashlib.sha1(fingerprint_text.encode()).hexdigest()[:10]
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+class _QuerySeries:
+    """Histogram of one query fingerprint issued from one caller"""
+
+    def __init__(self, fingerprint_text, caller, backend):
+        self.fingerprint = fingerprint_text
+        self.query_id = query_id(fingerprint_text)
+        self.caller = caller
+        self.backend = backend
+        self.count = 0
+        self.errors = 0
+        self.slow = 0
+        self.rows = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+        self.plan = None
+        self.plan_at = None
+
+    def observe(self, duration, rows, failed, slow):
+        self.count += 1
+        self.errors += failed
+        self.slow += slow
+        self.rows += max(rows, 0)
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.recent.append(duration)
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if duration <= bound:
+                self.buckets[i] += 1
+                break
+
+    def summary(self):
+        return {
+            'query_id': self.query_id,
+            'fingerprint': self.fingerprint,
+            'caller': self.caller,
+            'backend': self.backend,
+            'calls': self.count,
+            'total_ms': self.total * 1000,
+            'mean_ms': self.total * 1000 / self.count if self.count else 0.0,
+            'p95_ms': (_percentile(self.recent, 0.95) or 0.0) * 1000,
+            'max_ms': self.max * 1000,
+            'rows': self.rows,
+            'slow': self.slow,
+            'errors': self.errors,
+            'plan': self.plan,
+        }
+
+
+class QueryStats:
+    """In-process store of per-query timings, the slow-query log and plans"""
+
+    def __init__(self, slow_query_ms=SLOW_QUERY_MS, explain_sample_rate=EXPLAIN_SAMPLE_RATE):
+        self.slow_query_ms = slow_query_ms
+        self.explain_sample_rate = explain_sample_rate
+        self._lock = threading.Lock()
+        self._series = {}  # (fingerprint, caller, backend) -> _QuerySeries
+        self._slow_log = deque(maxlen=SLOW_LOG_SIZE)
+        self.dropped = 0
+        self.started_at = time.time()
+
+    def record(self, query, caller, backend, duration, rows=-1, failed=False):
+        """Record one execution; returns the series when it was slow, else None"""
+        fingerprint_text = fingerprint(query)
+        slow = duration * 1000 >= self.slow_query_ms
+        key = (fingerprint_text, caller, backend)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                if len(self._series) >= MAX_SERIES:
+                    self.dropped += 1
+                    return None
+                series = self._series[key] = _QuerySeries(fingerprint_text, caller, backend)
+            series.observe(duration, rows, failed, slow)
+            if slow:
+                self._slow_log.append({
+                    'at': time.time(),
+                    'duration_ms': duration * 1000,
+                    'rows': rows,
+                    'caller': caller,
+                    'backend': backend,
+                    'query_id': series.query_id,
+                    'fingerprint': fingerprint_text,
+                })
+        if slow:
+            logger.warning(f"Slow query ({duration * 1000:.0f} ms, {rows} rows) in {caller}: {fingerprint_text[:300]}")
+            return series
+        return None
+
+    def wants_plan(self, series):
+        """Whether to capture an EXPLAIN for this slow query now"""
+        if not series.fingerprint.upper().startswith(('SELECT', 'WITH')):
+            return False
+        with self._lock:
+            if series.plan_at is not None and time.monotonic() - series.plan_at < EXPLAIN_INTERVAL:
+                return False
+            if random.random() >= self.explain_sample_rate:
+                return False
+            series.plan_at = time.monotonic()
+            return True
+
+    def add_plan(self, series, plan):
+        with self._lock:
+            series.plan = plan
+            for entry in reversed(self._slow_log):
+                if entry['query_id'] == series.query_id:
+                    entry['plan'] = plan
+                    break
+
+    def top(self, limit=20, by='total_ms'):
+        with self._lock:
+            summaries = [series.summary() for series in self._series.values()]
+        return sorted(summaries, key=lambda s: s[by], reverse=True)[:limit]
+
+    def slow_queries(self):
+        with self._lock:
+            return list(reversed(self._slow_log))
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+            self._slow_log.clear()
+            self.dropped = 0
+            self.started_at = time.time()
+
+    def prometheus_text(self):
+        """Prometheus text exposition (format 0.0.4) of every series"""
+        with self._lock:
+            series_list = list(self._series.values())
+            snapshot = [(s, list(s.buckets), s.count, s.total, s.rows, s.slow, s.errors) for s in series_list]
+            dropped = self.dropped
+
+        lines = [
+            '# HELP db_query_duration_seconds Database query duration, including fetching rows.',
+            '# TYPE db_query_duration_seconds histogram',
+        ]
+        for series, buckets, count, total, _, _, _ in snapshot:
+            labels = _labels(series)
+            cumulative = 0
+            for bound, hits in zip(DURATION_BUCKETS, buckets):
+                cumulative += hits
+                lines.append(f'db_query_duration_seconds_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+            lines.append(f'db_query_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'db_query_duration_seconds_sum{{{labels}}} {total:.6f}')
+            lines.append(f'db_query_duration_seconds_count{{{labels}}} {count}')
+
+        for name, help_text, index in (
+            ('db_query_rows_total', 'Rows returned or affected by database queries.', 4),
+            ('db_slow_queries_total', f'Queries slower than {self.slow_query_ms:g} ms.', 5),
+            ('db_query_errors_total', 'Database queries that raised an error.', 6),
+        ):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for entry in snapshot:
+                lines.append(f'{name}{{{_labels(entry[0])}}} {entry[index]}')
+
+        lines.append('# HELP db_query_info Normalized SQL of each query id.')
+        lines.append('# TYPE db_query_info gauge')
+        for query in sorted({s.query_id: s.fingerprint for s in series_list}.items()):
+            lines.append(f'db_query_info{{query="{query[0]}",fingerprint="{_escape(query[1][:500])}"}} 1')
+
+        lines.append('# HELP db_query_series_dropped_total Executions not recorded because the series limit was reached.')
+        lines.append('# TYPE db_query_series_dropped_total counter')
+        lines.append(f'db_query_series_dropped_total {dropped}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(series):
+    return f'query="{series.query_id}",caller="{_escape(series.caller)}",backend="{series.backend}"'
+
+
+_query_stats = QueryStats()
+
+
+def get_query_stats():
+    return _query_stats
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = _query_stats.prometheus_text().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_metrics_server = None
+_metrics_server_lock = threading.Lock()
+
+
+def start_metrics_server(port, host=QUERY_METRICS_HOST):
+    """Serve /metrics for Prometheus on port (once per process)"""
+    global _metrics_server
+    with _metrics_server_lock:
+        if _metrics_server is None:
+            _metrics_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_metrics_server.serve_forever, name='query-metrics', daemon=True).start()
+            logger.info(f"Query metrics served on http://{host}:{port}/metrics")
+    return _metrics_server
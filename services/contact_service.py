@@ -3,36 +3,58 @@ import pandas as pd
 from database import (
     get_all_contacts, 
     update_contact_status,
+    update_contacts_status,
+    apply_contact_edits,
     delete_contact,
+    delete_contacts,
+    get_contact_ids,
     insert_bulk_contacts,  # Add this import
     remove_duplicate_contacts,
     delete_all_contacts,
-    get_contact_stats
+    get_contact_stats,
+    get_pool_stats,
+    get_routing_stats,
+    get_query_report,
+    get_query_metrics,
+    reset_query_stats,
+    query_contacts,
+    get_distinct_values,
+    get_contact_aggregates,
+    query_companies,
+    detect_duplicates,
+    count_duplicate_clusters,
+    get_duplicate_clusters,
+    merge_duplicate_clusters,
+    dismiss_duplicate_clusters,
+    company_color,
+    get_data_version,
+    bump_data_version
 )
+from services.profiling import profiled, cached
 
-@st.cache_data(ttl=30)
-def load_contacts():
-    df = get_all_contacts()
-    
-    # Ensure all required columns exist
-    required_columns = [
-        'id', 'name', 'job_title', 'linkedin_url', 'company_name',
-        'company_website', 'company_linkedin', 'company_social', 
-        'company_twitter', 'status'
-    ]
-    
-    for col in required_columns:
-        if col not in df.columns:
-            df[col] = None
-    
-    # Set default status
-    if 'status' not in df.columns or df['status'].isnull().all():
-        df['status'] = 'Not Applied'
-    
-    return df
+# Cached loaders take the data version of the tables they read as an extra
+# argument: a write bumps the version, so only dependent caches miss. Streamlit
+# computes each cache key under a lock, so a burst of sessions missing the same
+# new version triggers a single reload. Other processes' writes arrive through
+# the shared data versions within DATA_VERSION_POLL_SECONDS; the TTL only
+# bounds how long an unused entry is kept.
+CACHE_TTL = 600
+
+@profiled
+def load_contacts(columns=None):
+    """Typed contacts frame; pass columns to cache only the fields a page renders"""
+    return _load_contacts(tuple(columns) if columns else None, get_data_version('contacts'))
 
-@st.cache_data(ttl=30)
+@cached(ttl=CACHE_TTL, max_entries=4)
+def _load_contacts(columns, version):
+    return get_all_contacts(columns)
+
+@profiled
 def load_stats():
+    return _load_stats(get_data_version('contacts', 'templates'))
+
+@cached(ttl=CACHE_TTL, max_entries=4)
+def _load_stats(version):
     stats = get_contact_stats()
     
     # Ensure stats is serializable
@@ -42,6 +64,48 @@ def load_stats():
     
     return stats
 
+@profiled
+def load_contact_page(filters=None, search=None, sort='newest', after_cursor=None, limit=20):
+    return _load_contact_page(filters, search, sort, after_cursor, limit, get_data_version('contacts'))
+
+@cached(ttl=CACHE_TTL, max_entries=256)
+def _load_contact_page(filters, search, sort, after_cursor, limit, version):
+    return query_contacts(filters, search, sort, after_cursor, limit)
+
+@profiled
+def load_filter_options(column):
+    return _load_filter_options(column, get_data_version('contacts'))
+
+@cached(ttl=CACHE_TTL, max_entries=16)
+def _load_filter_options(column, version):
+    return get_distinct_values(column)
+
+@profiled
+def load_aggregates(top_n=10):
+    return _load_aggregates(top_n, get_data_version('contacts', 'templates'))
+
+@cached(ttl=CACHE_TTL, max_entries=8)
+def _load_aggregates(top_n, version):
+    return get_contact_aggregates(top_n)
+
+@profiled
+def load_companies(search=None, sort='contacts', offset=0, limit=30):
+    # The companies table is maintained by contact writes
+    return _load_companies(search, sort, offset, limit, get_data_version('contacts'))
+
+@cached(ttl=CACHE_TTL, max_entries=64)
+def _load_companies(search, sort, offset, limit, version):
+    return query_companies(search, sort, offset, limit)
+
+@profiled
+def load_duplicate_clusters(limit=100):
+    """Pending fuzzy duplicate clusters: ((clusters, contacts) counts, member frame)"""
+    return _load_duplicate_clusters(limit, get_data_version('contacts', 'duplicate_review'))
+
+@cached(ttl=CACHE_TTL, max_entries=4)
+def _load_duplicate_clusters(limit, version):
+    return count_duplicate_clusters(), get_duplicate_clusters(limit)
+
 # Add these functions to make them available through the service
 def insert_bulk_contacts_wrapper(df):
     return insert_bulk_contacts(df)
@@ -53,4 +117,8 @@ def delete_all_contacts_wrapper():
     return delete_all_contacts()
 
 def remove_duplicates_wrapper():
-    return remove_duplicate_contacts()
\ No newline at end of file
+    return remove_duplicate_contacts()
+
+def refresh_data():
+    """Force every data cache to reload, e.g. after writes from another process"""
+    bump_data_version('contacts', 'templates', 'followup_schedule', 'duplicate_review')
\ No newline at end of file
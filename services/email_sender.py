@@ -0,0 +1,447 @@
+import os
+import ssl
+import math
+import time
+import random
+import asyncio
+import logging
+import smtplib
+import threading
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import make_msgid, formatdate
+import tracking
+from database import (
+    claim_outbound, complete_outbound, fail_outbound, defer_outbound, release_stale_outbound,
+    get_outbound_summary, add_data_version_listener
+)
+
+logger = logging.getLogger(__name__)
+
+# SMTP relay. To try sending against a local debugging server:
+#   python -m aiosmtpd -n -l localhost:1025
+#   SMTP_HOST=localhost SMTP_PORT=1025 SMTP_SECURITY=none
+SMTP_HOST = os.environ.get('SMTP_HOST', '')
+SMTP_PORT = int(os.environ.get('SMTP_PORT', 587))
+SMTP_USER = os.environ.get('SMTP_USER', '')
+SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD', '')
+# 'starttls', 'ssl' (implicit TLS, usually port 465) or 'none'
+SMTP_SECURITY = os.environ.get('SMTP_SECURITY', 'starttls')
+SMTP_FROM = os.environ.get('SMTP_FROM', SMTP_USER)
+SMTP_TIMEOUT = float(os.environ.get('SMTP_TIMEOUT', 30))
+
+# Messages in flight at once, each on its own pooled SMTP session
+SEND_WORKERS = int(os.environ.get('SEND_WORKERS', 4))
+# Token buckets: sustained messages per hour, overall and per recipient
+# domain, with bursts of up to SEND_BURST messages
+SEND_RATE_PER_HOUR = float(os.environ.get('SEND_RATE_PER_HOUR', 3600))
+SEND_DOMAIN_RATE_PER_HOUR = float(os.environ.get('SEND_DOMAIN_RATE_PER_HOUR', 120))
+SEND_BURST = int(os.environ.get('SEND_BURST', 10))
+# Attempts before a message is marked failed; retries back off exponentially
+SEND_MAX_ATTEMPTS = int(os.environ.get('SEND_MAX_ATTEMPTS', 5))
+SEND_RETRY_SECONDS = float(os.environ.get('SEND_RETRY_SECONDS', 60))
+SEND_RETRY_MAX_SECONDS = 6 * 3600
+
+# Sessions are closed after this many messages (servers cap them) or when
+# idle this long (servers drop idle sessions)
+MESSAGES_PER_SESSION = 100
+SESSION_IDLE_SECONDS = 60
+# Messages claimed by a sender that stopped before recording them are
+# queued again after this long
+STALE_CLAIM_SECONDS = 900
+# Upper bound on a single sleep, so messages queued by other processes (which
+# do not notify this one) are picked up in bounded time
+MAX_SLEEP_SECONDS = 30
+# Idle domain buckets are dropped once there are this many
+MAX_DOMAIN_BUCKETS = 10000
+
+
+class TokenBucket:
+    """rate tokens per second, holding at most capacity"""
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self):
+        """Take a token if there is one: returns 0, or the seconds until one
+        will be available"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def available(self):
+        """Whole tokens that can be taken now"""
+        self._refill()
+        return int(self.tokens)
+
+    def wait(self):
+        """Seconds until a token is available (0 when there is one)"""
+        self._refill()
+        return max(1 - self.tokens, 0) / self.rate
+
+    def full(self):
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+class SMTPPool:
+    """Reusable authenticated sessions to the relay, at most size at once.
+
+    send() blocks, so it is run on worker threads.
+    """
+
+    def __init__(self, size=SEND_WORKERS, host=SMTP_HOST, port=SMTP_PORT, user=SMTP_USER,
+                 password=SMTP_PASSWORD, security=SMTP_SECURITY, timeout=SMTP_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.security = security
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle = []  # (session, messages sent on it, last used)
+        self.connects = 0
+
+    def _connect(self):
+        if self.security == 'ssl':
+            session = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout,
+                                       context=ssl.create_default_context())
+        else:
+            session = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.security == 'starttls':
+                session.starttls(context=ssl.create_default_context())
+        if self.user:
+            session.login(self.user, self.password)
+        self.connects += 1
+        return session
+
+    def _checkout(self):
+        with self._lock:
+            while self._idle:
+                session, sent, used = self._idle.pop()
+                if time.monotonic() - used < SESSION_IDLE_SECONDS:
+                    return session, sent, True
+                _quit(session)
+        return self._connect(), 0, False
+
+    def _checkin(self, session, sent):
+        if sent >= MESSAGES_PER_SESSION:
+            _quit(session)
+            return
+        with self._lock:
+            self._idle.append((session, sent, time.monotonic()))
+
+    def _send_on(self, session, sent, message):
+        try:
+            session.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            _quit(session)
+            raise
+        except smtplib.SMTPException:
+            # Refused recipients or data leave the session usable
+            self._checkin(session, sent + 1)
+            raise
+        except OSError:
+            _quit(session)
+            raise
+        self._checkin(session, sent + 1)
+
+    def send(self, message):
+        """Send an EmailMessage on a pooled session"""
+        with self._slots:
+            session, sent, reused = self._checkout()
+            try:
+                self._send_on(session, sent, message)
+            except smtplib.SMTPServerDisconnected:
+                if not reused:
+                    raise
+                # The server dropped the idle session; one retry on a new one
+                self._send_on(self._connect(), 0, message)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for session, _, _ in idle:
+            _quit(session)
+
+
+def _quit(session):
+    try:
+        session.quit()
+    except (smtplib.SMTPException, OSError):
+        session.close()
+
+
+def is_permanent(error):
+    """Whether retrying cannot help: the server rejected the message itself"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        # A configuration problem, not this message's
+        return False
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return False
+
+
+def retry_delay(attempts):
+    """Seconds before the next attempt after attempts failures, with jitter"""
+    delay = min(SEND_RETRY_SECONDS * 2 ** (attempts - 1), SEND_RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def build_message(message, sender, msgid_domain):
+    email = EmailMessage()
+    email['From'] = sender
+    email['To'] = message['recipient']
+    email['Subject'] = message['subject']
+    email['Date'] = formatdate(localtime=True)
+    email.set_content(message['body'])
+    if tracking.is_enabled():
+        contact_id = message['contact_id'] or 0
+        # Replies quote the Message-ID in In-Reply-To, which carries the
+        # token back to the tracking server's reply endpoint
+        email['Message-ID'] = make_msgid(tracking.make_token(message['id'], contact_id), domain=msgid_domain)
+        email.add_alternative(tracking.tracked_html(message['body'], message['id'], contact_id), subtype='html')
+    else:
+        email['Message-ID'] = make_msgid(domain=msgid_domain)
+    return email
+
+
+class OutboundSender:
+    """Background worker that drains the outbound queue.
+
+    An asyncio loop on its own thread claims the due messages in batches,
+    never more than the global bucket has tokens for, so claims are not held
+    while waiting on the rate limit. Each message also takes a token from
+    its domain's bucket (messages whose domain is out of tokens go back in
+    the queue until it has one). Up to `workers` sends then run at once on
+    pooled SMTP sessions, each outcome recorded as soon as it is known:
+    contacts move to 'Applied' or along their follow-up cadence, failures
+    are retried with exponential backoff.
+    """
+
+    def __init__(self, pool=None, workers=SEND_WORKERS, rate_per_hour=SEND_RATE_PER_HOUR,
+                 domain_rate_per_hour=SEND_DOMAIN_RATE_PER_HOUR, burst=SEND_BURST,
+                 sender=SMTP_FROM, max_sleep=MAX_SLEEP_SECONDS):
+        self.pool = pool or SMTPPool(workers)
+        self.workers = workers
+        self.batch_size = workers * 4
+        self.domain_rate = domain_rate_per_hour / 3600
+        self.burst = burst
+        self.sender = sender
+        self.msgid_domain = sender.rsplit('@', 1)[-1] if '@' in sender else 'localhost'
+        self.max_sleep = max_sleep
+        self._global_bucket = TokenBucket(rate_per_hour / 3600, burst)
+        self._domain_buckets = {}
+        self._running = False
+        self._thread = None
+        self._loop = None
+        self._wake = None
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.deferred = 0
+        self.last_error = None
+        self.last_run = None
+        add_data_version_listener(self._on_data_change)
+
+    def _on_data_change(self, tables):
+        # The sender's own claims and results bump the queue's version too
+        if 'outbound_queue' in tables and threading.current_thread() is not self._thread:
+            self.wake()
+
+    def wake(self):
+        """Check the queue now instead of at the next scheduled time"""
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._run()), name='outbound-sender', daemon=True)
+        self._thread.start()
+        logger.info(f"Outbound sender started ({SMTP_HOST}:{SMTP_PORT}, {self.workers} workers)")
+
+    def stop(self, timeout=10):
+        self._running = False
+        self.wake()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _domain_bucket(self, domain):
+        bucket = self._domain_buckets.get(domain)
+        if bucket is None:
+            if len(self._domain_buckets) >= MAX_DOMAIN_BUCKETS:
+                self._domain_buckets = {d: b for d, b in self._domain_buckets.items() if not b.full()}
+            bucket = self._domain_buckets[domain] = TokenBucket(self.domain_rate, self.burst)
+        return bucket
+
+    async def _send(self, message, slots):
+        try:
+            email = build_message(message, self.sender, self.msgid_domain)
+            await asyncio.to_thread(self.pool.send, email)
+            result = message, email['Message-ID'], None
+        except Exception as e:
+            result = message, None, e
+        finally:
+            slots.release()
+        self._record([result], {})
+
+    def _record(self, results, deferred):
+        now = datetime.now()
+        sent, failures = [], []
+        for message, message_id, error in results:
+            if error is None:
+                sent.append((message['id'], message_id))
+                continue
+            attempts = message['attempts'] + 1
+            retry_at = None
+            if attempts < SEND_MAX_ATTEMPTS and not is_permanent(error):
+                retry_at = now + timedelta(seconds=retry_delay(attempts))
+            failures.append((message['id'], f"{type(error).__name__}: {error}"[:500], retry_at))
+            self.last_error = failures[-1][1]
+        if sent:
+            complete_outbound(sent)
+        if failures:
+            fail_outbound(failures)
+            logger.warning(f"{len(failures)} of {len(results)} messages failed; last: {self.last_error}")
+        # Rate-limited messages wait for their domain's next token
+        for seconds, ids in deferred.items():
+            defer_outbound(ids, now + timedelta(seconds=seconds))
+        self.sent += len(sent)
+        self.retried += sum(1 for _, _, retry_at in failures if retry_at)
+        self.failed += sum(1 for _, _, retry_at in failures if not retry_at)
+        self.deferred += sum(len(ids) for ids in deferred.values())
+
+    async def run_once(self):
+        """Send one batch of due messages; returns how many were claimed
+        (none while the global bucket is out of tokens)"""
+        self.last_run = datetime.now()
+        limit = min(self.batch_size, self._global_bucket.available())
+        if not limit:
+            return 0
+        messages = claim_outbound(limit)
+        if not messages:
+            return 0
+        slots = asyncio.Semaphore(self.workers)
+        sends, deferred = [], {}
+        for message in messages:
+            domain_bucket = self._domain_bucket(message['domain'])
+            # Check both buckets before taking from either, so a deferral
+            # does not spend a token it never uses
+            wait = max(domain_bucket.wait(), self._global_bucket.wait())
+            if wait:
+                deferred.setdefault(math.ceil(wait), []).append(message['id'])
+                continue
+            domain_bucket.take()
+            self._global_bucket.take()
+            await slots.acquire()
+            sends.append(asyncio.create_task(self._send(message, slots)))
+        if deferred:
+            self._record([], deferred)
+        await asyncio.gather(*sends)
+        return len(messages)
+
+    def _due_now(self):
+        next_attempt = get_outbound_summary()['next_attempt_at']
+        return next_attempt is not None and next_attempt <= datetime.now()
+
+    def _seconds_until_next(self):
+        next_attempt = get_outbound_summary()['next_attempt_at']
+        if next_attempt is None:
+            return self.max_sleep
+        return min(max((next_attempt - datetime.now()).total_seconds(), 0.1), self.max_sleep)
+
+    async def _run(self):
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        released = release_stale_outbound(datetime.now() - timedelta(seconds=STALE_CLAIM_SECONDS))
+        if released:
+            logger.info(f"Requeued {released} messages left in flight")
+        try:
+            while self._running:
+                try:
+                    if await self.run_once():
+                        continue
+                    # Out of tokens, or nothing due yet
+                    wait = max(self._seconds_until_next(), self._global_bucket.wait())
+                except Exception as e:
+                    logger.error(f"Outbound sender error: {e}")
+                    self.last_error = str(e)
+                    wait = self.max_sleep
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.pool.close()
+
+    async def _drain(self):
+        while True:
+            if await self.run_once():
+                continue
+            wait = self._global_bucket.wait()
+            if not wait or not self._due_now():
+                return
+            # Nothing is claimed while waiting for the next token
+            await asyncio.sleep(wait)
+
+    def drain(self):
+        """Send everything due now on the calling thread; returns the number sent"""
+        sent_before = self.sent
+        release_stale_outbound(datetime.now() - timedelta(seconds=STALE_CLAIM_SECONDS))
+        try:
+            asyncio.run(self._drain())
+        finally:
+            self.pool.close()
+        return self.sent - sent_before
+
+    def stats(self):
+        return {
+            'running': self._running,
+            'host': f"{self.pool.host}:{self.pool.port}",
+            'workers': self.workers,
+            'sent': self.sent,
+            'retried': self.retried,
+            'failed': self.failed,
+            'deferred': self.deferred,
+            'connections_opened': self.pool.connects,
+            'last_run': self.last_run,
+            'last_error': self.last_error,
+        }
+
+
+def is_configured():
+    return bool(SMTP_HOST and SMTP_FROM)
+
+
+_sender = None
+_sender_lock = threading.Lock()
+
+
+def get_sender():
+    """The process-wide sender, started on first use; None until SMTP_HOST
+    and SMTP_FROM are set"""
+    global _sender
+    if not is_configured():
+        return None
+    with _sender_lock:
+        if _sender is None:
+            _sender = OutboundSender()
+            _sender.start()
+    return _sender
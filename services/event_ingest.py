@@ -0,0 +1,185 @@
+import os
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from database import insert_events, rollup_events, EVENT_KINDS, EVENT_ROLLUP_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+# The buffer is flushed every EVENT_FLUSH_SECONDS, or as soon as it holds
+# EVENT_FLUSH_SIZE events, in transactions of at most EVENT_INSERT_BATCH
+# rows so other writers wait on SQLite's write lock for milliseconds at most
+EVENT_FLUSH_SECONDS = float(os.environ.get('EVENT_FLUSH_SECONDS', 1))
+EVENT_FLUSH_SIZE = 5000
+EVENT_INSERT_BATCH = 5000
+# Events held in memory at most; past it the oldest are dropped (and
+# counted) rather than making the tracking server wait on the database
+EVENT_BUFFER_LIMIT = int(os.environ.get('EVENT_BUFFER_LIMIT', 200000))
+# How often new events are folded into the contacts' engagement columns
+EVENT_ROLLUP_SECONDS = float(os.environ.get('EVENT_ROLLUP_SECONDS', 30))
+# Back-off after a failed flush; the events stay buffered
+RETRY_SECONDS = 5
+
+
+class EventBuffer:
+    """In-memory write-behind buffer for engagement events.
+
+    add() only appends to a deque, so request threads never touch the
+    database. A flusher thread drains the deque in batched inserts and
+    periodically runs the rollup; if the database is unavailable the events
+    wait in memory, up to `limit`.
+    """
+
+    def __init__(self, flush_seconds=EVENT_FLUSH_SECONDS, flush_size=EVENT_FLUSH_SIZE,
+                 insert_batch=EVENT_INSERT_BATCH, limit=EVENT_BUFFER_LIMIT, rollup_seconds=EVENT_ROLLUP_SECONDS):
+        self.flush_seconds = flush_seconds
+        self.flush_size = flush_size
+        self.insert_batch = insert_batch
+        self.rollup_seconds = rollup_seconds
+        self._events = deque(maxlen=limit)
+        self._wakeup = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._running = False
+        self._thread = None
+        self._last_rollup = 0.0
+        self._rolled_up_to = 0
+        self.received = 0
+        self.written = 0
+        self.dropped = 0
+        self.rolled_up = 0
+        self.flushes = 0
+        self.last_flush = None
+        self.last_error = None
+
+    def add(self, kind, message_id=None, contact_id=None, url=None, occurred_at=None):
+        if kind not in EVENT_KINDS:
+            raise ValueError(f"Unknown event kind {kind!r}")
+        event = (message_id, contact_id, kind, url, occurred_at or datetime.now())
+        with self._wakeup:
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+            self._events.append(event)
+            self.received += 1
+            if len(self._events) >= self.flush_size:
+                self._wakeup.notify()
+
+    def pending(self):
+        return len(self._events)
+
+    def _take(self):
+        with self._wakeup:
+            return [self._events.popleft() for _ in range(min(self.insert_batch, len(self._events)))]
+
+    def _restore(self, batch):
+        # Back in front, in order; when new events filled the room meanwhile,
+        # the oldest of the batch are the ones dropped
+        with self._wakeup:
+            room = self._events.maxlen - len(self._events)
+            keep = batch[max(len(batch) - room, 0):]
+            self._events.extendleft(reversed(keep))
+            self.dropped += len(batch) - len(keep)
+
+    def flush(self):
+        """Write what is buffered now, batch by batch; returns the number of
+        events written"""
+        written = 0
+        with self._flush_lock:
+            # Events arriving meanwhile wait for the next flush, so a
+            # sustained burst cannot starve the rollup
+            remaining = len(self._events)
+            while remaining > 0 and self._events:
+                batch = self._take()
+                try:
+                    insert_events(batch)
+                except Exception:
+                    self._restore(batch)
+                    raise
+                # Counted per batch, so a later batch failing leaves the
+                # rollup aware of what did get written
+                written += len(batch)
+                self.written += len(batch)
+                remaining -= len(batch)
+            self.flushes += 1
+            self.last_flush = datetime.now()
+        return written
+
+    def rollup(self):
+        """Apply every written event to the contacts; returns the number applied"""
+        applied = 0
+        while True:
+            count = rollup_events()
+            applied += count
+            if count < EVENT_ROLLUP_BATCH_SIZE:
+                break
+        self.rolled_up += applied
+        self._rolled_up_to = self.written
+        self._last_rollup = time.monotonic()
+        return applied
+
+    def start(self):
+        with self._wakeup:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name='event-flusher', daemon=True)
+        self._thread.start()
+        logger.info("Event buffer started")
+
+    def stop(self, timeout=10):
+        """Stop the flusher, writing out what is still buffered"""
+        with self._wakeup:
+            self._running = False
+            self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._wakeup:
+                if self._running and len(self._events) < self.flush_size:
+                    self._wakeup.wait(self.flush_seconds)
+                running = self._running
+            try:
+                self.flush()
+                # Each rollup refreshes every cached contact view, so it
+                # only runs once this buffer has written something new
+                due = not running or time.monotonic() - self._last_rollup >= self.rollup_seconds
+                if due and self.written > self._rolled_up_to:
+                    self.rollup()
+            except Exception as e:
+                logger.error(f"Event flush failed, {self.pending()} events buffered: {e}")
+                self.last_error = str(e)
+                if not running:
+                    return
+                time.sleep(RETRY_SECONDS)
+            if not running:
+                return
+
+    def stats(self):
+        return {
+            'running': self._running,
+            'received': self.received,
+            'written': self.written,
+            'buffered': self.pending(),
+            'dropped': self.dropped,
+            'rolled_up': self.rolled_up,
+            'flushes': self.flushes,
+            'last_flush': self.last_flush,
+            'last_error': self.last_error,
+        }
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_event_buffer():
+    """The process-wide event buffer, its flusher started on first use"""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = EventBuffer()
+            _buffer.start()
+    return _buffer
@@ -0,0 +1,117 @@
+import io
+import csv
+from datetime import datetime
+import pandas as pd
+from openpyxl import Workbook
+from database import iter_contacts, CONTACT_COLUMNS, DATE_COLUMNS, EXPORT_CHUNK_SIZE
+from services.merge_service import iter_merged, due_moment, MERGE_COLUMNS
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def _write_csv(chunks, out, columns):
+    text = io.TextIOWrapper(out, encoding='utf-8', newline='', write_through=True)
+    try:
+        writer = csv.writer(text)
+        writer.writerow(columns)
+        for rows in chunks:
+            writer.writerows(rows)
+    finally:
+        # Leave the caller's file open
+        text.detach()
+
+
+def _xlsx_value(value):
+    # Postgres hands back datetimes; SQLite text is written as is
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.replace(tzinfo=None)
+    return value
+
+
+def _write_xlsx(chunks, out, columns):
+    # write_only streams rows to the sheet instead of keeping them as cells
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Contacts")
+    sheet.append(columns)
+    for rows in chunks:
+        for row in rows:
+            sheet.append([_xlsx_value(value) for value in row])
+    workbook.save(out)
+
+
+def _parquet_schema(columns):
+    import pyarrow as pa
+    types = {'id': pa.int64(), 'followup_interval': pa.int32()}
+    return pa.schema([
+        (column, types.get(column, pa.timestamp('us') if column in DATE_COLUMNS else pa.string()))
+        for column in columns
+    ])
+
+
+def _parquet_table(rows, columns, schema):
+    import pyarrow as pa
+    frame = pd.DataFrame.from_records(rows, columns=columns)
+    for column in columns:
+        if column in DATE_COLUMNS:
+            frame[column] = pd.to_datetime(frame[column], errors='coerce', utc=True).dt.tz_localize(None)
+        elif column not in ('id', 'followup_interval'):
+            frame[column] = frame[column].astype('string')
+    return pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+
+
+def _write_parquet(chunks, out, columns):
+    import pyarrow.parquet as pq
+    schema = _parquet_schema(columns)
+    # Every chunk becomes one row group
+    with pq.ParquetWriter(out, schema) as writer:
+        for rows in chunks:
+            writer.write_table(_parquet_table(rows, columns, schema))
+
+
+WRITERS = {'csv': _write_csv, 'xlsx': _write_xlsx, 'parquet': _write_parquet}
+
+
+def _write(chunks, out, fmt, columns, on_progress):
+    """Write row chunks with the format's writer; returns the rows written"""
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown export format {fmt!r}")
+    written = 0
+
+    def counted():
+        nonlocal written
+        for rows in chunks:
+            yield rows
+            written += len(rows)
+            if on_progress:
+                on_progress(written)
+
+    WRITERS[fmt](counted(), out, columns)
+    return written
+
+
+def export_contacts(out, fmt='csv', filters=None, search=None, due_before=None, columns=None,
+                    chunk_size=EXPORT_CHUNK_SIZE, on_progress=None):
+    """Write matching contacts to the binary file out, chunk by chunk.
+
+    on_progress(rows_written) is called after every chunk. Returns the
+    number of contacts exported.
+    """
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown export format {fmt!r}")
+    columns = list(columns or CONTACT_COLUMNS)
+    chunks = iter_contacts(filters, search, due_moment(due_before), columns, chunk_size)
+    return _write(chunks, out, fmt, columns, on_progress)
+
+
+def export_merged(out, title, body, fmt='csv', filters=None, search=None, due_before=None,
+                  chunk_size=EXPORT_CHUNK_SIZE, on_progress=None):
+    """Write one personalized email per matching contact to out, rendering
+    and writing chunk by chunk. Returns the number of emails written."""
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown export format {fmt!r}")
+    chunks = iter_merged(title, body, filters, search, due_before, chunk_size)
+    return _write(chunks, out, fmt, MERGE_COLUMNS, on_progress)
@@ -0,0 +1,146 @@
+import heapq
+import logging
+import threading
+from datetime import datetime
+from database import get_pending_followups, mark_followups_due, add_data_version_listener
+
+logger = logging.getLogger(__name__)
+
+# How many upcoming schedule entries the worker keeps in memory; it reloads
+# from the due_at index whenever the heap runs dry or the schedule changes
+HEAP_BATCH_SIZE = 1000
+# Upper bound on a single sleep, so schedule writes made by other processes
+# (which do not notify this one) are picked up in bounded time
+MAX_SLEEP_SECONDS = 60
+
+
+class FollowupScheduler:
+    """Background worker that sleeps until the next follow-up comes due.
+
+    It holds the earliest pending schedule entries in a heap, wakes at the
+    head's due time, marks everything due at once (which bumps the schedule's
+    data version, refreshing cached due lists) and calls the due listeners.
+    """
+
+    def __init__(self, batch_size=HEAP_BATCH_SIZE, max_sleep=MAX_SLEEP_SECONDS):
+        self.batch_size = batch_size
+        self.max_sleep = max_sleep
+        self._heap = []
+        self._stale = True
+        self._running = False
+        self._thread = None
+        self._wakeup = threading.Condition()
+        self._due_listeners = []
+        self.last_run = None
+        self.marked_due = 0
+        add_data_version_listener(self._on_data_change)
+
+    def add_due_listener(self, callback):
+        """Call callback(contact_ids) whenever follow-ups come due"""
+        self._due_listeners.append(callback)
+
+    def _on_data_change(self, tables):
+        # Marking entries due bumps the schedule's version too; the heap
+        # already reflects that write
+        if 'followup_schedule' in tables and threading.current_thread() is not self._thread:
+            with self._wakeup:
+                self._stale = True
+                self._wakeup.notify()
+
+    def start(self):
+        with self._wakeup:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name='followup-scheduler', daemon=True)
+        self._thread.start()
+        logger.info("Follow-up scheduler started")
+
+    def stop(self, timeout=5):
+        with self._wakeup:
+            self._running = False
+            self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _reload(self):
+        self._heap = get_pending_followups(self.batch_size)
+        heapq.heapify(self._heap)
+
+    def _pop_due(self, now):
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap)[1])
+        return due
+
+    def run_pending(self, now=None):
+        """Mark everything due by now; returns the contact ids marked"""
+        now = now or datetime.now()
+        with self._wakeup:
+            if self._stale or not self._heap:
+                self._stale = False
+                self._reload()
+            due = self._pop_due(now)
+        self.last_run = now
+        if not due:
+            return []
+        marked = mark_followups_due(due, now)
+        self.marked_due += len(marked)
+        if marked:
+            logger.info(f"{len(marked)} follow-ups came due")
+            for listener in self._due_listeners:
+                try:
+                    listener(marked)
+                except Exception as e:
+                    logger.error(f"Follow-up listener failed: {e}")
+        return marked
+
+    def _seconds_until_next(self):
+        if not self._heap:
+            return self.max_sleep
+        wait = (self._heap[0][0] - datetime.now()).total_seconds()
+        return min(max(wait, 0), self.max_sleep)
+
+    def _run(self):
+        while True:
+            try:
+                self.run_pending()
+            except Exception as e:
+                logger.error(f"Follow-up scheduler error: {e}")
+                with self._wakeup:
+                    # Entries popped before the failure come back on reload
+                    self._stale = True
+                    self._wakeup.wait(self.max_sleep)
+            with self._wakeup:
+                if not self._running:
+                    return
+                if not self._stale:
+                    self._wakeup.wait(self._seconds_until_next())
+                if not self._running:
+                    return
+
+    def stats(self):
+        with self._wakeup:
+            next_due = self._heap[0][0] if self._heap else None
+            queued = len(self._heap)
+        return {
+            'running': self._running,
+            'queued': queued,
+            'next_due': next_due,
+            'last_run': self.last_run,
+            'marked_due': self.marked_due,
+        }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """The process-wide scheduler, started on first use"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = FollowupScheduler()
+            _scheduler.start()
+    return _scheduler
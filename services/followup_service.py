@@ -1,10 +1,27 @@
 import streamlit as st
-from database import get_due_followups, mark_followup_sent
+from database import (
+    get_due_followups, mark_followup_sent, mark_followups_sent, set_followup_cadence,
+    get_data_version, FOLLOWUP_CADENCES, DEFAULT_CADENCE
+)
+from services.profiling import profiled, cached
+from services.followup_scheduler import get_scheduler
 
-@st.cache_data(ttl=30)
+@profiled
 def load_due_followups():
+    # The scheduler bumps the schedule's version as entries come due, so the
+    # cached list turns over exactly when something new is due
+    return _load_due_followups(get_data_version('contacts', 'followup_schedule'))
+
+@cached(ttl=600, max_entries=4)
+def _load_due_followups(version):
     return get_due_followups()
 
+def start_followup_scheduler():
+    return get_scheduler()
+
+def get_scheduler_stats():
+    return get_scheduler().stats()
+
 def mark_followup_sent_wrapper(contact_id):
     """Wrapper function for mark_followup_sent from database"""
-    return mark_followup_sent(contact_id)
\ No newline at end of file
+    return mark_followup_sent(contact_id)
@@ -0,0 +1,69 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+try:
+    from streamlit.runtime.scriptrunner.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+except ImportError:
+    # Moved in later Streamlit releases
+    from streamlit.runtime.scriptrunner_utils.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+
+# Long-lived workers, so each keeps its pooled (per-thread on SQLite)
+# connection between page runs instead of reconnecting
+GATHER_WORKERS = int(os.environ.get('GATHER_WORKERS', 8))
+_executor = ThreadPoolExecutor(max_workers=GATHER_WORKERS, thread_name_prefix='gather')
+
+
+def _as_callable(call):
+    # A call is either a bare callable or a (callable, *args) tuple
+    if callable(call):
+        return call
+    func, *args = call
+    return functools.partial(func, *args)
+
+
+def _with_script_context(func, ctx):
+    """Run func with the calling script's context so st.cache_data finds the
+    session's runtime, and with a copy of its context variables (such as the
+    database routing session).
+
+    Several workers share one context at once, so what they run must not
+    emit anything into the session: cached loaders show no spinner (see
+    services.profiling.cached).
+    """
+    variables = contextvars.copy_context()
+    def run():
+        add_script_run_ctx(ctx=ctx)
+        try:
+            return variables.run(func)
+        finally:
+            # Workers are reused; none may keep a finished rerun's context
+            setattr(threading.current_thread(), SCRIPT_RUN_CONTEXT_ATTR_NAME, None)
+    return run
+
+
+async def gather_async(*calls):
+    """Await independent loader/database calls concurrently on the worker pool"""
+    loop = asyncio.get_running_loop()
+    ctx = get_script_run_ctx()
+    return await asyncio.gather(*(
+        loop.run_in_executor(_executor, _with_script_context(_as_callable(call), ctx))
+        for call in calls
+    ))
+
+
+def gather(*calls):
+    """Run independent calls concurrently and return their results in order.
+
+    Callable from a Streamlit script (which has no event loop of its own):
+
+        aggregates, due = gather(load_aggregates, (load_due_followups,))
+
+    Latency is that of the slowest call rather than the sum of all of them.
+    """
+    if len(calls) == 1:
+        return [_as_callable(calls[0])()]
+    return asyncio.run(gather_async(*calls))
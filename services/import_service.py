@@ -0,0 +1,86 @@
+import os
+import pandas as pd
+from openpyxl import load_workbook
+from database import (
+    contact_rows_from_frame, insert_contact_rows, IMPORT_CHUNK_SIZE,
+    MERGE_POLICIES, DEFAULT_MERGE_POLICY
+)
+
+
+def _file_kind(filename):
+    return os.path.splitext(filename)[1].lower().lstrip('.')
+
+
+def _clean_header(header):
+    return [str(h).strip() if h is not None else '' for h in header]
+
+
+def _iter_xlsx_chunks(file, chunk_size):
+    # read_only streams rows from the sheet XML instead of building the whole workbook
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        rows = sheet.iter_rows(values_only=True)
+        header = _clean_header(next(rows, ()))
+        total = sheet.max_row - 1 if sheet.max_row else None
+        chunk = []
+        for row in rows:
+            chunk.append(row[:len(header)])
+            if len(chunk) == chunk_size:
+                yield pd.DataFrame(chunk, columns=header), total
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header), total
+    finally:
+        workbook.close()
+
+
+def _iter_csv_chunks(file, chunk_size):
+    with pd.read_csv(file, chunksize=chunk_size, dtype=str) as reader:
+        for chunk in reader:
+            chunk.columns = _clean_header(chunk.columns)
+            yield chunk, None
+
+
+def _iter_xls_chunks(file, chunk_size):
+    # Legacy .xls has no streaming reader; load once and slice
+    df = pd.read_excel(file)
+    df.columns = _clean_header(df.columns)
+    for start in range(0, len(df), chunk_size):
+        yield df.iloc[start:start + chunk_size], len(df)
+
+
+def iter_import_chunks(file, filename, chunk_size=IMPORT_CHUNK_SIZE):
+    """Yield (DataFrame chunk, estimated total rows or None) from an upload"""
+    kind = _file_kind(filename)
+    if kind == 'csv':
+        return _iter_csv_chunks(file, chunk_size)
+    if kind == 'xls':
+        return _iter_xls_chunks(file, chunk_size)
+    return _iter_xlsx_chunks(file, chunk_size)
+
+
+def preview_import(file, filename, rows=5):
+    """First few rows of an upload without reading the rest of it"""
+    chunks = iter_import_chunks(file, filename, chunk_size=rows)
+    try:
+        for chunk, _ in chunks:
+            return chunk
+        return pd.DataFrame()
+    finally:
+        chunks.close()
+
+
+def import_contacts_stream(file, filename, chunk_size=IMPORT_CHUNK_SIZE, on_progress=None, merge_policy=None):
+    """Import an upload chunk by chunk, committing each chunk separately.
+
+    on_progress(rows_read, estimated_total) is called after every chunk.
+    Returns the number of new contacts; duplicates are merged per merge_policy.
+    """
+    imported = rows_read = 0
+    for chunk, total in iter_import_chunks(file, filename, chunk_size):
+        imported += insert_contact_rows(contact_rows_from_frame(chunk), merge_policy)
+        rows_read += len(chunk)
+        if on_progress:
+            on_progress(rows_read, total)
+    return imported
@@ -0,0 +1,96 @@
+import re
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+from database import (
+    iter_contacts, enqueue_emails, count_enqueueable, CONTACT_COLUMNS, DATE_COLUMNS, EXPORT_CHUNK_SIZE
+)
+from mailmerge import compile_template, TemplateError, DERIVED_FIELDS
+
+# Fields a template may use
+MERGE_FIELDS = tuple(column for column in CONTACT_COLUMNS if column != 'id') + DERIVED_FIELDS
+# One row per contact in merged output: who it is for, then the email
+MERGE_COLUMNS = ['id', 'name', 'email', 'linkedin_url', 'subject', 'body']
+PREVIEW_ROWS = 20
+_ADDRESS = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+
+def compile_email(title, body):
+    """(subject, body) compiled templates; raises TemplateError"""
+    return compile_template(title, MERGE_FIELDS), compile_template(body, MERGE_FIELDS)
+
+
+def template_error(title, body):
+    """Why a template does not compile, or None"""
+    try:
+        compile_email(title, body)
+    except TemplateError as e:
+        return str(e)
+    return None
+
+
+def due_moment(due_before):
+    """A follow-up due-by date means through the end of that day"""
+    if isinstance(due_before, date) and not isinstance(due_before, datetime):
+        return datetime.combine(due_before, datetime.max.time())
+    return due_before
+
+
+def _text_column(values, is_date):
+    # Blank is '' so sections and defaults test one value
+    if is_date:
+        return np.array(['' if value is None else str(value)[:10] for value in values], dtype=object)
+    return np.array(['' if value is None else str(value).strip() for value in values], dtype=object)
+
+
+def iter_merged(title, body, filters=None, search=None, due_before=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Stream personalized emails for the matching contacts as lists of
+    MERGE_COLUMNS tuples, rendering a whole chunk at a time"""
+    subject_template, body_template = compile_email(title, body)
+    fields = sorted((subject_template.source_fields | body_template.source_fields) - {'name', 'email', 'linkedin_url'})
+    columns = ['id', 'name', 'email', 'linkedin_url'] + fields
+    for rows in iter_contacts(filters, search, due_moment(due_before), columns, chunk_size):
+        by_column = dict(zip(columns, zip(*rows)))
+        values = {column: _text_column(by_column[column], column in DATE_COLUMNS) for column in columns[1:]}
+        subjects = subject_template.render_batch(values, len(rows))
+        bodies = body_template.render_batch(values, len(rows))
+        yield list(zip(by_column['id'], by_column['name'], by_column['email'], by_column['linkedin_url'],
+                       subjects, bodies))
+
+
+def preview_merge(title, body, filters=None, search=None, due_before=None, limit=PREVIEW_ROWS):
+    """The first limit emails of a merge, without rendering the rest"""
+    chunks = iter_merged(title, body, filters, search, due_before, chunk_size=limit)
+    try:
+        rows = next(chunks, [])
+    finally:
+        chunks.close()
+    return pd.DataFrame(rows, columns=MERGE_COLUMNS)
+
+
+def enqueue_merge(template, kind='initial', filters=None, search=None, due_before=None):
+    """Render a template for the matching contacts and queue one email each.
+
+    Contacts without a usable email address are skipped, as are contacts
+    that already have a message of this kind from the template. Returns
+    (queued, skipped, already_queued).
+    """
+    queued = skipped = already_queued = 0
+    for rows in iter_merged(template['title'], template['body'], filters, search, due_before):
+        messages = [
+            (contact_id, email, subject, text, kind)
+            for contact_id, _, email, _, subject, text in rows
+            if email and _ADDRESS.match(email.strip())
+        ]
+        skipped += len(rows) - len(messages)
+        count = enqueue_emails(messages, template['id'])
+        queued += count
+        already_queued += len(messages) - count
+    return queued, skipped, already_queued
+
+
+def count_merge_recipients(template, kind, filters=None, search=None, due_before=None):
+    """How many emails queueing a merge would add, for confirming it first"""
+    counts = count_enqueueable(template['id'], kind, filters, search, due_moment(due_before))
+    counts['to_queue'] = max(counts['matching'] - counts['without_email'] - counts['already_queued'], 0)
+    return counts
@@ -0,0 +1,51 @@
+from database import (
+    get_outbound_summary, get_outbound_messages, retry_failed_outbound,
+    cancel_queued_outbound, get_engagement_summary, get_data_version, OUTBOUND_STATES, OUTBOUND_KINDS
+)
+from services.email_sender import get_sender
+from services import tracking_server
+from services.event_ingest import get_event_buffer
+from services.profiling import profiled, cached
+
+@profiled
+def load_outbox(state=None, limit=200):
+    """(queue summary, latest messages) for the Outbox page"""
+    return _load_outbox(state, limit, get_data_version('outbound_queue'))
+
+@cached(ttl=30, max_entries=8)
+def _load_outbox(state, limit, version):
+    return get_outbound_summary(), get_outbound_messages(state, limit)
+
+def start_sender():
+    return get_sender()
+
+def get_sender_stats():
+    sender = get_sender()
+    return sender.stats() if sender else None
+
+def send_now():
+    """Wake the sender to check the queue immediately"""
+    sender = get_sender()
+    if sender:
+        sender.wake()
+
+@profiled
+def load_engagement():
+    """Opens, clicks and replies recorded so far"""
+    return _load_engagement(get_data_version('events', 'event_rollup'))
+
+@cached(ttl=30, max_entries=4)
+def _load_engagement(version):
+    return get_engagement_summary()
+
+def start_tracking():
+    """Serve the open pixel and click redirects, when TRACKING_PORT is set"""
+    if tracking_server.TRACKING_PORT:
+        return tracking_server.start_tracking_server()
+    return None
+
+def get_tracking_stats():
+    """Event buffer counters, when this process runs the tracking server"""
+    if tracking_server.get_server() is None:
+        return None
+    return get_event_buffer().stats()
@@ -0,0 +1,177 @@
+import os
+import io
+import json
+import time
+import pstats
+import cProfile
+import logging
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+import streamlit as st
+from database import fill_shared_cache
+
+logger = logging.getLogger(__name__)
+
+# Opt-in: PROFILE_PAGES=1 (or ?profile=1) times pages and loaders,
+# PROFILE_PAGES=trace (or ?profile=trace) also captures a cProfile trace
+PROFILE_PAGES = os.environ.get('PROFILE_PAGES', '')
+# ?profile= is only honoured with PROFILE_URL_PARAM=1, so visitors of a
+# deployed app cannot trace every rerun or grow the profile log
+PROFILE_URL_PARAM = os.environ.get('PROFILE_URL_PARAM', '') not in ('', '0')
+PROFILE_LOG = os.environ.get('PROFILE_LOG', 'profile_log.jsonl')
+TRACE_LINES = 25
+
+# The rerun being profiled, and the timed call currently open in it
+_current_run = contextvars.ContextVar('profile_run', default=None)
+_open_call = contextvars.ContextVar('profile_call', default=None)
+_log_lock = threading.Lock()
+
+
+def profile_mode():
+    """None, 'timing' or 'trace' for the current rerun"""
+    mode = (st.query_params.get('profile') if PROFILE_URL_PARAM else None) or PROFILE_PAGES
+    if mode in ('', '0', 'off'):
+        return None
+    return 'trace' if mode == 'trace' else 'timing'
+
+
+@contextmanager
+def _timing(name, kind):
+    run = _current_run.get()
+    if run is None:
+        yield None
+        return
+    parent = _open_call.get()
+    call = {'name': name, 'kind': kind, 'depth': parent['depth'] + 1 if parent else 0}
+    token = _open_call.set(call)
+    start = time.perf_counter()
+    try:
+        yield call
+    finally:
+        call['start_ms'] = (start - run['started']) * 1000
+        call['ms'] = (time.perf_counter() - start) * 1000
+        _open_call.reset(token)
+        run['calls'].append(call)
+
+
+def profiled(func):
+    """Time a loader when the rerun is being profiled"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _current_run.get() is None:
+            return func(*args, **kwargs)
+        with _timing(func.__name__, 'load'):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def cached(**cache_kwargs):
+    """st.cache_data that reports hits and misses to the profiler.
+
+    The wrapped body only runs on a miss, so it flags the call it runs under;
+    the status lands on the enclosing loader's timing. There is no spinner:
+    loaders also run on gather() workers, which must not emit into the
+    session concurrently.
+    """
+    cache_kwargs.setdefault('show_spinner', False)
+    def decorator(func):
+        @functools.wraps(func)
+        def compute(*args, **kwargs):
+            call = _open_call.get()
+            if call is not None:
+                call['cache'] = 'miss'
+            return fill_shared_cache(func, *args, **kwargs)
+        cached_func = st.cache_data(**cache_kwargs)(compute)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_run.get() is None:
+                return cached_func(*args, **kwargs)
+            call = _open_call.get()
+            if call is None or 'cache' in call:
+                # Called directly rather than through a loader
+                with _timing(func.__name__, 'load') as call:
+                    call['cache'] = 'hit'
+                    return cached_func(*args, **kwargs)
+            call['cache'] = 'hit'
+            return cached_func(*args, **kwargs)
+        wrapper.clear = cached_func.clear
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def profile_section(name):
+    """Time a block of page code, such as filtering a frame"""
+    with _timing(name, 'section'):
+        yield
+
+
+def _wall_ms(calls):
+    """Wall-clock time covered by calls; loads run through gather() overlap"""
+    total, end = 0.0, 0.0
+    for call in sorted(calls, key=lambda c: c['start_ms']):
+        call_end = call['start_ms'] + call['ms']
+        if call_end > end:
+            total += call_end - max(call['start_ms'], end)
+            end = call_end
+    return total
+
+
+def _trace_text(profiler):
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(TRACE_LINES)
+    return out.getvalue()
+
+
+def profile_page(page, render, session_id=None):
+    """Run render() for page, profiling it when profiling is on.
+
+    Returns the run record (None when profiling is off) and appends it to
+    PROFILE_LOG.
+    """
+    mode = profile_mode()
+    if mode is None:
+        render()
+        return None
+
+    run = {'at': datetime.now().isoformat(timespec='seconds'), 'session': session_id,
+           'page': page, 'mode': mode, 'calls': [], 'started': time.perf_counter()}
+    token = _current_run.set(run)
+    profiler = None
+    if mode == 'trace':
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Only one profiler can run at a time (another session is tracing)
+            profiler = None
+            run['trace'] = "Trace skipped: another rerun is being traced"
+    try:
+        render()
+    finally:
+        run['total_ms'] = (time.perf_counter() - run.pop('started')) * 1000
+        if profiler is not None:
+            profiler.disable()
+            run['trace'] = _trace_text(profiler)
+        _current_run.reset(token)
+        top_level = [call for call in run['calls'] if call['depth'] == 0]
+        run['load_ms'] = _wall_ms([call for call in top_level if call['kind'] == 'load'])
+        run['section_ms'] = _wall_ms([call for call in top_level if call['kind'] == 'section'])
+        # Whatever is left is spent building and emitting widgets
+        run['render_ms'] = max(run['total_ms'] - run['load_ms'] - run['section_ms'], 0.0)
+        _append_log(run)
+    return run
+
+
+def _append_log(run):
+    if not PROFILE_LOG:
+        return
+    try:
+        with _log_lock, open(PROFILE_LOG, 'a') as f:
+            f.write(json.dumps(run, default=str) + '\n')
+    except OSError as e:
+        logger.error(f"Could not write profile log {PROFILE_LOG}: {e}")
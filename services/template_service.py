@@ -1,6 +1,11 @@
 import streamlit as st
-from database import get_all_templates, add_template, delete_template
+from database import get_all_templates, add_template, delete_template, get_data_version
+from services.profiling import profiled, cached
 
-@st.cache_data(ttl=60)
+@profiled
 def load_templates():
+    return _load_templates(get_data_version('templates'))
+
+@cached(ttl=600, max_entries=4)
+def _load_templates(version):
     return get_all_templates()
\ No newline at end of file
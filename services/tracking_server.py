@@ -0,0 +1,128 @@
+import os
+import base64
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from tracking import read_token
+from services.event_ingest import get_event_buffer
+
+logger = logging.getLogger(__name__)
+
+# Port the tracking server listens on when started with the app
+TRACKING_PORT = int(os.environ.get('TRACKING_PORT', 0))
+TRACKING_HOST = os.environ.get('TRACKING_HOST', '0.0.0.0')
+
+PIXEL = base64.b64decode('R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7')
+MAX_REPLY_BODY = 64 * 1024
+
+
+class _TrackingServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Bursts open many connections at once
+    request_queue_size = 1024
+
+
+class _TrackingHandler(BaseHTTPRequestHandler):
+    """GET /o/<token>.gif   open pixel
+    GET /c/<token>?u=<url>  click, redirected to url
+    POST /r                 reply; the body holds the token or the reply's
+                            In-Reply-To header (the token is in the Message-ID)
+
+    Requests only append to the event buffer, never touch the database.
+    """
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; without TCP_NODELAY each
+    # keep-alive response stalls on the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def _record(self, kind, ids, url=None):
+        message_id, contact_id = ids
+        get_event_buffer().add(kind, message_id, contact_id or None, url)
+
+    def _respond(self, status, content_type=None, body=b'', headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        if content_type:
+            self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlsplit(self.path)
+        if path.path.startswith('/o/'):
+            ids = read_token(path.path[3:].removesuffix('.gif'))
+            if ids:
+                self._record('open', ids)
+            # The pixel is served either way, so a bad token never shows as a broken image
+            self._respond(200, 'image/gif', PIXEL, [('Cache-Control', 'no-store, max-age=0')])
+        elif path.path.startswith('/c/'):
+            url = parse_qs(path.query).get('u', [''])[0]
+            ids = read_token(path.path[3:], url)
+            if not ids or not url.startswith(('http://', 'https://')):
+                # Only links signed into a sent email are redirected to
+                self._respond(404)
+                return
+            self._record('click', ids, url)
+            self._respond(302, headers=[('Location', url), ('Cache-Control', 'no-store')])
+        else:
+            self._respond(404)
+
+    def do_POST(self):
+        if urlsplit(self.path).path != '/r':
+            self._respond(404)
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._respond(400)
+            self.close_connection = True
+            return
+        if length > MAX_REPLY_BODY:
+            self._respond(413)
+            self.close_connection = True
+            return
+        ids = read_token(self.rfile.read(length).decode('utf-8', 'replace'))
+        if not ids:
+            self._respond(400)
+            return
+        self._record('reply', ids)
+        self._respond(204)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_tracking_server(port=TRACKING_PORT, host=TRACKING_HOST):
+    """Serve tracking requests on port (once per process) on a background thread"""
+    global _server
+    with _server_lock:
+        if _server is None:
+            get_event_buffer()
+            _server = _TrackingServer((host, port), _TrackingHandler)
+            threading.Thread(target=_server.serve_forever, name='tracking-server', daemon=True).start()
+            logger.info(f"Tracking server listening on http://{host}:{_server.server_address[1]}")
+    return _server
+
+
+def get_server():
+    return _server
+
+
+def stop_tracking_server():
+    """Stop serving and write out the buffered events"""
+    global _server
+    with _server_lock:
+        if _server is not None:
+            _server.shutdown()
+            _server.server_close()
+            _server = None
+    get_event_buffer().stop()
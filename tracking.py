@@ -0,0 +1,68 @@
+import os
+import re
+import hmac
+import html
+import hashlib
+from urllib.parse import quote
+
+# Open and click tracking for sent emails. Each message carries a token
+# naming its queue entry and contact, signed with TRACKING_SECRET so the
+# tracking server can attribute an event without a database lookup and
+# cannot be made to redirect anywhere a sent email did not link to.
+#   TRACKING_URL     public base URL of the tracking server, as embedded in emails
+#   TRACKING_SECRET  shared by the sender and the tracking server
+TRACKING_URL = os.environ.get('TRACKING_URL', '').rstrip('/')
+TRACKING_SECRET = os.environ.get('TRACKING_SECRET', '')
+
+# Hyphenated, so it stands out among the dotted digits of a Message-ID
+TOKEN = re.compile(r'(\d+)-(\d+)-([0-9a-f]{16})(?![0-9a-f])')
+_LINK = re.compile(r'https?://[^\s<>"]+[^\s<>".,;:!?)\]]')
+
+
+def is_enabled():
+    return bool(TRACKING_URL and TRACKING_SECRET)
+
+
+def _signature(message_id, contact_id, url=''):
+    payload = f"{message_id}.{contact_id}|{url}".encode()
+    return hmac.new(TRACKING_SECRET.encode(), payload, hashlib.sha256).hexdigest()[:16]
+
+
+def make_token(message_id, contact_id, url=''):
+    """message_id-contact_id-signature; a click token also signs its url"""
+    return f"{message_id}-{contact_id}-{_signature(message_id, contact_id, url)}"
+
+
+def read_token(text, url=''):
+    """(message_id, contact_id) of the first validly signed token in text, or
+    None. text may be a bare token or, for replies, a Message-ID header."""
+    if not TRACKING_SECRET:
+        return None
+    for match in TOKEN.finditer(text or ''):
+        message_id, contact_id, signature = match.groups()
+        if hmac.compare_digest(signature, _signature(message_id, contact_id, url)):
+            return int(message_id), int(contact_id)
+    return None
+
+
+def pixel_url(message_id, contact_id):
+    return f"{TRACKING_URL}/o/{make_token(message_id, contact_id)}.gif"
+
+
+def click_url(message_id, contact_id, url):
+    return f"{TRACKING_URL}/c/{make_token(message_id, contact_id, url)}?u={quote(url, safe='')}"
+
+
+def tracked_html(text, message_id, contact_id):
+    """HTML version of a plain-text email body, its links going through the
+    tracking server and an open pixel at the end"""
+    parts, position = [], 0
+    for match in _LINK.finditer(text):
+        parts.append(html.escape(text[position:match.start()]))
+        url = match.group(0)
+        parts.append(f'<a href="{html.escape(click_url(message_id, contact_id, url))}">{html.escape(url)}</a>')
+        position = match.end()
+    parts.append(html.escape(text[position:]))
+    body = ''.join(parts).replace('\n', '<br>\n')
+    pixel = f'<img src="{html.escape(pixel_url(message_id, contact_id))}" width="1" height="1" alt="">'
+    return f'<html><body>{body}\n{pixel}</body></html>'